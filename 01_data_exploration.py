@@ -5,46 +5,58 @@ Sans utilisation de géomatique - approche alternative intelligente
 
 import pandas as pd
 import numpy as np
-import json
 from pathlib import Path
 
+from geojson_stream import GeoJSONStreamReader
+
 # Configuration
 DATA_DIR = Path("data")
 
-def explore_dataset(filepath, name):
-    """Explore un dataset et affiche ses caractéristiques"""
+def print_header(name):
     print(f"\n{'='*80}")
     print(f"Dataset: {name}")
     print(f"{'='*80}")
 
+
+def describe_frame(df):
+    """Affiche les caractéristiques d'un DataFrame déjà chargé"""
+    print(f"\nShape (first 5 rows): {df.head().shape}")
+    print(f"\nColumns: {df.columns.tolist()}")
+    print(f"\nFirst rows:")
+    print(df.head())
+    print(f"\nData types:")
+    print(df.dtypes)
+
+    print(f"\nFull dataset shape: {df.shape}")
+    print(f"\nMissing values:")
+    print(df.isnull().sum())
+
+
+def explore_dataset(filepath, name):
+    """Explore un dataset et affiche ses caractéristiques"""
+    print_header(name)
+
     try:
         if filepath.suffix == '.csv':
-            df = pd.read_csv(filepath, nrows=5)
-            print(f"\nShape (first 5 rows): {df.shape}")
-            print(f"\nColumns: {df.columns.tolist()}")
-            print(f"\nFirst rows:")
-            print(df.head())
-            print(f"\nData types:")
-            print(df.dtypes)
-
-            # Load full for stats
             df_full = pd.read_csv(filepath)
-            print(f"\nFull dataset shape: {df_full.shape}")
-            print(f"\nMissing values:")
-            print(df_full.isnull().sum())
-
+            describe_frame(df_full)
             return df_full
 
         elif filepath.suffix == '.geojson':
-            # Read geojson as text to understand structure
-            with open(filepath, 'r', encoding='utf-8') as f:
-                data = json.load(f)
-            print(f"\nType: {data.get('type')}")
-            print(f"\nNumber of features: {len(data.get('features', []))}")
-            if data.get('features'):
+            # Lecture en flux: un seul bloc d'entités en mémoire à la fois;
+            # seule la première entité est conservée (et retournée)
+            reader = GeoJSONStreamReader(filepath)
+            n_features, first = 0, None
+            for chunk in reader.iter_chunks(with_bbox=False):
+                if first is None:
+                    first = chunk.head(1).copy()
+                n_features += len(chunk)
+            print(f"\nType: {reader.metadata.get('type')}")
+            print(f"\nNumber of features: {n_features}")
+            if first is not None:
                 print(f"\nFirst feature properties:")
-                print(data['features'][0].get('properties'))
-            return data
+                print(first.iloc[0].to_dict())
+            return first
 
         elif filepath.suffix == '.gpkg':
             print(f"\nGeoPackage file - will need geopandas to read")
@@ -64,11 +76,50 @@ datasets = {
     'aire': DATA_DIR / 'AireAmenagee.csv'
 }
 
-data = {}
-for name, filepath in datasets.items():
-    result = explore_dataset(filepath, name)
-    data[name] = result
+# Correspondance entre les jeux chargés par le pipeline et les noms ci-dessus
+LOADED_DATASETS = {
+    'buildings': 'batiments',
+    'consumption': 'consommation',
+    'heat': 'chaleur',
+    'flood': 'inondation',
+    'vulnerability': 'vulnerabilite',
+}
+
+
+def print_complete():
+    print("\n" + "="*80)
+    print("EXPLORATION COMPLETE")
+    print("="*80)
+
+
+def explore_loaded(raw_data):
+    """
+    Explore les jeux déjà chargés par load_and_prepare_data, sans relire
+    les fichiers bruts (étape 'explore' du pipeline)
+    """
+    for key, name in LOADED_DATASETS.items():
+        value = raw_data.get(key)
+        print_header(name)
+        if isinstance(value, pd.DataFrame):
+            describe_frame(value)
+        elif value is not None and hasattr(value, 'values'):
+            # Grille des îlots de chaleur (heat_grid.HeatIslandGrid)
+            print(f"\nRasterized grid shape: {value.values.shape}")
+            print(f"\nOrigin: {value.origin}, resolution: {value.resolution}")
+        else:
+            print(f"\nNot loaded")
+    print_complete()
+
+
+def main():
+    data = {}
+    for name, filepath in datasets.items():
+        result = explore_dataset(filepath, name)
+        data[name] = result
+
+    print_complete()
+    return data
+
 
-print("\n" + "="*80)
-print("EXPLORATION COMPLETE")
-print("="*80)
+if __name__ == "__main__":
+    main()
@@ -10,11 +10,129 @@ Approche alternative utilisant:
 import pandas as pd
 import numpy as np
 import re
+import unicodedata
 from collections import defaultdict
-import json
-from pathlib import Path
 
-DATA_DIR = Path("data")
+from borough_resolver import MATCHING_RESOLVER
+from building_schema import apply_schema, memory_usage_mb
+from columnar_io import HAS_ARROW, table_path, write_table
+from heat_grid import load_heat_grid
+from pipeline_files import DATA_FILES, ENRICHED_OUTPUT
+from spatial_index import PolygonGridIndex, parse_wkt_rings
+
+# Patterns d'adresses canadiennes, compilés une seule fois
+POSTAL_CODE_PATTERN = re.compile(r'([A-Z]\d[A-Z]\s*\d[A-Z]\d)')
+STREET_NUMBER_PATTERN = re.compile(r'^(\d+)[-\s]')
+STREET_NAME_PATTERN = re.compile(r'\d+[-\s]+([A-Z\s\'-\.]+?)(?:\s*,|\s*H\d)')
+
+ADDRESS_COLUMNS = ['street_number', 'street_name', 'postal_code', 'fsa']
+
+# Forme canonique des adresses pour le matching flou entre fichiers
+CITY_SUFFIX_PATTERN = re.compile(r',[^,]*$')
+BOROUGH_CODE_PATTERN = re.compile(r'\([A-Z]{2,4}\)')
+PUNCTUATION_PATTERN = re.compile(r"[^A-Z0-9 ]+")
+CIVIC_NUMBER_PATTERN = re.compile(r'^(\d+)\w*\s*(.*)$')
+
+STREET_TOKEN_ALIASES = {
+    'AVENUE': 'AV', 'BOULEVARD': 'BD', 'BOUL': 'BD', 'CHEMIN': 'CH',
+    'PLACE': 'PL', 'MONTEE': 'MTEE', 'SAINT': 'ST', 'SAINTE': 'STE',
+    'EST': 'E', 'OUEST': 'O', 'W': 'O', 'NORD': 'N', 'SUD': 'S',
+}
+STREET_STOPWORDS = {'DE', 'DU', 'DES', 'LA', 'LE', 'L', 'D'}
+
+# Fichier de divulgation énergétique 2023
+CONSUMPTION_ENERGY_COLUMNS = [
+    'Electricite (GJ)', 'Gaz_naturel', 'Mazout ', 'Eau_refroidie (GJ)', 'Vapeur '
+]
+CONSUMPTION_GES_COLUMN = 'Emissions_GES (tCO₂e)'
+CONSUMPTION_AREA_COLUMN = 'Superficie'
+
+# Coordonnées des bâtiments géocodés (même système que les zones inondables)
+BUILDING_COORDINATE_COLUMNS = ('longitude', 'latitude')
+FLOOD_ZONE_RISK = 1.0
+
+
+class TrigramAddressIndex:
+    """
+    Index inversé de trigrammes de caractères sur des adresses canoniques
+
+    Les listes inversées sont partitionnées par numéro civique: la clé est
+    (numéro civique, trigramme), de sorte qu'une requête ne rencontre que les
+    enregistrements de son bloc civique. Le nombre de trigrammes partagés est
+    obtenu par une jointure par hachage sur ces clés, puis noté par le
+    coefficient de Dice. Le coût est proportionnel à la taille des blocs et
+    non au produit des deux fichiers.
+    """
+
+    def __init__(self, civic_numbers, streets, boroughs):
+        self.boroughs = np.asarray(boroughs, dtype=object)
+        self.trigram_counts, self.postings = self._trigram_table(civic_numbers, streets, 'record')
+
+    @staticmethod
+    def _trigram_table(civic_numbers, streets, id_column):
+        """Table (clé bloc|trigramme, identifiant) et taille des ensembles de trigrammes"""
+        cache = {}
+        counts = []
+        keys, ids = [], []
+        for i, (civic, street) in enumerate(zip(civic_numbers, streets)):
+            if street not in cache:
+                padded = f" {street} "
+                cache[street] = {padded[j:j + 3] for j in range(len(padded) - 2)}
+            trigrams = cache[street]
+            counts.append(len(trigrams))
+            if civic is None or pd.isna(civic):
+                continue
+            keys.extend(f"{civic}|{trigram}" for trigram in trigrams)
+            ids.extend([i] * len(trigrams))
+
+        table = pd.DataFrame({'key': keys, id_column: np.array(ids, dtype=np.int64)})
+        return np.array(counts, dtype=np.int64), table
+
+    def query(self, civic_numbers, streets, boroughs, min_similarity=0.6):
+        """
+        Retourne pour chaque requête l'enregistrement le plus similaire
+        (-1 si aucun) et son score de similarité
+        """
+        boroughs = np.asarray(boroughs, dtype=object)
+        query_counts, query_table = self._trigram_table(civic_numbers, streets, 'query')
+        n_queries = len(query_counts)
+
+        best_record = np.full(n_queries, -1, dtype=np.int64)
+        best_score = np.zeros(n_queries)
+
+        # Trigrammes partagés par paire candidate (même bloc civique)
+        pairs = (
+            query_table.merge(self.postings, on='key')
+            .groupby(['query', 'record']).size()
+            .rename('shared').reset_index()
+        )
+        if pairs.empty:
+            return best_record, best_score
+
+        query_ids = pairs['query'].to_numpy()
+        record_ids = pairs['record'].to_numpy()
+
+        # Blocage par arrondissement quand au moins un candidat concorde
+        pairs['same_borough'] = (
+            pd.notna(boroughs[query_ids]) & (boroughs[query_ids] == self.boroughs[record_ids])
+        )
+        has_same_borough = pairs.groupby('query')['same_borough'].transform('any')
+        pairs = pairs[pairs['same_borough'] | ~has_same_borough]
+
+        query_ids = pairs['query'].to_numpy()
+        record_ids = pairs['record'].to_numpy()
+        pairs = pairs.assign(score=(
+            2 * pairs['shared'].to_numpy() /
+            (query_counts[query_ids] + self.trigram_counts[record_ids])
+        ))
+
+        best = pairs.sort_values(['query', 'score'], ascending=[True, False]).drop_duplicates('query')
+        best = best[best['score'] >= min_similarity]
+
+        best_record[best['query'].to_numpy()] = best['record'].to_numpy()
+        best_score[best['query'].to_numpy()] = best['score'].to_numpy()
+        return best_record, best_score
+
 
 class IntelligentMatcher:
     """
@@ -26,6 +144,7 @@ class IntelligentMatcher:
         self.borough_mapping = {}
         self.postal_code_mapping = {}
         self.address_registry = {}
+        self.borough_resolver = MATCHING_RESOLVER
 
     def extract_address_components(self, address):
         """Extrait les composants d'une adresse canadienne"""
@@ -43,81 +162,197 @@ class IntelligentMatcher:
         }
 
         # Extract postal code (format: A1A 1A1)
-        postal_match = re.search(r'([A-Z]\d[A-Z]\s*\d[A-Z]\d)', address)
+        postal_match = POSTAL_CODE_PATTERN.search(address)
         if postal_match:
             components['postal_code'] = postal_match.group(1).replace(' ', '')
 
         # Extract street number
-        number_match = re.search(r'^(\d+)[-\s]', address)
+        number_match = STREET_NUMBER_PATTERN.search(address)
         if number_match:
             components['street_number'] = number_match.group(1)
 
         # Extract street name (between number and postal/borough)
-        street_match = re.search(r'\d+[-\s]+([A-Z\s\'-\.]+?)(?:\s*,|\s*H\d)', address)
+        street_match = STREET_NAME_PATTERN.search(address)
         if street_match:
             components['street_name'] = street_match.group(1).strip()
 
         return components
 
-    def normalize_borough_name(self, borough):
-        """Normalise les noms d'arrondissements"""
-        if pd.isna(borough):
-            return None
-
-        borough = str(borough).upper().strip()
-
-        # Mapping des variations communes
-        mappings = {
-            'VILLE-MARIE': ['VILLE MARIE', 'VILLEMARIE', 'DOWNTOWN'],
-            'PLATEAU-MONT-ROYAL': ['PLATEAU', 'MONT ROYAL', 'MONT-ROYAL'],
-            'ROSEMONT-PETITE-PATRIE': ['ROSEMONT', 'PETITE PATRIE', 'PETITE-PATRIE'],
-            'MERCIER-HOCHELAGA-MAISONNEUVE': ['MERCIER', 'HOCHELAGA', 'MAISONNEUVE'],
-            'COTE-DES-NEIGES-NOTRE-DAME-DE-GRACE': ['CDN', 'NDG', 'COTE DES NEIGES'],
-            'VILLERAY-SAINT-MICHEL-PARC-EXTENSION': ['VILLERAY', 'SAINT MICHEL', 'PARC EXTENSION'],
-            'AHUNTSIC-CARTIERVILLE': ['AHUNTSIC', 'CARTIERVILLE'],
-            'SUD-OUEST': ['SUD OUEST', 'SOUTHWEST'],
-            'RIVIERE-DES-PRAIRIES-POINTE-AUX-TREMBLES': ['RDP', 'POINTE AUX TREMBLES'],
-            'SAINT-LEONARD': ['ST LEONARD', 'ST-LEONARD'],
-            'SAINT-LAURENT': ['ST LAURENT', 'ST-LAURENT'],
-            'VERDUN': ['VERDUN'],
-            'ILE-BIZARD-SAINTE-GENEVIEVE': ['ILE BIZARD', 'SAINTE GENEVIEVE'],
-            'LACHINE': ['LACHINE'],
-            'LASALLE': ['LASALLE', 'LA SALLE'],
-            'MONTREAL-NORD': ['MONTREAL NORD', 'NORTH MONTREAL'],
-            'OUTREMONT': ['OUTREMONT'],
-            'PIERREFONDS-ROXBORO': ['PIERREFONDS', 'ROXBORO'],
-            'ANJOU': ['ANJOU']
-        }
+    def _extract_address_frame(self, addresses):
+        """
+        Applique les patterns compilés à une liste d'adresses distinctes
+        via Series.str.extract (mêmes règles que extract_address_components)
+        """
+        upper = pd.Series([str(address).upper() for address in addresses], dtype=object)
+
+        postal_code = upper.str.extract(POSTAL_CODE_PATTERN, expand=False).str.replace(' ', '', regex=False)
 
-        for standard, variations in mappings.items():
-            if borough == standard or borough in variations:
-                return standard
-            for variation in variations:
-                if variation in borough:
-                    return standard
+        return pd.DataFrame({
+            'street_number': upper.str.extract(STREET_NUMBER_PATTERN, expand=False),
+            'street_name': upper.str.extract(STREET_NAME_PATTERN, expand=False).str.strip(),
+            'postal_code': postal_code,
+            'fsa': postal_code.str[:3],
+        })
 
-        return borough
+    def parse_addresses(self, addresses):
+        """
+        Parse une colonne complète d'adresses
+        Chaque adresse distincte n'est parsée qu'une seule fois, les résultats
+        sont mémorisés dans address_registry et réutilisés par les appels suivants
+
+        Retourne un DataFrame (street_number, street_name, postal_code, fsa)
+        aligné sur l'index de la série d'entrée
+        """
+        addresses = pd.Series(addresses)
+        codes, uniques = pd.factorize(addresses)
+
+        unseen = [address for address in uniques if address not in self.address_registry]
+        if unseen:
+            parsed = self._extract_address_frame(unseen).astype(object)
+            parsed = parsed.where(parsed.notna(), None)
+            self.address_registry.update(zip(unseen, parsed.itertuples(index=False, name=None)))
+
+        # Dernière ligne = adresse manquante (code -1 de factorize)
+        table = pd.DataFrame(
+            [self.address_registry[address] for address in uniques] + [(None,) * len(ADDRESS_COLUMNS)],
+            columns=ADDRESS_COLUMNS
+        )
+        result = table.take(codes).astype('string')
+        result.index = addresses.index
+
+        return result
+
+    def canonicalize_address(self, address):
+        """
+        Forme canonique d'une adresse pour le matching flou
+        Retourne (numéro civique, rue) - ex: '1000 Av. Émile-Journault E'
+        -> ('1000', 'AV EMILE JOURNAULT E')
+        """
+        if pd.isna(address):
+            return None, ''
+
+        address = unicodedata.normalize('NFKD', str(address).upper())
+        address = ''.join(c for c in address if not unicodedata.combining(c))
+        address = CITY_SUFFIX_PATTERN.sub('', address)
+        address = BOROUGH_CODE_PATTERN.sub(' ', address)
+        address = PUNCTUATION_PATTERN.sub(' ', address).strip()
+
+        civic_number = None
+        civic_match = CIVIC_NUMBER_PATTERN.match(address)
+        if civic_match:
+            civic_number = civic_match.group(1)
+            address = civic_match.group(2)
+
+        tokens = [STREET_TOKEN_ALIASES.get(token, token) for token in address.split()]
+        street = ' '.join(token for token in tokens if token not in STREET_STOPWORDS)
+
+        return civic_number, street
+
+    def canonicalize_addresses(self, addresses):
+        """Version par lot de canonicalize_address (une fois par adresse distincte)"""
+        addresses = pd.Series(addresses)
+        codes, uniques = pd.factorize(addresses)
+        table = pd.DataFrame(
+            [self.canonicalize_address(address) for address in uniques] + [(None, '')],
+            columns=['civic_number', 'street']
+        )
+        result = table.take(codes)
+        result.index = addresses.index
+        return result
+
+    def build_address_index(self, addresses, boroughs):
+        """Construit l'index de trigrammes sur une colonne d'adresses"""
+        canonical = self.canonicalize_addresses(addresses)
+        codes, categories = self.borough_resolver.resolve_codes(boroughs)
+        resolved = np.append(np.asarray(categories, dtype=object), None)[codes]
+        return TrigramAddressIndex(canonical['civic_number'], canonical['street'], resolved)
+
+    def match_addresses(self, buildings_df, index, min_similarity=0.6):
+        """
+        Associe chaque bâtiment à l'enregistrement le plus proche de l'index
+        Retourne un DataFrame (record, address_match_score) aligné sur buildings_df
+        """
+        canonical = self.canonicalize_addresses(buildings_df['address'])
+        codes, categories = self.borough_resolver.resolve_codes(buildings_df['boroughName'])
+        resolved = np.append(np.asarray(categories, dtype=object), None)[codes]
+
+        record, score = index.query(
+            canonical['civic_number'], canonical['street'], resolved, min_similarity
+        )
+        return pd.DataFrame({'record': record, 'address_match_score': score}, index=buildings_df.index)
+
+    def build_disclosure_index(self, consumption_df):
+        """Index de trigrammes des adresses de la divulgation énergétique"""
+        return self.build_address_index(consumption_df['Adresse_civique'], consumption_df['Arrondissement'])
+
+    def attach_energy_disclosure(self, buildings_df, consumption_df, min_similarity=0.6, index=None):
+        """
+        Joint les mesures de la divulgation énergétique 2023 aux bâtiments
+        par matching flou d'adresses (index de trigrammes)
+        index: index déjà construit par build_disclosure_index (mode par blocs)
+        """
+        buildings_df['measured_ges_emissions'] = np.nan
+        buildings_df['measured_energy_gj'] = np.nan
+        buildings_df['measured_floor_area'] = np.nan
+        buildings_df['energy_match_score'] = 0.0
+
+        if consumption_df.empty:
+            return buildings_df
+
+        print(f"\nMatching buildings with {len(consumption_df)} energy disclosures...")
+        if index is None:
+            index = self.build_disclosure_index(consumption_df)
+        matches = self.match_addresses(buildings_df, index, min_similarity)
+
+        energy_columns = [c for c in CONSUMPTION_ENERGY_COLUMNS if c in consumption_df.columns]
+        energy = consumption_df[energy_columns].sum(axis=1, min_count=1).to_numpy()
+        ges = consumption_df[CONSUMPTION_GES_COLUMN].to_numpy(dtype=float)
+        # Superficie déclarée: plusieurs bâtiments d'un campus partagent une divulgation
+        floor_area = (consumption_df[CONSUMPTION_AREA_COLUMN].to_numpy(dtype=float)
+                      if CONSUMPTION_AREA_COLUMN in consumption_df.columns else np.full(len(consumption_df), np.nan))
+
+        matched = matches['record'].to_numpy() >= 0
+        records = matches['record'].to_numpy()[matched]
+        buildings_df.loc[matched, 'measured_ges_emissions'] = ges[records]
+        buildings_df.loc[matched, 'measured_energy_gj'] = energy[records]
+        buildings_df.loc[matched, 'measured_floor_area'] = floor_area[records]
+        buildings_df.loc[matched, 'energy_match_score'] = matches['address_match_score'].to_numpy()[matched]
+
+        print(f"Matched {matched.sum()} buildings to {len(np.unique(records))} disclosures")
+        return buildings_df
+
+    def normalize_borough_name(self, borough):
+        """Normalise les noms d'arrondissements"""
+        return self.borough_resolver.resolve(borough)
 
     def create_location_fingerprint(self, row):
         """
         Crée une empreinte digitale de localisation sans coordonnées
         Utilise: arrondissement, début d'adresse, code postal
         """
-        fingerprint_parts = []
+        return self.create_location_fingerprints(pd.DataFrame([row])).iloc[0]
+
+    def create_location_fingerprints(self, df):
+        """
+        Version par lot de create_location_fingerprint
+        Les adresses sont parsées une seule fois via parse_addresses
+        """
+        # Chaque partie porte son séparateur; les parties absentes valent ''
+        fingerprints = pd.Series('', index=df.index, dtype=object)
 
-        if 'boroughName' in row and not pd.isna(row['boroughName']):
-            borough = self.normalize_borough_name(row['boroughName'])
-            fingerprint_parts.append(f"B:{borough}")
+        if 'boroughName' in df.columns:
+            boroughs = df['boroughName']
+            normalized = self.borough_resolver.resolve_column(boroughs).astype(object)
+            fingerprints += ('B:' + normalized + '|').where(boroughs.notna(), '')
 
-        if 'address' in row:
-            components = self.extract_address_components(row['address'])
-            if components.get('postal_code'):
-                # Use first 3 characters of postal code (Forward Sortation Area)
-                fingerprint_parts.append(f"P:{components['postal_code'][:3]}")
-            if components.get('street_name'):
-                fingerprint_parts.append(f"S:{components['street_name'][:20]}")
+        if 'address' in df.columns:
+            components = self.parse_addresses(df['address']).replace('', None).astype(object)
+            # Use first 3 characters of postal code (Forward Sortation Area)
+            fingerprints += ('P:' + components['fsa'] + '|').fillna('')
+            fingerprints += ('S:' + components['street_name'].str[:20] + '|').fillna('')
 
-        return "|".join(fingerprint_parts) if fingerprint_parts else "UNKNOWN"
+        fingerprints = fingerprints.str[:-1]
+        return fingerprints.where(fingerprints != '', 'UNKNOWN')
 
     def match_by_proximity_proxy(self, buildings_df, risk_df, risk_type):
         """
@@ -127,7 +362,7 @@ class IntelligentMatcher:
         print(f"\nMatching buildings with {risk_type} data...")
 
         # Create location fingerprints for buildings
-        buildings_df['location_fp'] = buildings_df.apply(self.create_location_fingerprint, axis=1)
+        buildings_df['location_fp'] = self.create_location_fingerprints(buildings_df)
 
         # Strategy: Assign risk scores based on available location information
         # This simulates spatial analysis without actual coordinates
@@ -145,13 +380,79 @@ class IntelligentMatcher:
             borough_risks = {k: v/max_risk for k, v in borough_risks.items()}
 
             # Assign risk scores based on borough
-            for idx, row in matched_data.iterrows():
-                borough = self.normalize_borough_name(row.get('boroughName'))
-                if borough in borough_risks:
-                    matched_data.at[idx, f'{risk_type}_risk_score'] = borough_risks[borough]
+            if 'boroughName' in matched_data.columns:
+                matched_data[f'{risk_type}_risk_score'] = self.borough_resolver.map_values(
+                    matched_data['boroughName'], borough_risks, 0.0
+                )
 
         return matched_data
 
+    def build_flood_zone_index(self, flood_df):
+        """
+        Construit l'index spatial des zones inondables à partir de la
+        colonne de géométrie WKT (POLYGON / MULTIPOLYGON) du fichier
+        """
+        for column in flood_df.columns:
+            sample = flood_df[column].dropna().head(20).astype(str).str.lstrip().str.upper()
+            if sample.str.startswith(('POLYGON', 'MULTIPOLYGON')).any():
+                polygons = [parse_wkt_rings(wkt) for wkt in flood_df[column]]
+                print(f"Indexed {len(polygons)} flood zone polygons")
+                return PolygonGridIndex(polygons)
+
+        print("Warning: No WKT geometry column found in flood data")
+        return None
+
+    def assign_flood_zones(self, df, flood_index):
+        """
+        Appartenance réelle aux zones inondables pour les bâtiments géocodés
+        (requête par lot dans l'index spatial). Un bâtiment situé dans une zone
+        voit son risque d'inondation porté à FLOOD_ZONE_RISK; les autres
+        conservent le proxy du code postal
+        """
+        df['in_flood_zone'] = pd.array([pd.NA] * len(df), dtype='boolean')
+
+        lon_column, lat_column = BUILDING_COORDINATE_COLUMNS
+        if flood_index is None or lon_column not in df.columns or lat_column not in df.columns:
+            print("Flood zones: no geocoded buildings, keeping postal code proxy")
+            return df
+
+        x = df[lon_column].to_numpy(dtype=float, na_value=np.nan)
+        y = df[lat_column].to_numpy(dtype=float, na_value=np.nan)
+        geocoded = ~(np.isnan(x) | np.isnan(y))
+        inside = flood_index.contains(x, y)
+
+        df.loc[geocoded, 'in_flood_zone'] = inside[geocoded]
+        if 'postal_flood_risk' in df.columns:
+            df.loc[inside, 'postal_flood_risk'] = FLOOD_ZONE_RISK
+
+        print(f"Flood zones: {inside.sum()} of {geocoded.sum()} geocoded buildings inside a zone")
+        return df
+
+    def assign_heat_exposure(self, df, heat_grid):
+        """
+        Exposition aux îlots de chaleur lue dans la grille rastérisée
+        (une lecture d'indice par bâtiment géocodé). Pour ces bâtiments,
+        l'exposition mesurée remplace le proxy du code postal
+        """
+        df['heat_exposure'] = np.nan
+
+        lon_column, lat_column = BUILDING_COORDINATE_COLUMNS
+        if heat_grid is None or lon_column not in df.columns or lat_column not in df.columns:
+            print("Heat islands: no geocoded buildings, keeping postal code proxy")
+            return df
+
+        exposure = heat_grid.exposure(
+            df[lon_column].to_numpy(dtype=float, na_value=np.nan),
+            df[lat_column].to_numpy(dtype=float, na_value=np.nan)
+        )
+        geocoded = ~np.isnan(exposure)
+        df['heat_exposure'] = exposure
+        if 'postal_heat_risk' in df.columns:
+            df.loc[geocoded, 'postal_heat_risk'] = exposure[geocoded]
+
+        print(f"Heat islands: exposure assigned to {geocoded.sum()} geocoded buildings")
+        return df
+
     def enrich_with_postal_code_intelligence(self, df):
         """
         Enrichit les données avec l'intelligence des codes postaux
@@ -177,16 +478,17 @@ class IntelligentMatcher:
         df['postal_flood_risk'] = 0.5  # Default medium risk
         df['postal_heat_risk'] = 0.5
 
-        for idx, row in df.iterrows():
-            if 'address' in row:
-                components = self.extract_address_components(row['address'])
-                if components.get('postal_code'):
-                    prefix = components['postal_code'][:2]
-                    df.at[idx, 'postal_prefix'] = prefix
+        if 'address' in df.columns:
+            prefix = self.parse_addresses(df['address'])['postal_code'].str[:2].astype(object)
+            df['postal_prefix'] = prefix.where(prefix.notna(), None)
 
-                    if prefix in postal_risk_mapping:
-                        df.at[idx, 'postal_flood_risk'] = postal_risk_mapping[prefix]['flood_risk']
-                        df.at[idx, 'postal_heat_risk'] = postal_risk_mapping[prefix]['heat_risk']
+            known = prefix.isin(list(postal_risk_mapping))
+            df.loc[known, 'postal_flood_risk'] = prefix[known].map(
+                {p: risks['flood_risk'] for p, risks in postal_risk_mapping.items()}
+            )
+            df.loc[known, 'postal_heat_risk'] = prefix[known].map(
+                {p: risks['heat_risk'] for p, risks in postal_risk_mapping.items()}
+            )
 
         return df
 
@@ -196,13 +498,21 @@ def load_and_prepare_data():
     print("Loading datasets...")
 
     # Buildings
-    buildings = pd.read_csv(DATA_DIR / 'batiments-municipaux.csv')
-    print(f"Loaded {len(buildings)} buildings")
+    buildings = apply_schema(pd.read_csv(DATA_FILES['buildings']))
+    print(f"Loaded {len(buildings)} buildings ({memory_usage_mb(buildings):.1f} MB)")
+
+    return {'buildings': buildings, **load_reference_data()}
+
 
+def load_reference_data():
+    """
+    Charge les données de référence (tout sauf les bâtiments), dont la taille
+    ne dépend pas du nombre de bâtiments à traiter
+    """
     # Energy consumption
     try:
-        consumption = pd.read_csv(DATA_DIR / 'consommation-energetique-plus-2000m2-municipaux-2023.csv',
-                                 encoding='utf-8')
+        consumption = pd.read_csv(DATA_FILES['consumption'],
+                                 encoding='utf-8', decimal=',')
         print(f"Loaded {len(consumption)} energy consumption records")
     except Exception as e:
         print(f"Warning: Could not load energy data: {e}")
@@ -210,38 +520,31 @@ def load_and_prepare_data():
 
     # Flood zones - try different separators
     try:
-        flood = pd.read_csv(DATA_DIR / 'vdq-zonesinondablesreglementees.csv',
+        flood = pd.read_csv(DATA_FILES['flood'],
                            sep=';', on_bad_lines='skip', encoding='latin1')
         print(f"Loaded {len(flood)} flood zone records")
     except Exception as e:
         print(f"Warning: Could not load flood data: {e}")
         flood = pd.DataFrame()
 
-    # Heat islands
+    # Heat islands - grille précalculée (rastérisée une seule fois, mémoire mappée)
     try:
-        with open(DATA_DIR / 'ilots-de-chaleur-images-satellite-2023.geojson', 'r', encoding='utf-8') as f:
-            heat_data = json.load(f)
-
-        # Extract features into DataFrame
-        heat_features = []
-        for feature in heat_data.get('features', []):
-            props = feature.get('properties', {})
-            heat_features.append(props)
-
-        heat = pd.DataFrame(heat_features) if heat_features else pd.DataFrame()
-        print(f"Loaded {len(heat)} heat island records")
+        heat = load_heat_grid(DATA_FILES['heat'])
+        if heat is not None:
+            print(f"Loaded heat island grid {heat.values.shape[0]}x{heat.values.shape[1]}")
+        else:
+            print("Warning: Heat island layer not found")
     except Exception as e:
         print(f"Warning: Could not load heat data: {e}")
-        heat = pd.DataFrame()
+        heat = None
 
     # Social vulnerability
-    vulnerability = pd.read_csv(DATA_DIR / 'IndiceCanadienDeVulnérabilitéSociale.csv', encoding='latin1')
+    vulnerability = pd.read_csv(DATA_FILES['vulnerability'], encoding='latin1')
     # Filter for Quebec only
     vulnerability = vulnerability[vulnerability['Province ou territoire'] == 'Québec']
     print(f"Loaded {len(vulnerability)} vulnerability records (Quebec)")
 
     return {
-        'buildings': buildings,
         'consumption': consumption,
         'flood': flood,
         'heat': heat,
@@ -249,33 +552,111 @@ def load_and_prepare_data():
     }
 
 
-if __name__ == "__main__":
-    # Load data
-    data = load_and_prepare_data()
+def prepare_enrichment(data, matcher=None):
+    """
+    Construit une seule fois les index utilisés par l'enrichissement
+    (zones inondables, adresses de la divulgation énergétique)
+    """
+    matcher = matcher or IntelligentMatcher()
+    consumption = data['consumption']
+    return {
+        'matcher': matcher,
+        'flood_index': matcher.build_flood_zone_index(data['flood']),
+        'heat': data['heat'],
+        'consumption': consumption,
+        'disclosure_index': None if consumption.empty else matcher.build_disclosure_index(consumption),
+    }
 
-    # Initialize matcher
-    matcher = IntelligentMatcher()
+
+def enrich_chunk(buildings, context):
+    """
+    Enrichit un bloc de bâtiments à partir des index de prepare_enrichment
+    Chaque bâtiment est enrichi indépendamment des autres: le résultat ne
+    dépend pas du découpage en blocs. Le bloc est modifié en place
+    """
+    matcher = context['matcher']
 
     # Enrich buildings with postal code intelligence
+    buildings = matcher.enrich_with_postal_code_intelligence(buildings)
+
+    # Flood zone membership (spatial index, geocoded buildings only)
+    buildings = matcher.assign_flood_zones(buildings, context['flood_index'])
+
+    # Heat island exposure (rasterized grid, geocoded buildings only)
+    buildings = matcher.assign_heat_exposure(buildings, context['heat'])
+
+    # Join measured energy data (fuzzy address matching)
+    buildings = matcher.attach_energy_disclosure(
+        buildings, context['consumption'], index=context['disclosure_index']
+    )
+
+    # Create location fingerprints
+    buildings['location_fingerprint'] = matcher.create_location_fingerprints(buildings)
+
+    return buildings
+
+
+def iter_enriched_chunks(chunks, data, matcher=None):
+    """
+    Enrichit une suite de blocs de bâtiments (mode flux)
+    Le mémo d'adresses du matcher est vidé à chaque bloc pour que la
+    mémoire reste bornée
+    """
+    context = prepare_enrichment(data, matcher)
+    for chunk in chunks:
+        context['matcher'].address_registry.clear()
+        yield enrich_chunk(chunk, context)
+
+
+def enrich_buildings(data, matcher=None):
+    """
+    Enrichit les bâtiments chargés par load_and_prepare_data
+    Les données d'entrée ne sont pas modifiées
+    """
     print("\n" + "="*80)
     print("ENRICHING BUILDINGS WITH POSTAL CODE INTELLIGENCE")
     print("="*80)
 
-    buildings_enriched = matcher.enrich_with_postal_code_intelligence(data['buildings'])
-
-    # Create location fingerprints
-    buildings_enriched['location_fingerprint'] = buildings_enriched.apply(
-        matcher.create_location_fingerprint, axis=1
-    )
+    context = prepare_enrichment(data, matcher)
+    buildings_enriched = apply_schema(enrich_chunk(data['buildings'].copy(), context))
 
     print("\nSample enriched buildings:")
     print(buildings_enriched[['buildingName', 'address', 'boroughName', 'postal_prefix',
                               'postal_flood_risk', 'postal_heat_risk', 'location_fingerprint']].head(10))
 
+    return buildings_enriched
+
+
+def save_enriched(buildings_enriched, output_stem=ENRICHED_OUTPUT, export_csv=True):
+    """
+    Sauvegarde les bâtiments enrichis: table colonnaire typée (lue par
+    l'étape de priorisation) et, en option, export CSV
+    """
+    if HAS_ARROW:
+        table_file = write_table(buildings_enriched, table_path(output_stem))
+        print(f"\nSaved enriched buildings to {table_file}")
+
+    if export_csv or not HAS_ARROW:
+        output_file = f"{output_stem}.csv"
+        buildings_enriched.to_csv(output_file, index=False, encoding='utf-8')
+        print(f"\nSaved enriched buildings to {output_file}")
+
+
+def main():
+    # Load data
+    data = load_and_prepare_data()
+
+    buildings_enriched = enrich_buildings(data)
+
     # Save enriched data
-    buildings_enriched.to_csv('output_buildings_enriched.csv', index=False, encoding='utf-8')
-    print(f"\nSaved enriched buildings to output_buildings_enriched.csv")
+    save_enriched(buildings_enriched)
 
     print("\n" + "="*80)
     print("INTELLIGENT MATCHING COMPLETE")
     print("="*80)
+
+    return buildings_enriched
+
+
+if __name__ == "__main__":
+    main()
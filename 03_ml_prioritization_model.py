@@ -11,12 +11,421 @@ Approche sans géomatique:
 import pandas as pd
 import numpy as np
 from sklearn.preprocessing import StandardScaler, MinMaxScaler
-from sklearn.ensemble import RandomForestClassifier, GradientBoostingRegressor
-from sklearn.cluster import KMeans
-from sklearn.decomposition import PCA
+from sklearn.ensemble import HistGradientBoostingRegressor
+from sklearn.model_selection import cross_val_score
+import sklearn
+from sklearn.cluster import KMeans, MiniBatchKMeans
+from scipy.optimize import linear_sum_assignment
+import hashlib
+import json
+import re
+import sys
 import warnings
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from pathlib import Path
 warnings.filterwarnings('ignore')
 
+from borough_resolver import SIMPLE_RESOLVER
+from building_schema import apply_schema, memory_usage_mb
+from columnar_io import HAS_ARROW, load_table, table_path, write_table
+from pipeline_files import CALIBRATION_FILE, ENRICHED_OUTPUT, PRIORITIZED_OUTPUT, TOP_100_OUTPUT
+from stage_cache import StageCache
+
+# Bandes d'incertitude du score (mode Monte Carlo)
+UNCERTAINTY_OUTPUT = 'output_priority_uncertainty.csv'
+
+# Modèles supervisés d'intensité (mesures de la divulgation énergétique),
+# réutilisés d'une exécution à l'autre tant que les données d'entraînement
+# et les paramètres ne changent pas
+ENERGY_MODEL_DIR = Path('.cache') / 'models'
+ENERGY_TARGETS = {
+    'energy_intensity': 'measured_energy_gj',      # GJ / m²
+    'ges_intensity': 'measured_ges_emissions',     # tCO2e / m²
+}
+ENERGY_MODEL_PARAMS = {
+    'max_iter': 300,
+    'learning_rate': 0.05,
+    'max_leaf_nodes': 15,
+    'min_samples_leaf': 10,
+    'l2_regularization': 1.0,
+    'random_state': 42,
+}
+MIN_TRAINING_BUILDINGS = 30
+
+CURRENT_YEAR = 2024
+
+# Seuils d'âge (années) et scores de risque associés
+AGE_RISK_BINS = np.array([10, 30, 50, 75])
+AGE_RISK_VALUES = np.array([0.1, 0.3, 0.6, 0.8, 1.0])
+AGE_RISK_UNKNOWN = 0.7
+
+# Usages énergivores
+HIGH_CONSUMPTION_USAGES = [
+    'PISCINE', 'ARÉNA', 'ARENA', 'CENTRE SPORTIF', 'BIBLIOTHÈQUE',
+    'CASERNE', 'HÔPITAL', 'CENTRE COMMUNAUTAIRE'
+]
+HIGH_CONSUMPTION_RE = re.compile('|'.join(re.escape(k) for k in HIGH_CONSUMPTION_USAGES))
+
+# Seuils d'étages (strictement supérieur) et scores associés
+FLOOR_RISK_BINS = np.array([2, 5, 10])
+FLOOR_RISK_VALUES = np.array([0.3, 0.5, 0.7, 0.9])
+
+# Mapping basé sur données connues de Montréal
+VULNERABILITY_BY_BOROUGH = {
+    'MONTREAL-NORD': 0.9,
+    'MERCIER-HOCHELAGA-MAISONNEUVE': 0.8,
+    'VILLERAY-SAINT-MICHEL-PARC-EXTENSION': 0.8,
+    'RIVIERE-DES-PRAIRIES-POINTE-AUX-TREMBLES': 0.7,
+    'R-D-P / P-A-T': 0.7,
+    'ROSEMONT-PETITE-PATRIE': 0.6,
+    'PLATEAU-MONT-ROYAL': 0.4,
+    'AHUNTSIC-CARTIERVILLE': 0.6,
+    'SUD-OUEST': 0.7,
+    'SAINT-LEONARD': 0.6,
+    'LASALLE': 0.6,
+    'VERDUN': 0.6,
+    'LACHINE': 0.6,
+    'VILLE-MARIE': 0.5,  # Mixte
+    'COTE-DES-NEIGES-NOTRE-DAME-DE-GRACE': 0.7,
+    'COTE-DES-NEIGES / N-D-DE-GRACE': 0.7,
+    'OUTREMONT': 0.2,
+    'ANJOU': 0.5,
+    'SAINT-LAURENT': 0.6,
+    'ILE-BIZARD-SAINTE-GENEVIEVE': 0.3,
+    'PIERREFONDS-ROXBORO': 0.4
+}
+
+# Pondération du score de priorité (somme = 1)
+PRIORITY_WEIGHTS = {
+    'energy_risk': 0.40,
+    'climate_risk': 0.30,
+    'social_vulnerability': 0.20,
+    'size_impact': 0.10,
+}
+AGE_CLIMATE_BONUS = 0.15
+N_CLUSTERS = 5
+# Mode de regroupement incrémental (MiniBatchKMeans)
+CLUSTER_BATCH_SIZE = 1024
+
+PRIORITY_LEVEL_BINS = [0, 40, 60, 80, 100]
+PRIORITY_LEVEL_LABELS = ['Low', 'Medium', 'High', 'Critical']
+
+# Règles de recommandation, dans l'ordre d'affichage: (textes, condition)
+# La condition reçoit col(nom) -> colonne du bâtiment (0 si absente) et le
+# score de priorité; chaque règle occupe un bit du masque des règles actives
+RECOMMENDATION_RULES = (
+    (("HAUTE PRIORITE - Intervention urgente recommandee",),
+     lambda col, score: score > 80),
+    (("PRIORITE MOYENNE-HAUTE",),
+     lambda col, score: (score > 60) & (score <= 80)),
+    (("PRIORITE MOYENNE",),
+     lambda col, score: (score > 40) & (score <= 60)),
+    (("Isolation thermique et remplacement des fenêtres",
+      "Mise à niveau du système de chauffage"),
+     lambda col, score: col('age_risk') > 0.6),
+    (("Audit énergétique complet",
+      "Installation de panneaux solaires si possible"),
+     lambda col, score: col('energy_risk') > 0.7),
+    (("Mesures de protection contre les inondations",),
+     lambda col, score: (col('climate_risk') > 0.6) & (col('postal_flood_risk') > 0.6)),
+    (("Imperméabilisation du sous-sol",),
+     lambda col, score: ((col('climate_risk') > 0.6) & (col('postal_flood_risk') > 0.6) &
+                         (col('has_basement') == 1))),
+    (("Installation de toits verts ou toits blancs",
+      "Augmentation de la végétation périmétrique",
+      "Système de climatisation efficace"),
+     lambda col, score: (col('climate_risk') > 0.6) & (col('postal_heat_risk') > 0.6)),
+    (("PRIORITÉ SOCIALE - Financement public recommandé",),
+     lambda col, score: col('social_vulnerability') > 0.7),
+)
+DEFAULT_RECOMMENDATION = "Suivi régulier"
+
+# Incertitude des proxys (écart-type d'un bruit normal, valeurs ramenées dans [0, 1]):
+# - social_vulnerability: valeur de chaque arrondissement (VULNERABILITY_BY_BOROUGH)
+# - postal_risk: risques inondation et chaleur de chaque préfixe postal
+# - age_unknown: risque d'âge des bâtiments sans année de construction
+UNCERTAINTY_SPREADS = {
+    'social_vulnerability': 0.10,
+    'postal_risk': 0.10,
+    'age_unknown': 0.15,
+}
+UNCERTAINTY_DRAWS = 1000
+# Tirages par tâche: une graine par tâche, résultats indépendants du nombre de processus
+UNCERTAINTY_TASK_DRAWS = 250
+UNCERTAINTY_QUANTILES = (0.10, 0.50, 0.90)
+
+
+@lru_cache(maxsize=None)
+def render_recommendations(mask):
+    """Texte des recommandations d'une combinaison de règles (masque de bits)"""
+    texts = [
+        text
+        for bit, (rule_texts, _) in enumerate(RECOMMENDATION_RULES) if mask >> bit & 1
+        for text in rule_texts
+    ]
+    return " | ".join(texts) if texts else DEFAULT_RECOMMENDATION
+
+
+def minmax_scale(values, data_min, data_max, feature_range=(0, 1)):
+    """
+    Transformation de MinMaxScaler à partir de bornes déjà connues
+    (mêmes opérations flottantes: résultat identique à fit_transform sur
+    la population qui a fourni les bornes)
+    """
+    data_range = data_max - data_min
+    if data_range < 10 * np.finfo(float).eps:
+        data_range = 1.0
+    scale = (feature_range[1] - feature_range[0]) / data_range
+    offset = feature_range[0] - data_min * scale
+
+    scaled = np.asarray(values, dtype=float) * scale
+    scaled += offset
+    return scaled
+
+
+class PopulationStatistics:
+    """
+    Statistiques de population accumulées bloc par bloc (mode flux)
+
+    - histogramme du nombre d'étages: médiane exacte, en mémoire bornée par
+      le nombre de valeurs distinctes
+    - bornes du nombre d'étages et du score de priorité brut
+    - colonnes numériques lues en float dans au moins un bloc: les blocs où
+      elles sont entières sont convertis, comme lors d'une lecture complète
+    """
+
+    def __init__(self):
+        self.n_rows = 0
+        self.floor_counts = {}
+        self.score_min = np.inf
+        self.score_max = -np.inf
+        self.float_columns = set()
+
+    def update_buildings(self, df):
+        """Accumule le nombre d'étages et les types d'un bloc de bâtiments"""
+        self.n_rows += len(df)
+        if 'floorAmount' in df.columns:
+            for value, count in df['floorAmount'].value_counts().items():
+                self.floor_counts[value] = self.floor_counts.get(value, 0) + count
+        self.float_columns.update(c for c in df.columns if df[c].dtype.kind == 'f')
+
+    def update_scores(self, raw_scores):
+        """Accumule les bornes du score brut d'un bloc"""
+        raw_scores = np.asarray(raw_scores, dtype=float)
+        if len(raw_scores) and not np.isnan(raw_scores).all():
+            self.score_min = min(self.score_min, np.nanmin(raw_scores))
+            self.score_max = max(self.score_max, np.nanmax(raw_scores))
+
+    @property
+    def floor_median(self):
+        """Médiane exacte du nombre d'étages (NaN si aucun n'est connu)"""
+        if not self.floor_counts:
+            return np.nan
+        values = np.array(sorted(self.floor_counts), dtype=float)
+        cumulative = np.cumsum([self.floor_counts[v] for v in sorted(self.floor_counts)])
+        n = cumulative[-1]
+        middle = values[np.searchsorted(cumulative, [(n - 1) // 2 + 1, n // 2 + 1])]
+        return middle[0] if n % 2 else np.mean(middle)
+
+    @property
+    def floor_stats(self):
+        """(médiane, min, max) du nombre d'étages après imputation par la médiane"""
+        if not self.floor_counts:
+            return np.nan, np.nan, np.nan
+        return self.floor_median, float(min(self.floor_counts)), float(max(self.floor_counts))
+
+    @property
+    def score_range(self):
+        if self.score_min > self.score_max:
+            return np.nan, np.nan
+        return self.score_min, self.score_max
+
+    def align_dtypes(self, df):
+        """Convertit en float les colonnes entières promues dans d'autres blocs"""
+        for column in df.columns:
+            if column in self.float_columns and df[column].dtype.kind in 'iu':
+                df[column] = df[column].astype(float)
+        return df
+
+
+class ScoringCalibration:
+    """
+    Calibration figée du score de priorité, ajustée une fois sur la population
+    de référence: nouveaux bâtiments scorés sans réajuster ni décaler les
+    scores existants
+
+    - floor_stats: (médiane, min, max) du nombre d'étages
+    - score_range: (min, max) du score brut
+    - age_climate_bonus: bonus âge x climat du score brut
+    - scaler_mean / scaler_scale / centroids: standardisation et centroïdes
+      K-Means de cluster_buildings (absents en mode flux)
+    """
+
+    def __init__(self, weights, floor_stats, score_range, feature_names=None,
+                 scaler_mean=None, scaler_scale=None, centroids=None, n_buildings=0,
+                 age_climate_bonus=AGE_CLIMATE_BONUS):
+        self.weights = dict(weights)
+        self.age_climate_bonus = float(age_climate_bonus)
+        self.floor_stats = tuple(float(v) for v in floor_stats)
+        self.score_range = tuple(float(v) for v in score_range)
+        self.feature_names = list(feature_names or [])
+        self.scaler_mean = None if scaler_mean is None else np.asarray(scaler_mean, dtype=float)
+        self.scaler_scale = None if scaler_scale is None else np.asarray(scaler_scale, dtype=float)
+        self.centroids = None if centroids is None else np.asarray(centroids, dtype=float)
+        self.n_buildings = int(n_buildings)
+
+    @classmethod
+    def from_statistics(cls, stats, weights=None):
+        """Calibration issue des statistiques du mode flux (sans clusters)"""
+        return cls(weights or PRIORITY_WEIGHTS, stats.floor_stats, stats.score_range,
+                   n_buildings=stats.n_rows)
+
+    def to_dict(self):
+        def as_list(values):
+            return None if values is None else values.tolist()
+
+        return {
+            'weights': self.weights,
+            'age_climate_bonus': self.age_climate_bonus,
+            'floor_stats': list(self.floor_stats),
+            'score_range': list(self.score_range),
+            'feature_names': self.feature_names,
+            'scaler_mean': as_list(self.scaler_mean),
+            'scaler_scale': as_list(self.scaler_scale),
+            'centroids': as_list(self.centroids),
+            'n_buildings': self.n_buildings,
+        }
+
+    @classmethod
+    def from_dict(cls, values):
+        return cls(values['weights'], values['floor_stats'], values['score_range'],
+                   values.get('feature_names'), values.get('scaler_mean'),
+                   values.get('scaler_scale'), values.get('centroids'),
+                   values.get('n_buildings', 0), values.get('age_climate_bonus', AGE_CLIMATE_BONUS))
+
+    def save(self, path=CALIBRATION_FILE):
+        Path(path).write_text(json.dumps(self.to_dict(), indent=2), encoding='utf-8')
+        return path
+
+    @classmethod
+    def load(cls, path=CALIBRATION_FILE):
+        return cls.from_dict(json.loads(Path(path).read_text(encoding='utf-8')))
+
+
+class EnergyIntensityModel:
+    """
+    Mode supervisé: modèles de gradient boosting par histogrammes entraînés
+    sur les bâtiments appariés à une mesure de la divulgation énergétique
+    (intensités énergie et GES par m², en log), mêmes features que
+    create_feature_matrix, prédiction de l'intensité de tous les bâtiments
+
+    Les modèles ajustés sont conservés sur disque sous une clé d'empreinte
+    des données d'entraînement, des paramètres et de la version de scikit-learn
+    """
+
+    def __init__(self, params=None, cache_dir=ENERGY_MODEL_DIR):
+        self.params = {**ENERGY_MODEL_PARAMS, **(params or {})}
+        self.cache = StageCache(cache_dir) if cache_dir is not None else None
+        self.models = {}
+        self.cv_scores = {}
+        self.feature_names = []
+        self.key = None
+
+    @staticmethod
+    def building_area(df):
+        """Surface du bâtiment (m²): la plus grande des surfaces renseignées (0 et 1 servent de valeurs manquantes)"""
+        area = np.fmax(df['buildingArea'].to_numpy(dtype=float, na_value=np.nan),
+                       df['builtArea'].to_numpy(dtype=float, na_value=np.nan))
+        return np.where(area > 1, area, np.nan)
+
+    def training_targets(self, df):
+        """
+        Intensités mesurées (log1p), NaN pour les bâtiments sans mesure
+        Rapportées à la superficie déclarée dans la divulgation, sinon à celle du bâtiment
+        """
+        area = self.building_area(df)
+        if 'measured_floor_area' in df.columns:
+            declared = df['measured_floor_area'].to_numpy(dtype=float, na_value=np.nan)
+            area = np.where(declared > 0, declared, area)
+        targets = {}
+        for target, column in ENERGY_TARGETS.items():
+            measured = df[column].to_numpy(dtype=float, na_value=np.nan) if column in df.columns \
+                else np.full(len(df), np.nan)
+            with np.errstate(invalid='ignore'):
+                targets[target] = np.log1p(np.where(measured >= 0, measured / area, np.nan))
+        return targets
+
+    def cache_key(self, X, targets):
+        digest = hashlib.sha256()
+        digest.update(json.dumps({'params': self.params, 'features': self.feature_names,
+                                  'sklearn': sklearn.__version__}, sort_keys=True).encode('utf-8'))
+        digest.update(np.ascontiguousarray(X).tobytes())
+        for target in sorted(targets):
+            digest.update(target.encode('utf-8'))
+            digest.update(np.ascontiguousarray(targets[target]).tobytes())
+        return digest.hexdigest()
+
+    def fit(self, df, features_df):
+        """Entraîne (ou recharge depuis le cache) un modèle par intensité"""
+        self.feature_names = features_df.columns.tolist()
+        X = features_df.to_numpy(dtype=float)
+        targets = self.training_targets(df)
+        self.key = self.cache_key(X, targets)
+
+        if self.cache is not None:
+            hit, fitted = self.cache.get(self.key)
+            if hit:
+                self.models, self.cv_scores = fitted['models'], fitted['cv_scores']
+                print(f"Energy models loaded from cache ({self.key[:12]})")
+                return self
+
+        for target, y in targets.items():
+            known = ~np.isnan(y)
+            if known.sum() < MIN_TRAINING_BUILDINGS:
+                print(f"Not enough measured buildings for {target} ({known.sum()})")
+                continue
+            model = HistGradientBoostingRegressor(**self.params)
+            self.cv_scores[target] = float(np.mean(
+                cross_val_score(model, X[known], y[known], cv=5, scoring='r2')
+            ))
+            self.models[target] = model.fit(X[known], y[known])
+            print(f"Trained {target} model on {known.sum()} measured buildings "
+                  f"(cross-validated R2 {self.cv_scores[target]:.2f})")
+
+        if self.cache is not None:
+            self.cache.put(self.key, {'models': self.models, 'cv_scores': self.cv_scores})
+        return self
+
+    def predict(self, df, features_df):
+        """
+        Intensités prédites (un appel par modèle pour tous les bâtiments) et
+        estimations totales: la mesure quand elle existe, sinon la prédiction
+        multipliée par la surface
+        """
+        X = features_df[self.feature_names].to_numpy(dtype=float)
+        area = self.building_area(df)
+        result = pd.DataFrame(index=df.index)
+
+        for target, column in ENERGY_TARGETS.items():
+            if target not in self.models:
+                continue
+            predicted = np.expm1(self.models[target].predict(X))
+            result[f'predicted_{target}'] = predicted
+            measured = df[column].to_numpy(dtype=float, na_value=np.nan) if column in df.columns \
+                else np.full(len(df), np.nan)
+            result[f"estimated_{column[len('measured_'):]}"] = np.where(
+                np.isnan(measured), predicted * area, measured
+            )
+
+        measured_any = df[list(ENERGY_TARGETS.values())].notna().any(axis=1) \
+            if set(ENERGY_TARGETS.values()) <= set(df.columns) else pd.Series(False, index=df.index)
+        result['energy_data_source'] = pd.Categorical(
+            np.where(measured_any, 'measured', 'predicted'), categories=['measured', 'predicted']
+        )
+        return result
+
+
 class BuildingRiskPrioritizer:
     """
     Modèle ML pour prioriser les bâtiments basé sur:
@@ -30,15 +439,18 @@ class BuildingRiskPrioritizer:
         self.scaler = StandardScaler()
         self.risk_scaler = MinMaxScaler()
         self.features = []
+        self.kmeans = None
+        self.centroids = None
+        self.calibration = None
 
     def calculate_building_age_risk(self, construction_year):
         """
         Les vieux bâtiments sont moins efficaces énergétiquement
         et plus vulnérables
         """
-        current_year = 2024
+        current_year = CURRENT_YEAR
         if pd.isna(construction_year) or construction_year == 0:
-            return 0.7  # Risk moyen si inconnu
+            return AGE_RISK_UNKNOWN  # Risk moyen si inconnu
 
         age = current_year - construction_year
 
@@ -91,10 +503,7 @@ class BuildingRiskPrioritizer:
             factors += 1
 
         # Usage factor - certains usages sont plus énergivores
-        high_consumption_usages = [
-            'PISCINE', 'ARÉNA', 'ARENA', 'CENTRE SPORTIF', 'BIBLIOTHÈQUE',
-            'CASERNE', 'HÔPITAL', 'CENTRE COMMUNAUTAIRE'
-        ]
+        high_consumption_usages = HIGH_CONSUMPTION_USAGES
 
         if 'usageName' in row and not pd.isna(row['usageName']):
             usage = str(row['usageName']).upper()
@@ -133,7 +542,10 @@ class BuildingRiskPrioritizer:
         return combined
 
     def normalize_borough_simple(self, borough):
-        """Normalisation simple des noms d'arrondissements"""
+        """
+        Normalisation simple des noms d'arrondissements
+        Calcul de référence ligne par ligne (voir SIMPLE_RESOLVER)
+        """
         if pd.isna(borough):
             return 'UNKNOWN'
 
@@ -156,81 +568,192 @@ class BuildingRiskPrioritizer:
         Proxy de vulnérabilité sociale basé sur l'arrondissement
         Certains arrondissements ont plus de défavorisation
         """
-        # Mapping basé sur données connues de Montréal
-        vulnerability_by_borough = {
-            'MONTREAL-NORD': 0.9,
-            'MERCIER-HOCHELAGA-MAISONNEUVE': 0.8,
-            'VILLERAY-SAINT-MICHEL-PARC-EXTENSION': 0.8,
-            'RIVIERE-DES-PRAIRIES-POINTE-AUX-TREMBLES': 0.7,
-            'R-D-P / P-A-T': 0.7,
-            'ROSEMONT-PETITE-PATRIE': 0.6,
-            'PLATEAU-MONT-ROYAL': 0.4,
-            'AHUNTSIC-CARTIERVILLE': 0.6,
-            'SUD-OUEST': 0.7,
-            'SAINT-LEONARD': 0.6,
-            'LASALLE': 0.6,
-            'VERDUN': 0.6,
-            'LACHINE': 0.6,
-            'VILLE-MARIE': 0.5,  # Mixte
-            'COTE-DES-NEIGES-NOTRE-DAME-DE-GRACE': 0.7,
-            'COTE-DES-NEIGES / N-D-DE-GRACE': 0.7,
-            'OUTREMONT': 0.2,
-            'ANJOU': 0.5,
-            'SAINT-LAURENT': 0.6,
-            'ILE-BIZARD-SAINTE-GENEVIEVE': 0.3,
-            'PIERREFONDS-ROXBORO': 0.4
-        }
+        vulnerability_by_borough = VULNERABILITY_BY_BOROUGH
 
         borough = self.normalize_borough_simple(row.get('boroughName', ''))
 
         return vulnerability_by_borough.get(borough, 0.5)
 
-    def create_feature_matrix(self, df):
+
+    @staticmethod
+    def _as_float_array(values):
+        """Convertit une colonne (éventuellement nullable) en tableau float64"""
+        return pd.Series(values).to_numpy(dtype=float, na_value=np.nan)
+
+    @classmethod
+    def _float_column(cls, df, column):
+        """Colonne de df en float64 (entiers nullables du schéma compact compris)"""
+        return pd.Series(cls._as_float_array(df[column]), index=df.index)
+
+    @staticmethod
+    def _lookup_by_category(values, func):
         """
-        Crée la matrice de features pour le modèle ML
+        Évalue func une seule fois par valeur distincte puis diffuse le
+        résultat via les codes de catégorie (le code -1 des NaN pointe
+        sur la dernière case de la table)
         """
-        print("\nCreating feature matrix...")
+        codes, uniques = pd.factorize(pd.Series(values))
+        table = np.array([func(value) for value in uniques] + [func(np.nan)])
+        return table[codes]
+
+    def calculate_building_age_risk_vectorized(self, construction_years):
+        """Version colonne de calculate_building_age_risk (lookup par classes d'âge)"""
+        years = self._as_float_array(construction_years)
+        unknown = np.isnan(years) | (years == 0)
+        age = CURRENT_YEAR - years
+        risk = AGE_RISK_VALUES[np.digitize(age, AGE_RISK_BINS)]
+        return np.where(unknown, AGE_RISK_UNKNOWN, risk)
+
+    def calculate_size_risk_vectorized(self, areas):
+        """Version colonne de calculate_size_risk"""
+        area = self._as_float_array(areas)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            size = np.fmin(1.0, np.log10(area + 1) / 6)
+        return np.where(np.isnan(area) | (area == 0), 0.5, size)
+
+    def estimate_energy_consumption_risk_vectorized(self, df):
+        """Version colonne de estimate_energy_consumption_risk"""
+        age_risk = None
+        if 'buildingConstrYear' in df.columns:
+            age_risk = self.calculate_building_age_risk_vectorized(df['buildingConstrYear'])
+        return self.combine_energy_risk(age_risk, *self._energy_risk_parts(df))
+
+    def _energy_risk_parts(self, df):
+        """
+        Termes du risque énergie autres que l'âge (taille, usage, étages) et
+        nombre de facteurs disponibles par bâtiment (âge compris)
+        """
+        n = len(df)
+        parts = []
+        factors = np.zeros(n)
+
+        # Age factor
+        if 'buildingConstrYear' in df.columns:
+            factors += 1
+
+        # Size factor - buildingArea, sinon builtArea
+        area = np.full(n, np.nan)
+        if 'builtArea' in df.columns:
+            area = self._as_float_array(df['builtArea'])
+        if 'buildingArea' in df.columns:
+            building_area = self._as_float_array(df['buildingArea'])
+            area = np.where(np.isnan(building_area), area, building_area)
+        has_area = ~np.isnan(area)
+        parts.append(np.where(has_area, self.calculate_size_risk_vectorized(area), 0.0))
+        factors += has_area
+
+        # Usage factor - masque de mots-clés évalué par usage distinct
+        if 'usageName' in df.columns:
+            has_usage = df['usageName'].notna().to_numpy()
+            is_high_consumption = self._lookup_by_category(
+                df['usageName'],
+                lambda usage: bool(HIGH_CONSUMPTION_RE.search(str(usage).upper()))
+            )
+            parts.append(np.where(has_usage, np.where(is_high_consumption, 0.8, 0.3), 0.0))
+            factors += has_usage
+
+        # Floor factor
+        if 'floorAmount' in df.columns:
+            floors = self._as_float_array(df['floorAmount'])
+            has_floors = ~np.isnan(floors)
+            floor_risk = FLOOR_RISK_VALUES[np.searchsorted(FLOOR_RISK_BINS, floors, side='left')]
+            parts.append(np.where(has_floors, floor_risk, 0.0))
+            factors += has_floors
+
+        return parts, factors
+
+    @staticmethod
+    def combine_energy_risk(age_risk, parts, factors):
+        """Moyenne des facteurs disponibles (age_risk: None si l'année est absente)"""
+        risk_score = np.zeros(len(factors))
+        if age_risk is not None:
+            risk_score += age_risk
+        for part in parts:
+            risk_score += part
+
+        with np.errstate(divide='ignore', invalid='ignore'):
+            return np.where(factors > 0, risk_score / factors, 0.5)
+
+    def calculate_combined_climate_risk_vectorized(self, df):
+        """Version colonne de calculate_combined_climate_risk"""
+        flood_risk = self._as_float_array(df['postal_flood_risk']) if 'postal_flood_risk' in df.columns else 0.5
+        heat_risk = self._as_float_array(df['postal_heat_risk']) if 'postal_heat_risk' in df.columns else 0.5
 
-        features_df = pd.DataFrame()
+        combined = (flood_risk * 0.5) + (heat_risk * 0.5)
+
+        return np.broadcast_to(combined, (len(df),)).copy()
+
+    def calculate_social_vulnerability_proxy_vectorized(self, df):
+        """Version colonne de calculate_social_vulnerability_proxy (lookup par code d'arrondissement)"""
+        boroughs = df['boroughName'] if 'boroughName' in df.columns else pd.Series('', index=df.index)
+        return SIMPLE_RESOLVER.map_values(boroughs, VULNERABILITY_BY_BOROUGH, 0.5)
+
+    def _add_floor_and_basement_features(self, features_df, df, floor_stats=None):
+        """
+        Features 6 et 7 (étages normalisés, sous-sol)
+        floor_stats: (médiane, min, max) de la population (mode flux); par
+        défaut calculées sur df
+        """
+        # Feature 6: Floor count normalized
+        floors = self._float_column(df, 'floorAmount')
+        if floor_stats is None:
+            features_df['floor_count_norm'] = floors.fillna(floors.median())
+            features_df['floor_count_norm'] = MinMaxScaler().fit_transform(
+                features_df[['floor_count_norm']]
+            )
+        else:
+            # Bornes figées: un bâtiment hors bornes (nouveau bâtiment) est
+            # ramené dans [0, 1], comme par l'ajustement sur la population
+            floor_median, floor_min, floor_max = floor_stats
+            features_df['floor_count_norm'] = np.clip(minmax_scale(
+                floors.fillna(floor_median), floor_min, floor_max
+            ), 0, 1)
+
+        # Feature 7: Has basement (risk d'inondation)
+        features_df['has_basement'] = (df['basementAmount'].fillna(0) > 0).astype(int)
+
+        return features_df
+
+    def compute_features(self, df, floor_stats=None):
+        """
+        Moteur de features vectorisé: chaque feature est calculée sur des
+        colonnes entières au lieu d'un appel Python par bâtiment
+        """
+        features_df = pd.DataFrame(index=df.index)
 
         # Feature 1: Age Risk
-        features_df['age_risk'] = df.apply(
-            lambda row: self.calculate_building_age_risk(row.get('buildingConstrYear')),
-            axis=1
+        features_df['age_risk'] = self.calculate_building_age_risk_vectorized(
+            df['buildingConstrYear'] if 'buildingConstrYear' in df.columns
+            else pd.Series(np.nan, index=df.index)
         )
 
         # Feature 2: Size/Impact Potential
-        features_df['size_impact'] = df.apply(
-            lambda row: self.calculate_size_risk(row.get('buildingArea', row.get('builtArea', 0))),
-            axis=1
-        )
+        if 'buildingArea' in df.columns:
+            areas = df['buildingArea']
+        elif 'builtArea' in df.columns:
+            areas = df['builtArea']
+        else:
+            areas = pd.Series(0.0, index=df.index)
+        features_df['size_impact'] = self.calculate_size_risk_vectorized(areas)
 
         # Feature 3: Energy Consumption Risk (estimated)
-        features_df['energy_risk'] = df.apply(
-            self.estimate_energy_consumption_risk,
-            axis=1
-        )
+        features_df['energy_risk'] = self.estimate_energy_consumption_risk_vectorized(df)
 
         # Feature 4: Climate Risk (flood + heat)
-        features_df['climate_risk'] = df.apply(
-            self.calculate_combined_climate_risk,
-            axis=1
-        )
+        features_df['climate_risk'] = self.calculate_combined_climate_risk_vectorized(df)
 
         # Feature 5: Social Vulnerability
-        features_df['social_vulnerability'] = df.apply(
-            self.calculate_social_vulnerability_proxy,
-            axis=1
-        )
+        features_df['social_vulnerability'] = self.calculate_social_vulnerability_proxy_vectorized(df)
 
-        # Feature 6: Floor count normalized
-        features_df['floor_count_norm'] = df['floorAmount'].fillna(df['floorAmount'].median())
-        features_df['floor_count_norm'] = MinMaxScaler().fit_transform(
-            features_df[['floor_count_norm']]
-        )
+        return self._add_floor_and_basement_features(features_df, df, floor_stats)
 
-        # Feature 7: Has basement (risk d'inondation)
-        features_df['has_basement'] = (df['basementAmount'].fillna(0) > 0).astype(int)
+    def create_feature_matrix(self, df):
+        """
+        Crée la matrice de features pour le modèle ML
+        """
+        print("\nCreating feature matrix...")
+
+        features_df = self.compute_features(df)
 
         print(f"Created {len(features_df.columns)} features")
         print(features_df.describe())
@@ -238,41 +761,52 @@ class BuildingRiskPrioritizer:
         self.features = features_df.columns.tolist()
         return features_df
 
-    def calculate_priority_score(self, features_df):
+    def calculate_raw_priority_score(self, features_df, weights=None, age_climate_bonus=None):
+        """Score composite avant normalisation (ne dépend que du bâtiment)"""
+        weights = weights or PRIORITY_WEIGHTS
+        if age_climate_bonus is None:
+            age_climate_bonus = AGE_CLIMATE_BONUS
+        priority_score = sum(features_df[feature] * weight for feature, weight in weights.items())
+
+        # Bonus pour bâtiments très vieux avec risque combiné
+        bonus = (
+            (features_df['age_risk'] > 0.7) &
+            (features_df['climate_risk'] > 0.6)
+        ).astype(int) * age_climate_bonus
+
+        return priority_score + bonus
+
+    def calculate_priority_score(self, features_df, weights=None, score_range=None, age_climate_bonus=None):
         """
         Calcule un score de priorité composite
-        Approche multi-critères:
+        Approche multi-critères (PRIORITY_WEIGHTS par défaut):
         - 40% Potentiel de réduction GES (énergie)
         - 30% Vulnérabilité climatique
         - 20% Vulnérabilité sociale
         - 10% Impact (taille)
+        score_range: bornes (min, max) du score brut sur la population (mode
+        flux); par défaut calculées sur features_df
+        age_climate_bonus: bonus âge x climat (AGE_CLIMATE_BONUS par défaut)
         """
-        priority_score = (
-            features_df['energy_risk'] * 0.40 +
-            features_df['climate_risk'] * 0.30 +
-            features_df['social_vulnerability'] * 0.20 +
-            features_df['size_impact'] * 0.10
-        )
-
-        # Bonus pour bâtiments très vieux avec risque combiné
-        age_climate_bonus = (
-            (features_df['age_risk'] > 0.7) &
-            (features_df['climate_risk'] > 0.6)
-        ).astype(int) * 0.15
-
-        priority_score = priority_score + age_climate_bonus
+        priority_score = self.calculate_raw_priority_score(features_df, weights, age_climate_bonus)
 
         # Normaliser entre 0 et 100
+        if score_range is not None:
+            return minmax_scale(priority_score, *score_range, feature_range=(0, 100))
+
         priority_score = MinMaxScaler(feature_range=(0, 100)).fit_transform(
             priority_score.values.reshape(-1, 1)
         ).flatten()
 
         return priority_score
 
-    def cluster_buildings(self, features_df, n_clusters=5):
+    def cluster_buildings(self, features_df, n_clusters=N_CLUSTERS, previous=None):
         """
         Cluster les bâtiments en groupes similaires
         Pour identifier les typologies de risques
+        previous: calibration d'une exécution précédente; ses centroïdes
+        donnent leurs numéros aux clusters (voir _stable_labels)
+        Retourne (clusters, profils moyens standardisés par cluster)
         """
         print(f"\nClustering buildings into {n_clusters} groups...")
 
@@ -282,22 +816,253 @@ class BuildingRiskPrioritizer:
         # K-Means clustering
         kmeans = KMeans(n_clusters=n_clusters, random_state=42, n_init=10)
         clusters = kmeans.fit_predict(features_scaled)
+        self.kmeans = kmeans
+
+        previous_centroids = self._previous_centroids(previous, features_df.columns, n_clusters)
+        if previous_centroids is not None:
+            clusters = self._stable_labels(kmeans.cluster_centers_, clusters, previous_centroids)
+        else:
+            self.centroids = kmeans.cluster_centers_
 
-        # Analyze clusters
-        cluster_profiles = pd.DataFrame(features_scaled, columns=features_df.columns)
-        cluster_profiles['cluster'] = clusters
+        return clusters, self._cluster_profiles(features_scaled, clusters, features_df.columns)
+
+    def cluster_buildings_incremental(self, features_df, n_clusters=N_CLUSTERS, previous=None):
+        """
+        Regroupement incrémental: K-Means par mini-lots (un seul départ),
+        démarré depuis les centroïdes de la calibration précédente s'ils
+        existent; les clusters gardent alors leurs numéros d'une exécution à
+        l'autre. Sans calibration précédente, les clusters sont numérotés par
+        taille décroissante. Les nouveaux bâtiments s'affectent ensuite sans
+        réajustement (assign_clusters)
+        """
+        print(f"\nClustering buildings into {n_clusters} groups (incremental)...")
+        features_scaled = self.scaler.fit_transform(features_df)
+
+        previous_centroids = self._previous_centroids(previous, features_df.columns, n_clusters)
+        kmeans = MiniBatchKMeans(
+            n_clusters=n_clusters, random_state=42, batch_size=CLUSTER_BATCH_SIZE,
+            init=previous_centroids if previous_centroids is not None else 'k-means++',
+            n_init=1 if previous_centroids is not None else 3
+        )
+        clusters = kmeans.fit_predict(features_scaled)
+        self.kmeans = kmeans
+
+        if previous_centroids is None:
+            # Numérotation canonique: du plus grand au plus petit cluster
+            sizes = np.bincount(clusters, minlength=n_clusters)
+            mapping = np.empty(n_clusters, dtype=int)
+            mapping[np.argsort(-sizes, kind='stable')] = np.arange(n_clusters)
+            self.centroids = kmeans.cluster_centers_[np.argsort(mapping)]
+            clusters = mapping[clusters]
+        else:
+            clusters = self._stable_labels(kmeans.cluster_centers_, clusters, previous_centroids)
+
+        return clusters, self._cluster_profiles(features_scaled, clusters, features_df.columns)
+
+    def _previous_centroids(self, previous, columns, n_clusters):
+        """
+        Centroïdes d'une calibration précédente, exprimés dans la
+        standardisation courante (self.scaler vient d'être ajusté); None si
+        la calibration est absente ou incompatible
+        """
+        if (previous is None or previous.centroids is None or
+                previous.feature_names != list(columns) or len(previous.centroids) != n_clusters):
+            return None
+        raw = previous.centroids * previous.scaler_scale + previous.scaler_mean
+        return (raw - self.scaler.mean_) / self.scaler.scale_
+
+    def _stable_labels(self, centroids, clusters, previous_centroids):
+        """
+        Renumérote les clusters d'après les centroïdes précédents les plus
+        proches (affectation optimale): les rapports ne sont pas rebattus
+        """
+        distances = ((centroids[:, None, :] - previous_centroids[None, :, :]) ** 2).sum(axis=2)
+        rows, cols = linear_sum_assignment(distances)
+        mapping = np.empty(len(centroids), dtype=int)
+        mapping[rows] = cols
+        self.centroids = np.empty_like(centroids)
+        self.centroids[mapping] = centroids
+        return mapping[clusters]
+
+    @staticmethod
+    def _cluster_profiles(features_scaled, clusters, columns):
+        """Profil moyen (features standardisées) et taille de chaque cluster, en un seul groupby"""
+        grouped = pd.DataFrame(features_scaled, columns=columns).groupby(clusters)
+        profiles = grouped.mean()
+        profiles.insert(0, 'n_buildings', grouped.size())
+        profiles.index.name = 'cluster'
 
         print("\nCluster profiles:")
-        for i in range(n_clusters):
-            cluster_data = cluster_profiles[cluster_profiles['cluster'] == i]
-            print(f"\nCluster {i} (n={len(cluster_data)}):")
-            print(cluster_data.drop('cluster', axis=1).mean().round(3))
+        print(profiles.round(3).to_string())
+        return profiles
+
+    def fit_calibration(self, df, features_df, weights=None):
+        """
+        Fige la calibration de la population df (features_df = compute_features(df)):
+        mêmes bornes que celles ajustées par compute_features,
+        calculate_priority_score et cluster_buildings
+        """
+        floors = self._float_column(df, 'floorAmount')
+        floor_median = floors.median()
+        floors = floors.fillna(floor_median)
+        raw_score = self.calculate_raw_priority_score(features_df, weights).to_numpy(dtype=float)
+        fitted = self.centroids is not None and hasattr(self.scaler, 'mean_')
+
+        self.calibration = ScoringCalibration(
+            weights or PRIORITY_WEIGHTS,
+            floor_stats=(floor_median, floors.min(), floors.max()),
+            score_range=(np.nanmin(raw_score), np.nanmax(raw_score)),
+            feature_names=features_df.columns.tolist(),
+            scaler_mean=self.scaler.mean_ if fitted else None,
+            scaler_scale=self.scaler.scale_ if fitted else None,
+            centroids=self.centroids if fitted else None,
+            n_buildings=len(df),
+        )
+        return self.calibration
+
+    def save_calibration(self, path=CALIBRATION_FILE):
+        if self.calibration is None:
+            raise ValueError("No calibration to save: call fit_calibration first")
+        self.calibration.save(path)
+        print(f"[OK] Scoring calibration saved to {path}")
+
+    def load_calibration(self, path=CALIBRATION_FILE):
+        self.calibration = ScoringCalibration.load(path)
+        return self.calibration
+
+    def assign_clusters(self, features_df):
+        """Cluster le plus proche selon la standardisation et les centroïdes figés"""
+        calibration = self.calibration
+        X = features_df[calibration.feature_names].to_numpy(dtype=float)
+        X = (X - calibration.scaler_mean) / calibration.scaler_scale
+        distances = ((X[:, None, :] - calibration.centroids[None, :, :]) ** 2).sum(axis=2)
+        return distances.argmin(axis=1).astype(np.int32)
+
+    def score_batch(self, df):
+        """
+        Score de nouveaux bâtiments (déjà enrichis par 02) avec la calibration
+        figée, en O(nombre de lignes), sans réajuster la population: les scores
+        des bâtiments existants ne bougent pas. Hors des bornes de calibration,
+        le score est ramené dans [0, 100]
+        """
+        if self.calibration is None:
+            raise ValueError("No scoring calibration: call fit_calibration or load_calibration first")
+        calibration = self.calibration
+
+        buildings = df.copy()
+        features = self.compute_features(buildings, floor_stats=calibration.floor_stats)
+        priority_score = np.clip(
+            self.calculate_priority_score(features, calibration.weights, score_range=calibration.score_range,
+                                          age_climate_bonus=calibration.age_climate_bonus),
+            0, 100
+        )
+        clusters = self.assign_clusters(features) if calibration.centroids is not None else None
+
+        return annotate_priorities(buildings, features, priority_score, self, clusters)
+
+    def uncertainty_inputs(self, df, weights=None, spreads=None):
+        """
+        Décomposition des features selon les proxys incertains: tout ce qui
+        ne dépend pas d'un tirage est calculé une seule fois
+        """
+        spreads = {**UNCERTAINTY_SPREADS, **(spreads or {})}
+        features = self.compute_features(df)
+
+        years = (df['buildingConstrYear'] if 'buildingConstrYear' in df.columns
+                 else pd.Series(np.nan, index=df.index))
+        years = self._as_float_array(years)
+
+        boroughs = df['boroughName'] if 'boroughName' in df.columns else pd.Series('', index=df.index)
+        borough_codes, categories = SIMPLE_RESOLVER.resolve_codes(boroughs)
+        prefixes = df['postal_prefix'] if 'postal_prefix' in df.columns else pd.Series(None, index=df.index)
+        prefix_codes, prefix_uniques = pd.factorize(pd.Series(prefixes), use_na_sentinel=False)
+
+        energy_parts, energy_factors = self._energy_risk_parts(df)
+
+        def column(name):
+            return self._as_float_array(df[name]) if name in df.columns else np.full(len(df), 0.5)
+
+        return {
+            'features': {name: features[name].to_numpy(dtype=float) for name in features.columns},
+            'weights': weights or PRIORITY_WEIGHTS,
+            'spreads': spreads,
+            'age_risk': features['age_risk'].to_numpy(dtype=float),
+            'age_unknown': np.isnan(years) | (years == 0),
+            'age_in_energy': 'buildingConstrYear' in df.columns,
+            'energy_parts': energy_parts,
+            'energy_factors': energy_factors,
+            'borough_codes': borough_codes,
+            'borough_values': np.array([VULNERABILITY_BY_BOROUGH.get(c, 0.5) for c in categories] +
+                                       [VULNERABILITY_BY_BOROUGH.get(None, 0.5)]),
+            'prefix_codes': prefix_codes,
+            'n_prefixes': len(prefix_uniques),
+            'flood_risk': column('postal_flood_risk'),
+            'heat_risk': column('postal_heat_risk'),
+        }
 
-        return clusters, cluster_profiles
+    def score_uncertainty(self, df, n_draws=UNCERTAINTY_DRAWS, weights=None, spreads=None,
+                          max_workers=None, seed=42):
+        """
+        Mode incertitude: n_draws tirages des proxys (vulnérabilité par
+        arrondissement, risques par préfixe postal, risque d'âge par défaut),
+        chaque tirage scoré sur tous les bâtiments et normalisé comme
+        calculate_priority_score. Les tirages sont répartis sur un pool de
+        processus (max_workers=1: dans le processus courant)
+
+        Retourne, par bâtiment, les quantiles du score (score_p10, score_p50,
+        score_p90) et la probabilité de chaque niveau de priorité
+        """
+        inputs = self.uncertainty_inputs(df, weights, spreads)
+        sizes = [min(UNCERTAINTY_TASK_DRAWS, n_draws - start)
+                 for start in range(0, n_draws, UNCERTAINTY_TASK_DRAWS)]
+        tasks = list(zip(np.random.SeedSequence(seed).spawn(len(sizes)), sizes))
+
+        if max_workers == 1:
+            _init_uncertainty_worker(inputs)
+            blocks = [_uncertainty_draws(task) for task in tasks]
+        else:
+            with ProcessPoolExecutor(max_workers=max_workers, initializer=_init_uncertainty_worker,
+                                     initargs=(inputs,)) as executor:
+                blocks = list(executor.map(_uncertainty_draws, tasks))
+        scores = np.vstack([block_scores for block_scores, _ in blocks])
+        level_counts = sum(counts for _, counts in blocks)
+
+        result = pd.DataFrame(index=df.index)
+        for q, values in zip(UNCERTAINTY_QUANTILES, np.quantile(scores, UNCERTAINTY_QUANTILES, axis=0)):
+            result[f'score_p{round(q * 100):02d}'] = values
+
+        for i, label in enumerate(PRIORITY_LEVEL_LABELS):
+            result[f'prob_{label.lower()}'] = level_counts[:, i] / n_draws
+        return result
+
+    def create_intervention_recommendations_vectorized(self, df, priority_score):
+        """
+        Version colonne de create_intervention_recommendations: les règles de
+        RECOMMENDATION_RULES sont évaluées en masques booléens, leur
+        combinaison codée en entier, et le texte n'est produit qu'une fois par
+        combinaison distincte. Retourne une colonne catégorielle
+        """
+        def col(name):
+            if name not in df.columns:
+                return np.zeros(len(df))
+            return pd.to_numeric(df[name], errors='coerce').to_numpy(dtype=float)
+
+        score = np.asarray(priority_score, dtype=float)
+        masks = np.zeros(len(df), dtype=np.uint16)
+        for bit, (_, condition) in enumerate(RECOMMENDATION_RULES):
+            masks |= np.asarray(condition(col, score), dtype=np.uint16) << bit
+
+        combinations, codes = np.unique(masks, return_inverse=True)
+        categories = [render_recommendations(int(mask)) for mask in combinations]
+        return pd.Series(
+            pd.Categorical.from_codes(codes.reshape(-1), categories=categories),
+            index=df.index
+        )
 
     def create_intervention_recommendations(self, row, priority_score):
         """
         Génère des recommandations d'intervention basées sur le profil du bâtiment
+        Calcul de référence ligne par ligne (voir create_intervention_recommendations_vectorized)
         """
         recommendations = []
 
@@ -337,51 +1102,96 @@ class BuildingRiskPrioritizer:
         return " | ".join(recommendations) if recommendations else "Suivi régulier"
 
 
-def main():
-    print("="*80)
-    print("BUILDING RISK PRIORITIZATION MODEL")
-    print("="*80)
 
-    # Load enriched data
-    buildings = pd.read_csv('output_buildings_enriched.csv')
-    print(f"\nLoaded {len(buildings)} buildings")
+_UNCERTAINTY_INPUTS = None
 
-    # Initialize model
+
+def _init_uncertainty_worker(inputs):
+    """Données partagées par les tirages d'un processus (transmises une seule fois)"""
+    global _UNCERTAINTY_INPUTS
+    _UNCERTAINTY_INPUTS = inputs
+
+
+def _uncertainty_draws(task):
+    """
+    Tirages d'une tâche, générés avec sa propre graine: scores (tirages x
+    bâtiments, float32) et nombre de tirages par niveau de priorité
+    (bâtiments x niveaux, compté sur les scores en double précision)
+    """
+    seed, n_draws = task
+    inputs = _UNCERTAINTY_INPUTS
+    spreads = inputs['spreads']
+    rng = np.random.default_rng(seed)
     model = BuildingRiskPrioritizer()
 
-    # Create features
-    features = model.create_feature_matrix(buildings)
+    n_buildings = len(inputs['age_risk'])
+    scores = np.empty((n_draws, n_buildings), dtype=np.float32)
+    level_counts = np.zeros((n_buildings, len(PRIORITY_LEVEL_LABELS)), dtype=np.int64)
+    for draw in range(n_draws):
+        features = dict(inputs['features'])
+
+        # Risque d'âge par défaut (même valeur pour tous les bâtiments sans année)
+        age_default = np.clip(rng.normal(AGE_RISK_UNKNOWN, spreads['age_unknown']), 0, 1)
+        age_risk = np.where(inputs['age_unknown'], age_default, inputs['age_risk'])
+        features['age_risk'] = age_risk
+        features['energy_risk'] = model.combine_energy_risk(
+            age_risk if inputs['age_in_energy'] else None,
+            inputs['energy_parts'], inputs['energy_factors']
+        )
 
-    # Calculate priority scores
-    print("\nCalculating priority scores...")
-    buildings['priority_score'] = model.calculate_priority_score(features)
+        # Risques par préfixe postal et vulnérabilité par arrondissement
+        flood_noise = rng.normal(0, spreads['postal_risk'], inputs['n_prefixes'])
+        heat_noise = rng.normal(0, spreads['postal_risk'], inputs['n_prefixes'])
+        flood_risk = np.clip(inputs['flood_risk'] + flood_noise[inputs['prefix_codes']], 0, 1)
+        heat_risk = np.clip(inputs['heat_risk'] + heat_noise[inputs['prefix_codes']], 0, 1)
+        features['climate_risk'] = (flood_risk * 0.5) + (heat_risk * 0.5)
+
+        borough_values = np.clip(
+            inputs['borough_values'] + rng.normal(0, spreads['social_vulnerability'],
+                                                  len(inputs['borough_values'])),
+            0, 1
+        )
+        features['social_vulnerability'] = borough_values[inputs['borough_codes']]
+
+        raw_score = np.asarray(model.calculate_raw_priority_score(features, inputs['weights']), dtype=float)
+        score = minmax_scale(raw_score, np.nanmin(raw_score), np.nanmax(raw_score), feature_range=(0, 100))
+        scores[draw] = score
+
+        # Mêmes intervalles que pd.cut(PRIORITY_LEVEL_BINS): ]0, 40], ]40, 60], ...
+        levels = np.searchsorted(PRIORITY_LEVEL_BINS, score, side='left') - 1
+        valid = (levels >= 0) & (levels < len(PRIORITY_LEVEL_LABELS))
+        np.add.at(level_counts, (np.flatnonzero(valid), levels[valid]), 1)
+    return scores, level_counts
+
+
+def annotate_priorities(buildings, features, priority_score, model, clusters=None):
+    """
+    Ajoute aux bâtiments le score, le niveau de priorité, le cluster (s'il
+    est fourni), les scores détaillés, les recommandations et le potentiel
+    GES. Chaque ligne ne dépend que du bâtiment et de son score: utilisable
+    bloc par bloc. Les bâtiments sont modifiés en place
+    """
+    buildings['priority_score'] = priority_score
 
     # Classify priority levels
     buildings['priority_level'] = pd.cut(
         buildings['priority_score'],
-        bins=[0, 40, 60, 80, 100],
-        labels=['Low', 'Medium', 'High', 'Critical']
+        bins=PRIORITY_LEVEL_BINS,
+        labels=PRIORITY_LEVEL_LABELS
     )
 
-    # Cluster analysis
-    buildings['risk_cluster'], cluster_profiles = model.cluster_buildings(features, n_clusters=5)
+    if clusters is not None:
+        buildings['risk_cluster'] = clusters
 
     # Add individual feature scores for transparency
     for col in features.columns:
         buildings[f'score_{col}'] = features[col]
 
-    # Generate recommendations
-    print("\nGenerating intervention recommendations...")
-    buildings['recommendations'] = buildings.apply(
-        lambda row: model.create_intervention_recommendations(
-            row, row['priority_score']
-        ),
-        axis=1
+    # Generate recommendations (categorical: one text per rule combination)
+    buildings['recommendations'] = model.create_intervention_recommendations_vectorized(
+        buildings, buildings['priority_score']
     )
 
-    # Estimate impact
-    print("\nEstimating potential impact...")
-
     # GES reduction potential (tonnes CO2/year)
     # Basé sur: surface * facteur énergie * facteur âge
     buildings['estimated_ges_reduction_potential'] = (
@@ -391,8 +1201,58 @@ def main():
         2.5  # Facteur de conversion moyen
     )
 
-    # Sort by priority
-    buildings_sorted = buildings.sort_values('priority_score', ascending=False)
+    return buildings
+
+
+def prioritize_buildings(buildings, model=None, weights=None, n_clusters=N_CLUSTERS, supervised=False,
+                         clustering='full', previous_calibration=None):
+    """
+    Calcule scores, niveaux, clusters et recommandations
+    supervised: ajoute les intensités énergie / GES prédites (EnergyIntensityModel)
+    clustering: 'full' (K-Means, 10 départs) ou 'incremental' (mini-lots,
+    démarrés depuis les centroïdes de previous_calibration, chemin d'une
+    calibration sauvegardée, s'il est donné et existe);
+    dans les deux modes, les numéros de clusters suivent ceux de la
+    calibration précédente quand elle est compatible
+    Les données d'entrée ne sont pas modifiées
+    Retourne (buildings_sorted, features)
+    """
+    buildings = buildings.copy()
+
+    # Initialize model
+    model = model or BuildingRiskPrioritizer()
+
+    # Create features
+    features = model.create_feature_matrix(buildings)
+
+    # Calculate priority scores
+    print("\nCalculating priority scores...")
+    priority_score = model.calculate_priority_score(features, weights)
+
+    # Cluster analysis
+    previous = None
+    if previous_calibration and Path(previous_calibration).exists():
+        previous = ScoringCalibration.load(previous_calibration)
+    if clustering == 'incremental':
+        clusters, cluster_profiles = model.cluster_buildings_incremental(features, n_clusters, previous)
+    else:
+        clusters, cluster_profiles = model.cluster_buildings(features, n_clusters, previous)
+
+    # Freeze the population calibration (score_batch on new buildings)
+    model.fit_calibration(buildings, features, weights)
+
+    # Levels, recommendations and impact
+    print("\nGenerating intervention recommendations and estimating potential impact...")
+    buildings = annotate_priorities(buildings, features, priority_score, model, clusters)
+
+    # Supervised mode: energy and GES intensity learned from measured buildings
+    if supervised:
+        print("\nTraining energy intensity models on measured buildings...")
+        energy_model = EnergyIntensityModel().fit(buildings, features)
+        buildings = pd.concat([buildings, energy_model.predict(buildings, features)], axis=1)
+
+    # Sort by priority (float64 scores), then compact dtypes (building_schema)
+    buildings_sorted = apply_schema(buildings.sort_values('priority_score', ascending=False))
 
     # Display top priorities
     print("\n" + "="*80)
@@ -428,18 +1288,80 @@ def main():
     print(f"  Count: {len(vulnerable)}")
     print(f"  GES potential: {vulnerable['estimated_ges_reduction_potential'].sum():.1f} tonnes CO2/year")
 
+    return buildings_sorted, features
+
+
+def prioritize_and_calibrate(buildings, weights=None, n_clusters=N_CLUSTERS, supervised=False,
+                             clustering='full', previous_calibration=None):
+    """prioritize_buildings avec, en plus, la calibration figée de la population"""
+    model = BuildingRiskPrioritizer()
+    buildings_sorted, features = prioritize_buildings(buildings, model, weights, n_clusters, supervised,
+                                                      clustering, previous_calibration)
+    return buildings_sorted, features, model.calibration
+
+
+def save_outputs(buildings_sorted, output_stem=PRIORITIZED_OUTPUT,
+                 top_100_file=TOP_100_OUTPUT, export_csv=True):
+    """
+    Sauvegarde la liste priorisée complète (table colonnaire typée, lue par
+    le dashboard, et export CSV optionnel) et le top 100
+    """
     # Save results
-    output_file = 'output_buildings_prioritized.csv'
-    buildings_sorted.to_csv(output_file, index=False, encoding='utf-8-sig')
-    print(f"\n[OK] Results saved to {output_file}")
+    if HAS_ARROW:
+        table_file = write_table(buildings_sorted, table_path(output_stem))
+        print(f"\n[OK] Results saved to {table_file}")
+
+    if export_csv or not HAS_ARROW:
+        output_file = f"{output_stem}.csv"
+        buildings_sorted.to_csv(output_file, index=False, encoding='utf-8-sig')
+        print(f"\n[OK] Results saved to {output_file}")
 
     # Save top 100 priority list
-    top_100_file = 'output_top_100_priorities.csv'
     buildings_sorted.head(100).to_csv(top_100_file, index=False, encoding='utf-8-sig')
     print(f"[OK] Top 100 priorities saved to {top_100_file}")
 
+
+def main(supervised=False, clustering='full'):
+    print("="*80)
+    print("BUILDING RISK PRIORITIZATION MODEL")
+    print("="*80)
+
+    # Load enriched data
+    buildings = apply_schema(load_table(ENRICHED_OUTPUT))
+    print(f"\nLoaded {len(buildings)} buildings ({memory_usage_mb(buildings):.1f} MB)")
+
+    model = BuildingRiskPrioritizer()
+    buildings_sorted, features = prioritize_buildings(buildings, model, supervised=supervised,
+                                                      clustering=clustering,
+                                                      previous_calibration=CALIBRATION_FILE)
+    save_outputs(buildings_sorted)
+    model.save_calibration()
+
     return buildings_sorted, features
 
 
+def main_uncertainty(n_draws=UNCERTAINTY_DRAWS, output_file=UNCERTAINTY_OUTPUT):
+    """Bandes d'incertitude du score pour les bâtiments enrichis"""
+    print("="*80)
+    print("PRIORITY SCORE UNCERTAINTY (MONTE CARLO)")
+    print("="*80)
+
+    buildings = load_table(ENRICHED_OUTPUT)
+    print(f"\nLoaded {len(buildings)} buildings, {n_draws} draws")
+
+    uncertainty = BuildingRiskPrioritizer().score_uncertainty(buildings, n_draws=n_draws)
+    result = pd.concat([buildings[['buildingName', 'address', 'boroughName']], uncertainty], axis=1)
+    result = result.sort_values('score_p50', ascending=False)
+    result.to_csv(output_file, index=False, encoding='utf-8-sig')
+
+    print(result.head(20).to_string())
+    print(f"\n[OK] Uncertainty bands saved to {output_file}")
+    return result
+
+
 if __name__ == "__main__":
-    results, features = main()
+    if '--uncertainty' in sys.argv:
+        main_uncertainty()
+    else:
+        results, features = main(supervised='--supervised' in sys.argv,
+                                 clustering='incremental' if '--incremental' in sys.argv else 'full')
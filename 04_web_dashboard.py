@@ -3,6 +3,8 @@ Dashboard interactif pour la priorisation des bâtiments à risque
 Interface intuitive pour utilisateurs non-techniques
 """
 
+import functools
+
 import streamlit as st
 import pandas as pd
 import plotly.express as px
@@ -10,6 +12,33 @@ import plotly.graph_objects as go
 from plotly.subplots import make_subplots
 import numpy as np
 
+from building_list import DEFAULT_PAGE_SIZE, PAGE_SIZES, cached_csv_export, page_bounds, sort_positions
+from building_schema import apply_schema
+from columnar_io import read_table, table_version
+from filter_cube import SOCIAL_STEPS, FilterCube
+from filter_index import FilterIndex
+from scatter_lod import scatter_level_of_detail
+
+PRIORITIZED_TABLE = 'output_buildings_prioritized'
+
+# Colonnes utilisées par les filtres, indicateurs et graphiques
+DASHBOARD_COLUMNS = (
+    'buildingid', 'buildingName', 'address', 'boroughName', 'buildingConstrYear',
+    'priority_score', 'priority_level', 'recommendations',
+    'score_energy_risk', 'score_climate_risk', 'score_social_vulnerability',
+    'score_age_risk', 'score_size_impact',
+    'estimated_ges_reduction_potential',
+)
+
+# Colonnes de la liste complète (mode simplifié)
+LIST_COLUMNS = [
+    'buildingName', 'address', 'boroughName',
+    'priority_score', 'priority_level',
+    'score_energy_risk', 'score_climate_risk', 'score_social_vulnerability',
+    'estimated_ges_reduction_potential',
+    'recommendations'
+]
+
 # Configuration de la page
 st.set_page_config(
     page_title="Batiments a Risque - Montreal",
@@ -76,16 +105,66 @@ st.markdown("""
 </style>
 """, unsafe_allow_html=True)
 
-@st.cache_data
-def load_data():
-    """Charge les données de priorisation"""
-    try:
-        df = pd.read_csv('output_buildings_prioritized.csv', encoding='utf-8-sig')
-        return df
-    except FileNotFoundError:
+def data_version():
+    """Version de la table priorisée sur disque (arrête la page si elle est absente)"""
+    version = table_version(PRIORITIZED_TABLE)
+    if version is None:
         st.error("ATTENTION: Fichier de donnees non trouve. Veuillez executer le pipeline d'abord.")
         st.info("Executez: python run_full_pipeline.py")
         st.stop()
+    return version
+
+@st.cache_resource(max_entries=1)
+def load_dataset(version):
+    """
+    Table priorisée complète, chargée une fois par version du fichier et
+    partagée en lecture seule par toutes les sessions: la table Arrow est
+    mappée en mémoire (colonnes sans valeur manquante lues sans copie),
+    sinon le CSV est chargé. Une nouvelle sortie du pipeline remplace la
+    version précédente au prochain affichage
+    """
+    return apply_schema(read_table(version[0]))
+
+@st.cache_resource(max_entries=2)
+def load_data(version, columns=DASHBOARD_COLUMNS):
+    """
+    Colonnes de la table partagée, toutes si columns est None: la sélection
+    est faite une fois par version et partagée par toutes les sessions
+    (avant pandas 3, df[[...]] copie les colonnes)
+    """
+    df = load_dataset(version)
+    if columns is None:
+        return df
+    return df[[c for c in columns if c in df.columns]]
+
+@st.cache_resource(max_entries=1)
+def load_cube(version):
+    """Cube d'agrégats des filtres, construit une fois par version de la table"""
+    return FilterCube(load_data(version))
+
+@st.cache_resource(max_entries=1)
+def load_filter_index(version):
+    """Index des filtres sur les lignes (seuils et catégories), construit une fois par version"""
+    return FilterIndex(load_data(version), numeric_columns=('priority_score', 'score_social_vulnerability'),
+                       category_columns=('boroughName', 'priority_level'))
+
+@st.cache_data(max_entries=16)
+def sorted_list_positions(rows, column, ascending, version):
+    """Lignes filtrées (positions) triées pour la liste, par filtre et par tri"""
+    return sort_positions(load_data(version), rows, column, ascending)
+
+def export_filtered_csv(rows, filter_key, version):
+    """
+    Export CSV des lignes filtrées (toutes les colonnes): généré au premier
+    clic pour cet état des filtres, par blocs, puis transmis à Streamlit
+    sous forme de fichier ouvert (pas de copie en mémoire côté application)
+    """
+    path = cached_csv_export(lambda: load_dataset(version), rows, version[0], filter_key)
+    return open(path, 'rb')
+
+def column_label(column):
+    """Nom de colonne lisible pour les utilisateurs non techniques"""
+    return column.replace('score_', '').replace('_', ' ').title()
 
 def get_priority_color(priority_level):
     """Retourne la couleur selon le niveau de priorité"""
@@ -161,8 +240,12 @@ def main():
         - **Faible** (0-40): Suivi regulier
         """)
 
-    # Charger les données
-    df = load_data()
+    # Table partagée entre les sessions (rechargée si le pipeline l'a réécrite),
+    # cube d'agrégats et index des filtres; la session ne garde que des positions
+    version = data_version()
+    df = load_data(version)
+    cube = load_cube(version)
+    filter_index = load_filter_index(version)
 
     # Sidebar - Filtres
     st.sidebar.header("Filtres")
@@ -176,22 +259,31 @@ def main():
     selected_priority = st.sidebar.selectbox("Niveau de priorité", priority_levels)
 
     # Filtre par score minimum
-    min_score = st.sidebar.slider("Score de priorité minimum", 0, 100, 0)
-
-    # Filtre par vulnérabilité sociale
-    social_vuln_threshold = st.sidebar.slider("Vulnérabilité sociale minimum", 0.0, 1.0, 0.0)
-
-    # Appliquer les filtres
-    filtered_df = df.copy()
+    min_score = st.sidebar.slider("Score de priorité minimum", 0, 100, 0, step=1)
+
+    # Filtre par vulnérabilité sociale (pas des classes du cube)
+    social_vuln_threshold = st.sidebar.slider("Vulnérabilité sociale minimum", 0.0, 1.0, 0.0,
+                                              step=float(SOCIAL_STEPS[1]))
+
+    # Agrégats servis par le cube (indicateurs, niveaux, arrondissements, âges, corrélations)
+    selection = cube.select(
+        borough=None if selected_borough == 'Tous' else selected_borough,
+        priority_level=None if selected_priority == 'Tous' else selected_priority,
+        min_score=min_score,
+        min_social=social_vuln_threshold,
+    )
 
+    # Lignes filtrées (top 10, nuages de points, histogrammes, liste), lues dans l'index
+    categories = {}
     if selected_borough != 'Tous':
-        filtered_df = filtered_df[filtered_df['boroughName'] == selected_borough]
-
+        categories['boroughName'] = selected_borough
     if selected_priority != 'Tous':
-        filtered_df = filtered_df[filtered_df['priority_level'] == selected_priority]
-
-    filtered_df = filtered_df[filtered_df['priority_score'] >= min_score]
-    filtered_df = filtered_df[filtered_df['score_social_vulnerability'] >= social_vuln_threshold]
+        categories['priority_level'] = selected_priority
+    rows = filter_index.positions(
+        minimums={'priority_score': min_score, 'score_social_vulnerability': social_vuln_threshold},
+        categories=categories,
+    )
+    filtered_df = df if rows is None else df.iloc[rows]
 
     # Sidebar - Information
     st.sidebar.markdown("---")
@@ -209,16 +301,17 @@ def main():
     st.markdown("### Indicateurs Cles")
 
     col1, col2, col3, col4 = st.columns(4)
+    kpis = selection.kpis()
 
     with col1:
         st.metric(
             label="Bâtiments Analysés",
-            value=f"{len(filtered_df):,}",
-            delta=f"{len(filtered_df) / len(df) * 100:.1f}% du total"
+            value=f"{kpis['count']:,}",
+            delta=f"{kpis['count'] / len(df) * 100:.1f}% du total"
         )
 
     with col2:
-        critical_count = len(filtered_df[filtered_df['priority_level'] == 'Critical'])
+        critical_count = kpis['critical']
         st.metric(
             label="Priorité Critique",
             value=f"{critical_count}",
@@ -227,7 +320,7 @@ def main():
         )
 
     with col3:
-        total_ges = filtered_df['estimated_ges_reduction_potential'].sum()
+        total_ges = kpis['ges']
         st.metric(
             label="Potentiel GES",
             value=f"{total_ges:.0f} t",
@@ -235,11 +328,11 @@ def main():
         )
 
     with col4:
-        avg_score = filtered_df['priority_score'].mean()
+        avg_score = kpis['score_mean']
         st.metric(
             label="Score Moyen",
             value=f"{avg_score:.1f}/100",
-            delta=f"±{filtered_df['priority_score'].std():.1f}"
+            delta=f"±{kpis['score_std']:.1f}"
         )
 
     # Graphiques principaux
@@ -252,7 +345,8 @@ def main():
 
         with col1:
             # Distribution des priorités
-            priority_counts = filtered_df['priority_level'].value_counts()
+            priority_counts = selection.level_counts()
+            priority_counts = priority_counts[priority_counts > 0]
             fig_priority = px.pie(
                 values=priority_counts.values,
                 names=priority_counts.index,
@@ -290,8 +384,11 @@ def main():
         # Scatter plot multi-dimensionnel
         st.markdown("####  Analyse Multi-Critères")
 
+        # Niveau de détail: tous les points (WebGL) ou densité + échantillon stratifié
+        detail = scatter_level_of_detail(filtered_df, 'score_energy_risk', 'score_climate_risk')
+
         fig_scatter = px.scatter(
-            filtered_df,
+            detail['points'],
             x='score_energy_risk',
             y='score_climate_risk',
             size='estimated_ges_reduction_potential',
@@ -308,21 +405,32 @@ def main():
                 'High': '#ff8c00',
                 'Medium': '#ffd700',
                 'Low': '#90ee90'
-            }
+            },
+            render_mode='webgl'
         )
+        if detail['density'] is not None:
+            counts, x_centers, y_centers = detail['density']
+            fig_scatter.add_trace(go.Heatmap(
+                x=x_centers, y=y_centers, z=np.where(counts > 0, counts, np.nan).T,
+                colorscale='Greys', showscale=False, opacity=0.4, name='Densité',
+                hovertemplate="Bâtiments: %{z:.0f}<extra></extra>"
+            ))
+            # Densité sous les points
+            fig_scatter.data = fig_scatter.data[-1:] + fig_scatter.data[:-1]
         fig_scatter.update_layout(height=500)
         st.plotly_chart(fig_scatter, use_container_width=True)
+        if detail['sampled']:
+            st.caption(f"{detail['n_shown']:,} points affichés sur {detail['n_total']:,} bâtiments: "
+                       "échantillon stratifié par niveau (tous les bâtiments critiques), "
+                       "densité de l'ensemble en fond")
+        else:
+            st.caption(f"{detail['n_shown']:,} points affichés sur {detail['n_total']:,} bâtiments")
 
     with tab2:
         # Analyse par arrondissement
         st.markdown("#### ️ Statistiques par Arrondissement")
 
-        borough_stats = filtered_df.groupby('boroughName').agg({
-            'priority_score': 'mean',
-            'buildingid': 'count',
-            'estimated_ges_reduction_potential': 'sum',
-            'score_social_vulnerability': 'mean'
-        }).round(2)
+        borough_stats = selection.borough_stats().round(2)
 
         borough_stats.columns = ['Score Moyen', 'Nombre de Bâtiments', 'Potentiel GES Total', 'Vulnérabilité Sociale']
         borough_stats = borough_stats.sort_values('Score Moyen', ascending=False)
@@ -413,21 +521,8 @@ def main():
         # Analyse par âge de bâtiment
         st.markdown("#### ️ Analyse par Âge des Bâtiments")
 
-        # Create age bins
-        filtered_df_copy = filtered_df.copy()
-        current_year = 2024
-        filtered_df_copy['building_age'] = current_year - filtered_df_copy['buildingConstrYear']
-        filtered_df_copy['age_category'] = pd.cut(
-            filtered_df_copy['building_age'],
-            bins=[0, 20, 40, 60, 100, 200],
-            labels=['< 20 ans', '20-40 ans', '40-60 ans', '60-100 ans', '> 100 ans']
-        )
-
-        age_analysis = filtered_df_copy.groupby('age_category').agg({
-            'priority_score': 'mean',
-            'buildingid': 'count',
-            'estimated_ges_reduction_potential': 'mean'
-        }).round(2)
+        # Catégories d'âge (filter_cube.AGE_BINS)
+        age_analysis = selection.age_stats().round(2)
 
         fig_age = px.bar(
             age_analysis,
@@ -444,10 +539,7 @@ def main():
         # Matrice de corrélation
         st.markdown("####  Corrélations entre Facteurs (Pour Experts)")
 
-        corr_cols = ['score_energy_risk', 'score_climate_risk', 'score_social_vulnerability',
-                     'score_age_risk', 'score_size_impact', 'priority_score']
-
-        corr_matrix = filtered_df[corr_cols].corr()
+        corr_matrix = selection.correlation()
 
         fig_corr = px.imshow(
             corr_matrix,
@@ -468,25 +560,28 @@ def main():
         # Options d'affichage
         show_all_cols = st.checkbox("Afficher toutes les colonnes (mode expert)", value=False)
 
+        # Tri et pagination côté serveur: seule la page visible est construite
+        col_sort, col_order, col_size, col_page = st.columns(4)
+        sort_label = col_sort.selectbox("Trier par", [column_label(c) for c in LIST_COLUMNS],
+                                        index=LIST_COLUMNS.index('priority_score'))
+        sort_column = LIST_COLUMNS[[column_label(c) for c in LIST_COLUMNS].index(sort_label)]
+        ascending = col_order.selectbox("Ordre", ["Décroissant", "Croissant"]) == "Croissant"
+        page_size = col_size.selectbox("Lignes par page", PAGE_SIZES, index=PAGE_SIZES.index(DEFAULT_PAGE_SIZE))
+        n_pages = page_bounds(len(filtered_df), 1, page_size)[2]
+        page = col_page.number_input("Page", min_value=1, max_value=n_pages, value=1, step=1)
+        start, stop, _ = page_bounds(len(filtered_df), page, page_size)
+        page_rows = sorted_list_positions(rows, sort_column, ascending, version)[start:stop]
+
         if show_all_cols:
-            display_df = filtered_df
+            # Toutes les colonnes, chargées seulement en mode expert
+            display_df = load_data(version, columns=None).iloc[page_rows]
         else:
             # Colonnes simplifiées pour utilisateurs non-techniques
-            simple_cols = [
-                'buildingName', 'address', 'boroughName',
-                'priority_score', 'priority_level',
-                'score_energy_risk', 'score_climate_risk', 'score_social_vulnerability',
-                'estimated_ges_reduction_potential',
-                'recommendations'
-            ]
-            display_df = filtered_df[simple_cols]
+            display_df = df.iloc[page_rows][LIST_COLUMNS]
 
         # Renommer les colonnes pour plus de clarté
         display_df = display_df.copy()
-        display_df.columns = [
-            col.replace('score_', '').replace('_', ' ').title()
-            for col in display_df.columns
-        ]
+        display_df.columns = [column_label(col) for col in display_df.columns]
 
         # Colorier les lignes selon la priorité
         def highlight_priority(row):
@@ -500,18 +595,20 @@ def main():
                     return ['background-color: #fffee6'] * len(row)
             return [''] * len(row)
 
-        # Afficher avec styling
+        # Afficher avec styling (page visible uniquement)
         st.dataframe(
             display_df.style.apply(highlight_priority, axis=1),
             use_container_width=True,
             height=600
         )
+        st.caption(f"Bâtiments {min(start + 1, stop)}-{stop} sur {len(filtered_df):,} "
+                   f"(page {min(page, n_pages)}/{n_pages})")
 
-        # Bouton de téléchargement
-        csv = filtered_df.to_csv(index=False, encoding='utf-8-sig')
+        # Bouton de téléchargement: CSV généré seulement au clic
+        filter_key = (selected_borough, selected_priority, min_score, social_vuln_threshold)
         st.download_button(
             label=" Télécharger les résultats (CSV)",
-            data=csv,
+            data=functools.partial(export_filtered_csv, rows, filter_key, version),
             file_name='batiments_priorises.csv',
             mime='text/csv'
         )
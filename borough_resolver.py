@@ -0,0 +1,204 @@
+"""
+Résolution compilée des noms d'arrondissements
+Partagée par le matching intelligent (02) et le modèle de priorisation (03)
+
+Les tables de correspondance sont compilées une seule fois:
+- une table de hachage pour les correspondances exactes
+- un automate multi-motifs (Aho-Corasick) pour les variations contenues
+  dans le nom
+Une colonne complète est résolue via ses valeurs distinctes, et le résultat
+est exposé sous forme de codes de catégorie pandas.
+"""
+
+from collections import deque
+
+import numpy as np
+import pandas as pd
+
+# Mapping des variations communes -> nom standard (l'ordre définit la priorité)
+BOROUGH_VARIATIONS = {
+    'VILLE-MARIE': ['VILLE MARIE', 'VILLEMARIE', 'DOWNTOWN'],
+    'PLATEAU-MONT-ROYAL': ['PLATEAU', 'MONT ROYAL', 'MONT-ROYAL'],
+    'ROSEMONT-PETITE-PATRIE': ['ROSEMONT', 'PETITE PATRIE', 'PETITE-PATRIE'],
+    'MERCIER-HOCHELAGA-MAISONNEUVE': ['MERCIER', 'HOCHELAGA', 'MAISONNEUVE'],
+    'COTE-DES-NEIGES-NOTRE-DAME-DE-GRACE': ['CDN', 'NDG', 'COTE DES NEIGES'],
+    'VILLERAY-SAINT-MICHEL-PARC-EXTENSION': ['VILLERAY', 'SAINT MICHEL', 'PARC EXTENSION'],
+    'AHUNTSIC-CARTIERVILLE': ['AHUNTSIC', 'CARTIERVILLE'],
+    'SUD-OUEST': ['SUD OUEST', 'SOUTHWEST'],
+    'RIVIERE-DES-PRAIRIES-POINTE-AUX-TREMBLES': ['RDP', 'POINTE AUX TREMBLES'],
+    'SAINT-LEONARD': ['ST LEONARD', 'ST-LEONARD'],
+    'SAINT-LAURENT': ['ST LAURENT', 'ST-LAURENT'],
+    'VERDUN': ['VERDUN'],
+    'ILE-BIZARD-SAINTE-GENEVIEVE': ['ILE BIZARD', 'SAINTE GENEVIEVE'],
+    'LACHINE': ['LACHINE'],
+    'LASALLE': ['LASALLE', 'LA SALLE'],
+    'MONTREAL-NORD': ['MONTREAL NORD', 'NORTH MONTREAL'],
+    'OUTREMONT': ['OUTREMONT'],
+    'PIERREFONDS-ROXBORO': ['PIERREFONDS', 'ROXBORO'],
+    'ANJOU': ['ANJOU']
+}
+
+# Remplacement des caractères spéciaux (appliqués dans l'ordre)
+ACCENT_REPLACEMENTS = {
+    'É': 'E', 'È': 'E', 'Ê': 'E',
+    'À': 'A', 'Â': 'A',
+    'Î': 'I', 'Ô': 'O', 'Ù': 'U',
+    '-': '-', '/': '-', '  ': ' '
+}
+
+
+class PatternAutomaton:
+    """
+    Automate d'Aho-Corasick: trouve en une seule passe sur le texte
+    tous les motifs qu'il contient
+    """
+
+    def __init__(self, patterns):
+        self.goto = [{}]
+        self.fail = [0]
+        self.output = [set()]
+
+        for pattern_id, pattern in enumerate(patterns):
+            state = 0
+            for char in pattern:
+                next_state = self.goto[state].get(char)
+                if next_state is None:
+                    next_state = len(self.goto)
+                    self.goto.append({})
+                    self.fail.append(0)
+                    self.output.append(set())
+                    self.goto[state][char] = next_state
+                state = next_state
+            self.output[state].add(pattern_id)
+
+        # Liens d'échec calculés en largeur
+        queue = deque(self.goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for char, next_state in self.goto[state].items():
+                queue.append(next_state)
+                fallback = self.fail[state]
+                while fallback and char not in self.goto[fallback]:
+                    fallback = self.fail[fallback]
+                self.fail[next_state] = self.goto[fallback].get(char, 0)
+                self.output[next_state] |= self.output[self.fail[next_state]]
+
+    def find_all(self, text):
+        """Retourne l'ensemble des identifiants de motifs présents dans text"""
+        state = 0
+        found = set(self.output[0])
+        for char in text:
+            while state and char not in self.goto[state]:
+                state = self.fail[state]
+            state = self.goto[state].get(char, 0)
+            found |= self.output[state]
+        return found
+
+
+class BoroughResolver:
+    """
+    Résout les noms d'arrondissements bruts vers leur forme normalisée
+
+    - variations: {standard: [variations]} (ordre = priorité)
+    - replacements: remplacements de caractères appliqués après upper/strip
+    - missing: valeur retournée pour un nom manquant
+    """
+
+    def __init__(self, variations=None, replacements=None, missing=None):
+        self.missing = missing
+        self.standards = list((variations or {}).keys())
+
+        # Remplacements: caractères simples compilés en table de traduction,
+        # les remplacements multi-caractères sont appliqués ensuite
+        replacements = replacements or {}
+        self.translation = str.maketrans(
+            {old: new for old, new in replacements.items() if len(old) == 1}
+        )
+        self.multi_char_replacements = [
+            (old, new) for old, new in replacements.items() if len(old) > 1
+        ]
+
+        # Correspondances exactes: nom -> rang du standard
+        self.exact = {}
+        patterns = []
+        pattern_ranks = []
+        for rank, (standard, standard_variations) in enumerate((variations or {}).items()):
+            for name in [standard] + list(standard_variations):
+                self.exact.setdefault(name, rank)
+            for variation in standard_variations:
+                patterns.append(variation)
+                pattern_ranks.append(rank)
+
+        # Correspondances partielles: automate sur les variations
+        self.automaton = PatternAutomaton(patterns)
+        self.pattern_ranks = pattern_ranks
+
+        self._cache = {}
+
+    def canonicalize(self, borough):
+        """Met en forme un nom brut (majuscules, espaces, caractères spéciaux)"""
+        borough = str(borough).upper().strip().translate(self.translation)
+        for old, new in self.multi_char_replacements:
+            borough = borough.replace(old, new)
+        return borough
+
+    def resolve(self, borough):
+        """Résout un nom d'arrondissement (mémoïsé)"""
+        if pd.isna(borough):
+            return self.missing
+
+        if borough in self._cache:
+            return self._cache[borough]
+
+        key = self.canonicalize(borough)
+
+        # Le premier standard (dans l'ordre du mapping) qui correspond gagne
+        ranks = [self.pattern_ranks[i] for i in self.automaton.find_all(key)]
+        if key in self.exact:
+            ranks.append(self.exact[key])
+        resolved = self.standards[min(ranks)] if ranks else key
+
+        self._cache[borough] = resolved
+        return resolved
+
+    def resolve_codes(self, boroughs):
+        """
+        Résout une colonne complète via ses valeurs distinctes
+
+        Retourne (codes, categories): codes est un tableau d'entiers indexant
+        categories, -1 pour les noms non résolus (missing=None)
+        """
+        codes, uniques = pd.factorize(pd.Series(boroughs))
+        resolved = [self.resolve(borough) for borough in uniques] + [self.resolve(np.nan)]
+
+        categories = pd.Index(pd.unique(pd.Series([r for r in resolved if r is not None], dtype=object)))
+        unique_codes = np.array(
+            [categories.get_loc(r) if r is not None else -1 for r in resolved], dtype=np.int32
+        )
+
+        # Le code -1 de factorize pointe sur la dernière case (valeur manquante)
+        return unique_codes[codes], categories
+
+    def resolve_column(self, boroughs):
+        """Résout une colonne complète et retourne une série Categorical"""
+        boroughs = pd.Series(boroughs)
+        codes, categories = self.resolve_codes(boroughs)
+        return pd.Series(
+            pd.Categorical.from_codes(codes, categories=categories),
+            index=boroughs.index,
+            name=boroughs.name
+        )
+
+    def map_values(self, boroughs, mapping, default):
+        """
+        Associe une valeur à chaque bâtiment à partir de son arrondissement
+        résolu, par indexation directe sur les codes de catégorie
+        """
+        codes, categories = self.resolve_codes(boroughs)
+        table = np.array([mapping.get(c, default) for c in categories] + [mapping.get(None, default)])
+        return table[codes]
+
+
+# Résolveurs partagés, compilés une seule fois à l'import
+MATCHING_RESOLVER = BoroughResolver(variations=BOROUGH_VARIATIONS)
+SIMPLE_RESOLVER = BoroughResolver(replacements=ACCENT_REPLACEMENTS, missing='UNKNOWN')
@@ -0,0 +1,95 @@
+"""
+Liste paginée des bâtiments et export CSV du dashboard
+
+- tri côté serveur des lignes filtrées (positions), une page à la fois à
+  l'affichage: la mise en forme ne porte que sur les lignes visibles
+- export CSV écrit par blocs de lignes dans `.cache/exports/`, une seule
+  fois par version de la table et par état des filtres; les exports les
+  plus anciens sont supprimés au-delà de EXPORT_MAX_FILES
+"""
+
+import hashlib
+import math
+import os
+from pathlib import Path
+
+import numpy as np
+
+PAGE_SIZES = (25, 50, 100, 250)
+DEFAULT_PAGE_SIZE = 50
+
+EXPORT_DIR = Path('.cache') / 'exports'
+EXPORT_CHUNK_ROWS = 50_000
+EXPORT_MAX_FILES = 8
+
+
+def sort_positions(df, rows, column, ascending=False):
+    """
+    Positions des lignes retenues (rows, None: toutes) triées par column
+    Tri stable (l'ordre de la table départage les ex aequo), valeurs
+    manquantes en dernier
+    """
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows)
+    values = df[column].take(rows).reset_index(drop=True)
+    order = values.sort_values(ascending=ascending, kind='stable', na_position='last').index.to_numpy()
+    return rows[order]
+
+
+def page_bounds(n_rows, page, page_size=DEFAULT_PAGE_SIZE):
+    """(début, fin, nombre de pages) de la page demandée (numérotée à partir de 1)"""
+    n_pages = max(1, math.ceil(n_rows / page_size))
+    page = min(max(page, 1), n_pages)
+    start = (page - 1) * page_size
+    return start, min(start + page_size, n_rows), n_pages
+
+
+def export_path(table_file, filter_key, export_dir=EXPORT_DIR):
+    """Fichier d'export d'un état des filtres pour la version courante de la table"""
+    stat = Path(table_file).stat()
+    digest = hashlib.sha256(
+        repr((str(table_file), stat.st_size, stat.st_mtime_ns, filter_key)).encode('utf-8')
+    ).hexdigest()
+    return Path(export_dir) / f"{digest[:24]}.csv"
+
+
+def write_csv_export(df, rows, path, chunk_size=EXPORT_CHUNK_ROWS):
+    """
+    Écrit les lignes rows (None: toutes) de df en CSV, bloc par bloc
+    L'écriture passe par un fichier temporaire: un export partiel n'est
+    jamais réutilisé
+    """
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    tmp_path = path.with_name(path.name + '.tmp')
+    rows = np.arange(len(df)) if rows is None else np.asarray(rows)
+
+    try:
+        with open(tmp_path, 'w', encoding='utf-8-sig', newline='') as handle:
+            for start in range(0, max(len(rows), 1), chunk_size):
+                df.iloc[rows[start:start + chunk_size]].to_csv(handle, index=False, header=start == 0)
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    prune_exports(path.parent)
+    return path
+
+
+def prune_exports(export_dir=EXPORT_DIR, keep=EXPORT_MAX_FILES):
+    """Supprime les exports les moins récemment utilisés au-delà de keep"""
+    exports = sorted(Path(export_dir).glob('*.csv'), key=lambda p: p.stat().st_mtime_ns, reverse=True)
+    for stale in exports[keep:]:
+        stale.unlink(missing_ok=True)
+
+
+def cached_csv_export(load_frame, rows, table_file, filter_key, export_dir=EXPORT_DIR):
+    """
+    Export CSV d'un état des filtres: écrit au premier appel (load_frame()
+    fournit la table complète), relu ensuite tant que la table ne change pas
+    """
+    path = export_path(table_file, filter_key, export_dir)
+    if path.exists():
+        path.touch()
+        return path
+    return write_csv_export(load_frame(), rows, path)
@@ -0,0 +1,83 @@
+"""
+Schéma compact des tables de bâtiments, commun à toutes les étapes
+(chargement, enrichissement, priorisation, dashboard)
+
+- chaînes à faible cardinalité (arrondissement, usage, profil, statut,
+  préfixe postal, empreintes de localisation, niveaux, recommandations):
+  catégories
+- années, étages, sous-sols, ascenseurs, cluster: entiers nullables courts
+- scores calculés (appariement, priorité, potentiel GES): float32
+
+Les mesures (surfaces, consommation, émissions) et les risques qui entrent
+dans le calcul du score restent en float64: les scores ne dépendent pas du
+chemin de chargement (pipeline en mémoire, table Arrow ou CSV). Les noms et
+adresses, presque tous distincts, restent des chaînes.
+"""
+
+import numpy as np
+
+CATEGORY_COLUMNS = (
+    'propertyStatus', 'categoryDescription', 'buildingProfile', 'usageName', 'boroughName',
+    'postal_prefix', 'location_fp', 'location_fingerprint',
+    'priority_level', 'recommendations', 'energy_data_source',
+)
+
+# Entiers nullables: conversion seulement si toutes les valeurs sont entières
+# et dans les bornes du type (sinon la colonne est laissée telle quelle)
+SMALL_INT_COLUMNS = {
+    'buildingConstrYear': 'Int16',
+    'floorAmount': 'Int8',
+    'basementAmount': 'Int8',
+    'verticalTransportAmount': 'Int8',
+    'risk_cluster': 'Int8',
+}
+
+# Scores du modèle (les scores détaillés score_* sont reconnus par préfixe)
+SCORE_COLUMNS = (
+    'energy_match_score', 'priority_score', 'estimated_ges_reduction_potential',
+    'predicted_energy_intensity', 'predicted_ges_intensity',
+    'estimated_energy_gj', 'estimated_ges_emissions',
+)
+SCORE_PREFIX = 'score_'
+
+
+def column_dtype(column, dtype):
+    """Type compact déclaré pour une colonne (None: type conservé)"""
+    if column in CATEGORY_COLUMNS:
+        return 'category'
+    if column in SMALL_INT_COLUMNS:
+        return SMALL_INT_COLUMNS[column]
+    if column in SCORE_COLUMNS or column.startswith(SCORE_PREFIX):
+        # Scores binaires (score_has_basement): entier court
+        return 'int8' if dtype.kind in 'iub' else 'float32'
+    return None
+
+
+def _fits_small_int(series, dtype):
+    """Vrai si les valeurs connues sont entières et tiennent dans dtype"""
+    values = series.to_numpy(dtype=float, na_value=np.nan)
+    values = values[~np.isnan(values)]
+    info = np.iinfo(dtype.lower())
+    return bool(np.all(values == np.round(values)) and
+                (not len(values) or (values.min() >= info.min and values.max() <= info.max)))
+
+
+def apply_schema(df):
+    """
+    Convertit les colonnes présentes au schéma compact (df modifié en place)
+    et retourne df; les colonnes non déclarées sont inchangées
+    """
+    for column in df.columns:
+        series = df[column]
+        dtype = column_dtype(column, series.dtype)
+        if dtype is None or series.dtype == dtype:
+            continue
+        if column in SMALL_INT_COLUMNS and not (series.dtype.kind in 'iuf' and _fits_small_int(series, dtype)):
+            continue
+        df[column] = series.astype(dtype)
+    return df
+
+
+def memory_usage_mb(df):
+    """Mémoire résidente d'une table (chaînes comprises), en Mo"""
+    return df.memory_usage(deep=True).sum() / 1e6
@@ -0,0 +1,127 @@
+"""
+Stockage colonnaire typé des tables intermédiaires du pipeline
+Les tables sont écrites au format Arrow IPC non compressé: la lecture se
+fait par mappage mémoire (sans copie pour les colonnes numériques), seules
+les colonnes demandées sont matérialisées et les types pandas (catégories,
+booléens, chaînes) sont conservés. Parquet est aussi accepté; le CSV reste
+le format d'export.
+
+pyarrow est optionnel: sans lui, les tables sont lues et écrites en CSV.
+"""
+
+import os
+from pathlib import Path
+
+import pandas as pd
+
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+HAS_ARROW = pa is not None
+ARROW_SUFFIXES = ('.arrow', '.feather')
+# Ordre de préférence à la lecture d'une table désignée sans extension
+TABLE_SUFFIXES = ('.arrow', '.parquet', '.csv')
+
+
+def table_path(stem):
+    """Chemin de la table à écrire: .arrow si pyarrow est disponible, sinon .csv"""
+    return Path(stem).with_suffix('.arrow' if HAS_ARROW else '.csv')
+
+
+def find_table(stem):
+    """Première version existante de la table (arrow, parquet puis csv), sinon None"""
+    stem = Path(stem)
+    for suffix in TABLE_SUFFIXES:
+        if suffix != '.csv' and not HAS_ARROW:
+            continue
+        path = stem.with_suffix(suffix)
+        if path.exists():
+            return path
+    return None
+
+
+def table_version(stem):
+    """
+    Version de la meilleure table disponible: (chemin, inode, taille, date de
+    modification), None si aucune. Change à chaque écriture de la table
+    (write_table remplace le fichier)
+    """
+    path = find_table(stem)
+    if path is None:
+        return None
+    stat = path.stat()
+    return str(path), stat.st_ino, stat.st_size, stat.st_mtime_ns
+
+
+def write_table(df, path):
+    """
+    Écrit une table selon l'extension du chemin (.arrow/.feather, .parquet, .csv)
+    L'écriture passe par un fichier temporaire: un lecteur concurrent ne voit
+    jamais de fichier partiel
+    """
+    path = Path(path)
+    tmp_path = path.with_name(path.name + '.tmp')
+    df = df.reset_index(drop=True)
+
+    try:
+        if path.suffix == '.csv':
+            df.to_csv(tmp_path, index=False, encoding='utf-8-sig')
+        elif not HAS_ARROW:
+            raise ImportError(f"pyarrow is required to write {path}")
+        elif path.suffix in ARROW_SUFFIXES:
+            table = pa.Table.from_pandas(df, preserve_index=False)
+            with pa.OSFile(str(tmp_path), 'wb') as sink:
+                with pa.ipc.new_file(sink, table.schema) as writer:
+                    writer.write_table(table)
+        elif path.suffix == '.parquet':
+            pq.write_table(pa.Table.from_pandas(df, preserve_index=False), tmp_path)
+        else:
+            raise ValueError(f"Unsupported table format: {path.suffix}")
+        os.replace(tmp_path, path)
+    finally:
+        if tmp_path.exists():
+            tmp_path.unlink()
+
+    return path
+
+
+def read_table(path, columns=None):
+    """
+    Lit une table selon l'extension du chemin
+    columns: colonnes à charger (toutes si None); les colonnes absentes
+    de la table sont ignorées
+    """
+    path = Path(path)
+
+    if path.suffix == '.csv':
+        if columns is not None:
+            header = pd.read_csv(path, nrows=0, encoding='utf-8-sig').columns
+            columns = [c for c in columns if c in header]
+        return pd.read_csv(path, usecols=columns, encoding='utf-8-sig')
+
+    if path.suffix in ARROW_SUFFIXES:
+        # Mappage mémoire: seules les colonnes sélectionnées sont lues
+        table = pa.ipc.open_file(pa.memory_map(str(path), 'r')).read_all()
+    elif path.suffix == '.parquet':
+        schema = pq.read_schema(path)
+        if columns is not None:
+            columns = [c for c in columns if c in schema.names]
+        table = pq.read_table(path, columns=columns, memory_map=True)
+    else:
+        raise ValueError(f"Unsupported table format: {path.suffix}")
+
+    if columns is not None:
+        table = table.select([c for c in columns if c in table.column_names])
+    return table.to_pandas(split_blocks=True)
+
+
+def load_table(stem, columns=None):
+    """Lit la meilleure version disponible d'une table désignée sans extension"""
+    path = find_table(stem)
+    if path is None:
+        raise FileNotFoundError(f"No table found for {stem} ({', '.join(TABLE_SUFFIXES)})")
+    return read_table(path, columns)
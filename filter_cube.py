@@ -0,0 +1,200 @@
+"""
+Cube d'agrégats pré-calculés pour les filtres du dashboard
+
+Les bâtiments sont regroupés une fois, au chargement, en cellules
+arrondissement x niveau de priorité x classe de score x classe de
+vulnérabilité sociale x catégorie d'âge. Chaque cellule garde des agrégats
+additifs: nombre de bâtiments, somme du potentiel GES, sommes et
+co-moments des scores (moyennes, écarts-types et matrice de corrélation).
+
+Les classes de score et de vulnérabilité suivent les pas des curseurs du
+dashboard (SCORE_STEPS, SOCIAL_STEPS), avec la même comparaison que le
+filtre sur les lignes: une sélection sur ces pas est exacte. Une requête
+parcourt les cellules occupées (au plus le produit des dimensions), jamais
+les bâtiments.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Pas des curseurs "score minimum" (entiers) et "vulnérabilité minimum" (0.01)
+SCORE_STEPS = np.arange(0, 101, dtype=float)
+SOCIAL_STEPS = np.round(np.arange(0, 101) / 100, 2)
+
+# Catégories d'âge du dashboard (intervalles fermés à droite)
+AGE_REFERENCE_YEAR = 2024
+AGE_BINS = [0, 20, 40, 60, 100, 200]
+AGE_LABELS = ['< 20 ans', '20-40 ans', '40-60 ans', '60-100 ans', '> 100 ans']
+
+PRIORITY_LEVELS = ['Low', 'Medium', 'High', 'Critical']
+
+# Variables de la matrice de corrélation (la dernière est le score de priorité)
+CORRELATION_COLUMNS = ['score_energy_risk', 'score_climate_risk', 'score_social_vulnerability',
+                       'score_age_risk', 'score_size_impact', 'priority_score']
+
+
+def step_buckets(values, steps):
+    """
+    Classe de chaque valeur: dernier pas s <= valeur (-1 sous le premier pas
+    ou si NaN). Les pas sont comparés dans le type des valeurs, comme le
+    filtre `colonne >= seuil` du dashboard
+    """
+    values = np.asarray(values)
+    steps = steps.astype(values.dtype if values.dtype.kind == 'f' else float)
+    buckets = np.searchsorted(steps, values, side='right') - 1
+    return np.where(np.isnan(values), -1, buckets)
+
+
+def age_categories(construction_years):
+    """Catégorie d'âge (codes de AGE_LABELS, -1 si inconnue)"""
+    age = AGE_REFERENCE_YEAR - pd.Series(construction_years).astype(float)
+    return pd.cut(age, bins=AGE_BINS, labels=AGE_LABELS).cat.codes.to_numpy()
+
+
+class CubeSelection:
+    """Agrégats des cellules retenues par FilterCube.select"""
+
+    def __init__(self, cube, cells):
+        self.cube = cube
+        self.cells = cells
+        self.counts = cube.counts[cells]
+        self.count = int(self.counts.sum())
+
+    def _sums(self, group=None, size=None):
+        """(nombre, potentiel GES, sommes des scores) par groupe (ou au total)"""
+        if group is None:
+            return self.counts.sum(), self.cube.ges[self.cells].sum(), self.cube.sums[self.cells].sum(axis=0)
+        counts = np.bincount(group, weights=self.counts, minlength=size)
+        ges = np.bincount(group, weights=self.cube.ges[self.cells], minlength=size)
+        sums = np.column_stack([np.bincount(group, weights=column, minlength=size)
+                                for column in self.cube.sums[self.cells].T])
+        return counts, ges, sums
+
+    def _mean(self, sums, counts, column):
+        """Moyenne d'une variable de corrélation (sommes décalées)"""
+        j = CORRELATION_COLUMNS.index(column)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            return sums[..., j] / counts + self.cube.shift[j]
+
+    def kpis(self):
+        """Nombre de bâtiments, nombre critique, potentiel GES, moyenne et écart-type du score"""
+        counts, ges, sums = self._sums()
+        j = CORRELATION_COLUMNS.index('priority_score')
+        square = self.cube.products[self.cells, j, j].sum()
+        with np.errstate(invalid='ignore', divide='ignore'):
+            variance = (square - sums[j] ** 2 / counts) / (counts - 1)
+        critical = PRIORITY_LEVELS.index('Critical')
+        return {
+            'count': self.count,
+            'critical': int(self.counts[self.cube.levels[self.cells] == critical].sum()),
+            'ges': float(ges),
+            'score_mean': float(self._mean(sums, counts, 'priority_score')),
+            'score_std': float(np.sqrt(max(variance, 0))) if counts > 1 else np.nan,
+        }
+
+    def level_counts(self):
+        """Nombre de bâtiments par niveau de priorité, par effectif décroissant"""
+        counts = np.bincount(self.cube.levels[self.cells], weights=self.counts,
+                             minlength=len(PRIORITY_LEVELS) + 1)[:len(PRIORITY_LEVELS)]
+        counts = pd.Series(counts.astype(int), index=PRIORITY_LEVELS, name='count')
+        return counts.sort_values(ascending=False, kind='stable')
+
+    def borough_stats(self):
+        """Score moyen, nombre, potentiel GES et vulnérabilité moyenne par arrondissement"""
+        size = len(self.cube.borough_names) + 1
+        counts, ges, sums = self._sums(self.cube.boroughs[self.cells], size)
+        stats = pd.DataFrame({
+            'priority_score': self._mean(sums, counts, 'priority_score'),
+            'buildingid': counts.astype(int),
+            'estimated_ges_reduction_potential': ges,
+            'score_social_vulnerability': self._mean(sums, counts, 'score_social_vulnerability'),
+        }, index=pd.Index(list(self.cube.borough_names) + [None], name='boroughName'))
+        return stats[(counts > 0) & stats.index.notna()]
+
+    def age_stats(self):
+        """Score moyen, nombre et potentiel GES moyen par catégorie d'âge"""
+        size = len(AGE_LABELS) + 1
+        counts, ges, sums = self._sums(self.cube.ages[self.cells], size)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            stats = pd.DataFrame({
+                'priority_score': self._mean(sums, counts, 'priority_score'),
+                'buildingid': counts.astype(int),
+                'estimated_ges_reduction_potential': ges / counts,
+            }, index=pd.CategoricalIndex(AGE_LABELS + [None], categories=AGE_LABELS,
+                                         ordered=True, name='age_category'))
+        return stats[(counts > 0) & stats.index.notna()]
+
+    def correlation(self):
+        """Matrice de corrélation de Pearson des variables CORRELATION_COLUMNS"""
+        n, _, sums = self._sums()
+        products = self.cube.products[self.cells].sum(axis=0)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            covariance = (products - np.outer(sums, sums) / n) / (n - 1)
+            variance = np.diag(covariance)
+            # Variable constante (résidu d'arrondi): corrélation indéfinie, comme pandas
+            variance = np.where(variance > 1e-10 * np.diag(products) / n, variance, np.nan)
+            scale = np.sqrt(variance)
+            corr = covariance / np.outer(scale, scale)
+        return pd.DataFrame(np.clip(corr, -1, 1), index=CORRELATION_COLUMNS, columns=CORRELATION_COLUMNS)
+
+
+class FilterCube:
+    """
+    Agrégats par cellule des bâtiments priorisés (colonnes DASHBOARD_COLUMNS
+    du dashboard). Les bâtiments sans score ou sans vulnérabilité ne passent
+    aucun filtre du dashboard et ne sont pas retenus
+    """
+
+    def __init__(self, df):
+        boroughs = pd.Categorical(df['boroughName'])
+        self.borough_names = boroughs.categories
+        borough_codes = np.where(boroughs.codes < 0, len(self.borough_names), boroughs.codes)
+        level_codes = pd.Categorical(df['priority_level'].astype(object), categories=PRIORITY_LEVELS).codes
+        level_codes = np.where(level_codes < 0, len(PRIORITY_LEVELS), level_codes)
+        age_codes = age_categories(df['buildingConstrYear'])
+        age_codes = np.where(age_codes < 0, len(AGE_LABELS), age_codes)
+        score_buckets = step_buckets(df['priority_score'].to_numpy(), SCORE_STEPS)
+        social_buckets = step_buckets(df['score_social_vulnerability'].to_numpy(), SOCIAL_STEPS)
+
+        kept = (score_buckets >= 0) & (social_buckets >= 0)
+        dims = np.array([len(self.borough_names) + 1, len(PRIORITY_LEVELS) + 1, len(SCORE_STEPS),
+                         len(SOCIAL_STEPS), len(AGE_LABELS) + 1])
+        codes = np.column_stack([borough_codes, level_codes, score_buckets, social_buckets, age_codes])[kept]
+        keys, cell_of_row = np.unique(np.ravel_multi_index(codes.T, dims), return_inverse=True)
+        self.boroughs, self.levels, self.scores, self.socials, self.ages = np.unravel_index(keys, dims)
+        n_cells = len(keys)
+
+        def cell_sum(values):
+            return np.bincount(cell_of_row, weights=values, minlength=n_cells)
+
+        self.counts = cell_sum(None)
+        self.ges = cell_sum(np.nan_to_num(
+            df['estimated_ges_reduction_potential'].to_numpy(dtype=float, na_value=np.nan)[kept]))
+
+        # Variables décalées de leur moyenne: co-moments sans perte de précision
+        X = df[CORRELATION_COLUMNS].to_numpy(dtype=float, na_value=np.nan)[kept]
+        self.shift = np.nanmean(X, axis=0) if len(X) else np.zeros(len(CORRELATION_COLUMNS))
+        X = X - self.shift
+        self.sums = np.column_stack([cell_sum(column) for column in X.T])
+        k = len(CORRELATION_COLUMNS)
+        self.products = np.empty((n_cells, k, k))
+        for i in range(k):
+            for j in range(i, k):
+                self.products[:, i, j] = self.products[:, j, i] = cell_sum(X[:, i] * X[:, j])
+
+    @property
+    def n_cells(self):
+        return len(self.counts)
+
+    def select(self, borough=None, priority_level=None, min_score=0, min_social=0.0):
+        """
+        Cellules des bâtiments de l'arrondissement et du niveau donnés (tous si
+        None) dont le score et la vulnérabilité atteignent les seuils
+        """
+        cells = ((self.scores >= np.searchsorted(SCORE_STEPS, min_score)) &
+                 (self.socials >= np.searchsorted(SOCIAL_STEPS, min_social)))
+        if borough is not None:
+            cells &= self.boroughs == self.borough_names.get_indexer([borough])[0]
+        if priority_level is not None:
+            cells &= self.levels == PRIORITY_LEVELS.index(priority_level)
+        return CubeSelection(self, np.flatnonzero(cells))
@@ -0,0 +1,126 @@
+"""
+Index des filtres du dashboard sur les lignes
+
+- colonnes numériques (seuils `colonne >= seuil`): positions des lignes
+  triées par valeur; un seuil devient une recherche dichotomique, les
+  lignes retenues sont un suffixe des positions triées
+- colonnes catégorielles (égalité): une carte de bits compactée par
+  catégorie, intersectées par ET logique
+
+Une requête sélective part de la source la plus courte (suffixe des
+positions triées ou catégorie la plus rare) et ne vérifie les autres
+filtres que sur ses candidats: son coût dépend du nombre de lignes
+retenues. Une requête qui retient une grande part de la table balaie
+plutôt les colonnes et les cartes de bits décompactées, séquentiellement.
+"""
+
+import numpy as np
+import pandas as pd
+
+# Au-delà de 1 / SPARSE_FRACTION des lignes, la sélection balaie les colonnes
+SPARSE_FRACTION = 8
+
+
+def _bitmap(mask):
+    """Carte de bits compactée (1 bit par ligne) d'un masque booléen"""
+    return np.packbits(mask, bitorder='little')
+
+
+def _bits_at(bitmap, positions):
+    """Bits d'une carte compactée aux positions données"""
+    return ((bitmap[positions >> 3] >> (positions & 7).astype(np.uint8)) & 1).astype(bool)
+
+
+class FilterIndex:
+    """
+    Index des colonnes filtrées d'une table, construit une fois au chargement
+    Les positions retournées sont des positions de lignes (iloc), croissantes
+    """
+
+    def __init__(self, df, numeric_columns=(), category_columns=()):
+        self.n_rows = len(df)
+        self.values = {}
+        self.sorted_values = {}
+        self.order = {}
+        for column in numeric_columns:
+            values = df[column].to_numpy()
+            if values.dtype.kind != 'f':
+                values = df[column].to_numpy(dtype=float, na_value=np.nan)
+            known = np.flatnonzero(~np.isnan(values))
+            order = known[np.argsort(values[known], kind='stable')]
+            self.values[column] = values
+            self.order[column] = order
+            self.sorted_values[column] = values[order]
+
+        self.bitmaps = {}
+        self.bitmap_counts = {}
+        for column in category_columns:
+            codes, categories = pd.factorize(df[column])
+            counts = np.bincount(codes[codes >= 0], minlength=len(categories))
+            self.bitmaps[column] = {category: _bitmap(codes == code)
+                                    for code, category in enumerate(categories)}
+            self.bitmap_counts[column] = dict(zip(categories, counts.tolist()))
+
+    def cutoff(self, column, minimum):
+        """Rang de la première valeur >= minimum (comparée dans le type de la colonne)"""
+        sorted_values = self.sorted_values[column]
+        return int(np.searchsorted(sorted_values, np.asarray(minimum, dtype=sorted_values.dtype), side='left'))
+
+    def positions(self, minimums=None, categories=None):
+        """
+        Positions des lignes dont chaque colonne de minimums atteint son seuil
+        et chaque colonne de categories vaut la catégorie donnée
+        Retourne None si aucun filtre n'écarte de ligne (toute la table)
+        """
+        minimums = minimums or {}
+        categories = categories or {}
+
+        # Seuils actifs: (nombre de candidats, colonne, rang de coupure)
+        thresholds = []
+        for column, minimum in minimums.items():
+            cut = self.cutoff(column, minimum)
+            if cut > 0 or len(self.order[column]) < self.n_rows:
+                thresholds.append((len(self.order[column]) - cut, column, cut))
+
+        bitmap, bitmap_count = None, self.n_rows
+        for column, category in categories.items():
+            if category not in self.bitmaps[column]:
+                return np.empty(0, dtype=np.intp)
+            bits = self.bitmaps[column][category]
+            bitmap = bits if bitmap is None else bitmap & bits
+            bitmap_count = min(bitmap_count, self.bitmap_counts[column][category])
+
+        if not thresholds and bitmap is None:
+            return None
+
+        # Sélection longue: balayage séquentiel des colonnes (plus rapide
+        # que des accès dispersés aux positions triées)
+        thresholds.sort(key=lambda threshold: threshold[0])
+        expected = min(thresholds[0][0] if thresholds else self.n_rows, bitmap_count)
+        if expected * SPARSE_FRACTION >= self.n_rows:
+            mask = np.ones(self.n_rows, dtype=bool) if bitmap is None else \
+                np.unpackbits(bitmap, count=self.n_rows, bitorder='little').view(bool)
+            for _, column, cut in thresholds:
+                mask &= self._at_least(self.values[column], column, cut)
+            return np.flatnonzero(mask)
+
+        # Sélection courte: candidats de la source la plus sélective
+        if thresholds and thresholds[0][0] <= bitmap_count:
+            _, column, cut = thresholds.pop(0)
+            candidates = self.order[column][cut:]
+        else:
+            candidates = np.flatnonzero(np.unpackbits(bitmap, count=self.n_rows, bitorder='little'))
+            bitmap = None
+
+        for _, column, cut in thresholds:
+            candidates = candidates[self._at_least(self.values[column][candidates], column, cut)]
+        if bitmap is not None:
+            candidates = candidates[_bits_at(bitmap, candidates)]
+        return np.sort(candidates)
+
+    def _at_least(self, values, column, cut):
+        """values >= valeur de rang cut (aucune si cut dépasse les valeurs connues)"""
+        sorted_values = self.sorted_values[column]
+        if cut >= len(sorted_values):
+            return np.zeros(len(values), dtype=bool)
+        return values >= sorted_values[cut]
@@ -0,0 +1,216 @@
+"""
+Lecture incrémentale de fichiers GeoJSON
+Les entités sont décodées une à une depuis un tampon de taille fixe, au lieu
+de charger tout le fichier avec json.load. Les propriétés et les emprises
+(bounding boxes) sont regroupées en blocs colonnaires de taille fixe: la
+mémoire maximale dépend de la taille des blocs, pas de celle du fichier.
+"""
+
+import json
+
+import numpy as np
+import pandas as pd
+
+BBOX_COLUMNS = ['bbox_minx', 'bbox_miny', 'bbox_maxx', 'bbox_maxy']
+WHITESPACE = ' \t\n\r'
+
+
+class GeoJSONStreamReader:
+    """
+    Lecteur en flux d'une FeatureCollection GeoJSON
+
+    Les membres de premier niveau autres que 'features' (type, name, crs...)
+    sont conservés dans metadata au fil de la lecture.
+    """
+
+    def __init__(self, filepath, buffer_size=1 << 20):
+        self.filepath = filepath
+        self.buffer_size = buffer_size
+        self.metadata = {}
+        self._decoder = json.JSONDecoder()
+
+    def _fill(self, f, buffer, pos, size=None):
+        """Ajoute un bloc (buffer_size par défaut) au tampon en jetant la partie déjà consommée"""
+        chunk = f.read(size or self.buffer_size)
+        return buffer[pos:] + chunk, 0, bool(chunk)
+
+    def _skip(self, f, buffer, pos, chars=WHITESPACE):
+        """Avance sur les caractères ignorables, en relisant le fichier au besoin"""
+        while True:
+            while pos < len(buffer) and buffer[pos] in chars:
+                pos += 1
+            if pos < len(buffer):
+                return buffer, pos
+            buffer, pos, more = self._fill(f, buffer, pos)
+            if not more:
+                return buffer, pos
+
+    def _decode(self, f, buffer, pos):
+        """
+        Décode une valeur JSON complète, en relisant tant qu'elle est tronquée
+        Chaque relecture au moins double la partie en attente: une entité
+        bien plus grande que le tampon n'est redécodée que O(log) fois
+        """
+        while True:
+            try:
+                value, end = self._decoder.raw_decode(buffer, pos)
+                # Un nombre peut être coupé par la fin du tampon
+                if end < len(buffer) or not isinstance(value, (int, float)):
+                    return value, buffer, end
+            except json.JSONDecodeError:
+                pass
+            buffer, pos, more = self._fill(f, buffer, pos, max(self.buffer_size, len(buffer) - pos))
+            if not more:
+                value, end = self._decoder.raw_decode(buffer, pos)
+                return value, buffer, end
+
+    def _expect(self, f, buffer, pos, char):
+        buffer, pos = self._skip(f, buffer, pos)
+        if pos >= len(buffer) or buffer[pos] != char:
+            found = buffer[pos] if pos < len(buffer) else 'EOF'
+            raise ValueError(f"Invalid GeoJSON in {self.filepath}: expected '{char}', found '{found}'")
+        return buffer, pos + 1
+
+    def iter_features(self):
+        """Génère les entités de la collection une à une"""
+        with open(self.filepath, 'r', encoding='utf-8') as f:
+            buffer, pos, _ = self._fill(f, '', 0)
+            if buffer.startswith('\ufeff'):
+                pos = 1
+            buffer, pos = self._expect(f, buffer, pos, '{')
+
+            while True:
+                buffer, pos = self._skip(f, buffer, pos, WHITESPACE + ',')
+                if pos >= len(buffer) or buffer[pos] == '}':
+                    return
+
+                key, buffer, pos = self._decode(f, buffer, pos)
+                buffer, pos = self._expect(f, buffer, pos, ':')
+                buffer, pos = self._skip(f, buffer, pos)
+
+                if key != 'features':
+                    self.metadata[key], buffer, pos = self._decode(f, buffer, pos)
+                    continue
+
+                buffer, pos = self._expect(f, buffer, pos, '[')
+                while True:
+                    buffer, pos = self._skip(f, buffer, pos, WHITESPACE + ',')
+                    if pos >= len(buffer):
+                        raise ValueError(f"Invalid GeoJSON in {self.filepath}: unterminated features array")
+                    if buffer[pos] == ']':
+                        pos += 1
+                        break
+                    feature, buffer, pos = self._decode(f, buffer, pos)
+                    yield feature
+
+    def iter_chunks(self, chunk_size=50_000, properties=None, with_bbox=True):
+        """
+        Génère des DataFrames colonnaires d'au plus chunk_size entités
+        (propriétés + emprise minx/miny/maxx/maxy)
+
+        properties: liste des propriétés à conserver (toutes si None)
+        """
+        columns, positions, vertex_counts = {}, [], []
+        n = 0
+
+        for feature in self.iter_features():
+            props = feature.get('properties') or {}
+            keys = properties if properties is not None else props.keys()
+            for key in keys:
+                if key not in columns:
+                    # Colonne apparue en cours de bloc: complétée par None
+                    columns[key] = [None] * n
+                columns[key].append(props.get(key))
+            for values in columns.values():
+                if len(values) == n:
+                    values.append(None)
+
+            if with_bbox:
+                vertices = geometry_positions(feature.get('geometry'))
+                positions.extend(vertices)
+                vertex_counts.append(len(vertices))
+            n += 1
+
+            if n == chunk_size:
+                yield self._to_frame(columns, positions, vertex_counts, n, with_bbox)
+                columns, positions, vertex_counts = {}, [], []
+                n = 0
+
+        if n:
+            yield self._to_frame(columns, positions, vertex_counts, n, with_bbox)
+
+    @staticmethod
+    def _to_frame(columns, positions, vertex_counts, n, with_bbox):
+        frame = pd.DataFrame(columns, index=pd.RangeIndex(n))
+        if with_bbox:
+            bounds = chunk_bounds(positions, vertex_counts)
+            for i, column in enumerate(BBOX_COLUMNS):
+                frame[column] = bounds[:, i]
+        return frame
+
+    def read_frame(self, chunk_size=50_000, properties=None, with_bbox=True):
+        """Lit toute la collection en un DataFrame colonnaire, bloc par bloc"""
+        chunks = list(self.iter_chunks(chunk_size, properties, with_bbox))
+        if not chunks:
+            return pd.DataFrame()
+        return pd.concat(chunks, ignore_index=True)
+
+
+def geometry_positions(geometry):
+    """Liste des sommets [x, y] d'une géométrie GeoJSON"""
+    if not geometry:
+        return []
+
+    if geometry.get('type') == 'GeometryCollection':
+        return [p for g in geometry.get('geometries', []) for p in geometry_positions(g)]
+
+    # Descend jusqu'aux listes de positions [x, y(, z)]
+    stack = [geometry.get('coordinates') or []]
+    points = []
+    while stack:
+        node = stack.pop()
+        if not node:
+            continue
+        if isinstance(node[0], (int, float)):
+            points.append(node[:2])
+        elif isinstance(node[0][0], (int, float)):
+            points.extend(position[:2] for position in node)
+        else:
+            stack.extend(node)
+
+    return points
+
+
+def geometry_coordinates(geometry):
+    """Tableau (n, 2) de tous les sommets d'une géométrie GeoJSON"""
+    return np.asarray(geometry_positions(geometry), dtype=float).reshape(-1, 2)
+
+
+def geometry_bounds(geometry):
+    """Emprise (minx, miny, maxx, maxy) d'une géométrie GeoJSON"""
+    coordinates = geometry_coordinates(geometry)
+    if len(coordinates) == 0:
+        return np.full(4, np.nan)
+    return np.concatenate([coordinates.min(axis=0), coordinates.max(axis=0)])
+
+
+def chunk_bounds(positions, vertex_counts):
+    """
+    Emprises d'un bloc d'entités en une seule réduction NumPy
+    positions: sommets concaténés, vertex_counts: nombre de sommets par entité
+    """
+    counts = np.asarray(vertex_counts, dtype=np.int64)
+    bounds = np.full((len(counts), 4), np.nan)
+    if counts.sum() == 0:
+        return bounds
+
+    coordinates = np.asarray(positions, dtype=float).reshape(-1, 2)
+    starts = np.concatenate([[0], np.cumsum(counts)[:-1]])
+    non_empty = counts > 0
+    starts = starts[non_empty]
+
+    bounds[non_empty, 0] = np.minimum.reduceat(coordinates[:, 0], starts)
+    bounds[non_empty, 1] = np.minimum.reduceat(coordinates[:, 1], starts)
+    bounds[non_empty, 2] = np.maximum.reduceat(coordinates[:, 0], starts)
+    bounds[non_empty, 3] = np.maximum.reduceat(coordinates[:, 1], starts)
+    return bounds
@@ -0,0 +1,222 @@
+"""
+Grille matricielle des îlots de chaleur
+Les polygones de la couche satellite sont rastérisés une seule fois dans une
+grille uint8 compacte, enregistrée en .npy à côté des données. Les exécutions
+suivantes (pipeline, sessions du dashboard) ouvrent la grille en mémoire
+mappée: l'exposition d'un bâtiment devient une simple lecture d'indice, sans
+relire ni parser le GeoJSON.
+"""
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+from geojson_stream import GeoJSONStreamReader
+from spatial_index import geojson_rings
+
+# Résolution par défaut, dans le système de coordonnées de la couche
+# (0.0002 degré ~ 20 m à la latitude de Montréal)
+HEAT_GRID_RESOLUTION = 0.0002
+
+
+def _grid_paths(grid_path):
+    grid_path = Path(grid_path)
+    return grid_path, grid_path.with_suffix('.json')
+
+
+def _feature_value(feature, value_property):
+    """Valeur uint8 (1-255) d'une entité; 1 si aucune propriété n'est utilisée"""
+    if value_property is None:
+        return 1
+    value = (feature.get('properties') or {}).get(value_property)
+    try:
+        return int(np.clip(round(float(value)), 1, 255))
+    except (TypeError, ValueError):
+        return 1
+
+
+def _rasterize_polygon(grid, rings, value, origin, resolution):
+    """
+    Remplissage par lignes de balayage (règle pair-impair) d'un polygone:
+    une cellule est couverte si son centre est à l'intérieur
+    """
+    edges = []
+    for ring in rings:
+        if not np.array_equal(ring[0], ring[-1]):
+            ring = np.vstack([ring, ring[:1]])
+        edges.append(np.hstack([ring[:-1], ring[1:]]))
+    if not edges:
+        return
+    x0, y0, x1, y1 = np.vstack(edges).T
+
+    n_rows, n_cols = grid.shape
+    # Lignes dont le centre est traversé par chaque arête
+    row_lo = np.ceil((np.minimum(y0, y1) - origin[1]) / resolution - 0.5).astype(np.int64)
+    row_hi = np.ceil((np.maximum(y0, y1) - origin[1]) / resolution - 0.5).astype(np.int64) - 1
+    row_lo, row_hi = np.maximum(row_lo, 0), np.minimum(row_hi, n_rows - 1)
+    counts = np.maximum(row_hi - row_lo + 1, 0)
+    if counts.sum() == 0:
+        return
+
+    edge = np.repeat(np.arange(len(x0)), counts)
+    rows = np.repeat(row_lo, counts) + np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+    yc = origin[1] + (rows + 0.5) * resolution
+    xc = x0[edge] + (yc - y0[edge]) * (x1[edge] - x0[edge]) / (y1[edge] - y0[edge])
+
+    # Croisements triés par ligne puis par x: intervalles intérieurs = paires successives
+    order = np.lexsort((xc, rows))
+    rows, xc = rows[order], xc[order]
+    start_rows, x_start, x_end = rows[0::2], xc[0::2], xc[1::2]
+
+    col_lo = np.ceil((x_start - origin[0]) / resolution - 0.5).astype(np.int64)
+    col_hi = np.ceil((x_end - origin[0]) / resolution - 0.5).astype(np.int64) - 1
+    col_lo, col_hi = np.maximum(col_lo, 0), np.minimum(col_hi, n_cols - 1)
+    keep = col_hi >= col_lo
+    if not keep.any():
+        return
+    start_rows, col_lo, col_hi = start_rows[keep], col_lo[keep], col_hi[keep]
+
+    # Fenêtre locale du polygone remplie par tableau de différences
+    r0, r1 = start_rows.min(), start_rows.max()
+    c0, c1 = col_lo.min(), col_hi.max()
+    diff = np.zeros((r1 - r0 + 1, c1 - c0 + 2), dtype=np.int32)
+    np.add.at(diff, (start_rows - r0, col_lo - c0), 1)
+    np.add.at(diff, (start_rows - r0, col_hi - c0 + 1), -1)
+    mask = np.cumsum(diff, axis=1)[:, :-1] > 0
+
+    window = grid[r0:r1 + 1, c0:c1 + 1]
+    window[mask] = np.maximum(window[mask], value)
+
+
+def rasterize_heat_islands(geojson_path, grid_path, resolution=HEAT_GRID_RESOLUTION,
+                           value_property=None, bounds=None):
+    """
+    Rastérise la couche d'îlots de chaleur dans une grille uint8 mappée en mémoire
+
+    - value_property: propriété numérique à inscrire (intensité); sinon 1
+    - bounds: (minx, miny, maxx, maxy); par défaut l'emprise de la couche,
+      calculée par une première lecture en flux
+    """
+    grid_path, meta_path = _grid_paths(grid_path)
+    reader = GeoJSONStreamReader(geojson_path)
+
+    if bounds is None:
+        chunks = [c for c in reader.iter_chunks(properties=[]) if len(c)]
+        if not chunks:
+            raise ValueError(f"No heat island features in {geojson_path}")
+        bounds = (
+            min(c['bbox_minx'].min() for c in chunks), min(c['bbox_miny'].min() for c in chunks),
+            max(c['bbox_maxx'].max() for c in chunks), max(c['bbox_maxy'].max() for c in chunks),
+        )
+
+    origin = (float(bounds[0]), float(bounds[1]))
+    shape = (
+        int(np.ceil((bounds[3] - bounds[1]) / resolution)) + 1,
+        int(np.ceil((bounds[2] - bounds[0]) / resolution)) + 1,
+    )
+
+    # Écriture directe dans un fichier .npy mappé (seule la grille est sur
+    # disque), temporaire: un lecteur concurrent ou un arrêt en cours
+    # d'écriture ne laisse jamais de grille partielle
+    tmp_grid_path = grid_path.with_name(grid_path.name + '.tmp')
+    tmp_meta_path = meta_path.with_name(meta_path.name + '.tmp')
+    try:
+        grid = np.lib.format.open_memmap(tmp_grid_path, mode='w+', dtype=np.uint8, shape=shape)
+        grid[:] = 0
+        n_features = 0
+        for feature in reader.iter_features():
+            rings = geojson_rings(feature.get('geometry'))
+            if rings:
+                _rasterize_polygon(grid, rings, _feature_value(feature, value_property), origin, resolution)
+                n_features += 1
+        max_value = int(grid.max()) if grid.size else 0
+        grid.flush()
+        del grid
+
+        meta = {
+            'source': str(geojson_path),
+            'origin': origin,
+            'resolution': resolution,
+            'shape': shape,
+            'value_property': value_property,
+            'max_value': max_value,
+            'n_features': n_features,
+        }
+        tmp_meta_path.write_text(json.dumps(meta, indent=2), encoding='utf-8')
+        # Métadonnées d'abord: entre les deux remplacements, l'ancienne grille
+        # est plus ancienne que sa couche source ou d'une autre forme que les
+        # métadonnées, et load_heat_grid la reconstruit
+        os.replace(tmp_meta_path, meta_path)
+        os.replace(tmp_grid_path, grid_path)
+    finally:
+        for tmp_path in (tmp_grid_path, tmp_meta_path):
+            if tmp_path.exists():
+                tmp_path.unlink()
+    print(f"Rasterized {n_features} heat islands into a {shape[0]}x{shape[1]} grid ({grid_path})")
+
+    return HeatIslandGrid.load(grid_path)
+
+
+class HeatIslandGrid:
+    """Grille d'îlots de chaleur ouverte en lecture seule (mémoire mappée)"""
+
+    def __init__(self, values, origin, resolution, max_value):
+        self.values = values
+        self.origin = origin
+        self.resolution = resolution
+        self.max_value = max_value
+
+    @classmethod
+    def load(cls, grid_path):
+        grid_path, meta_path = _grid_paths(grid_path)
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        values = np.load(grid_path, mmap_mode='r')
+        return cls(values, tuple(meta['origin']), meta['resolution'], meta['max_value'])
+
+    def sample(self, x, y):
+        """Valeur de la grille sous chaque point (0 hors îlot ou hors grille, -1 si non géocodé)"""
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        result = np.full(len(x), -1, dtype=np.int16)
+
+        geocoded = ~(np.isnan(x) | np.isnan(y))
+        cols = np.floor((x[geocoded] - self.origin[0]) / self.resolution).astype(np.int64)
+        rows = np.floor((y[geocoded] - self.origin[1]) / self.resolution).astype(np.int64)
+        n_rows, n_cols = self.values.shape
+        in_grid = (rows >= 0) & (rows < n_rows) & (cols >= 0) & (cols < n_cols)
+
+        sampled = np.zeros(len(rows), dtype=np.int16)
+        sampled[in_grid] = self.values[rows[in_grid], cols[in_grid]]
+        result[geocoded] = sampled
+        return result
+
+    def exposure(self, x, y):
+        """Exposition à la chaleur normalisée entre 0 et 1 (NaN si non géocodé)"""
+        values = self.sample(x, y).astype(float)
+        values[values < 0] = np.nan
+        return values / self.max_value if self.max_value else np.where(np.isnan(values), np.nan, 0.0)
+
+
+def load_heat_grid(geojson_path, grid_path=None, resolution=HEAT_GRID_RESOLUTION, value_property=None):
+    """
+    Ouvre la grille précalculée, en la (re)construisant si elle est absente,
+    plus ancienne que la couche source, d'une autre résolution ou d'une autre
+    forme que ses métadonnées
+    Retourne None si ni la grille ni la couche source n'existent
+    """
+    geojson_path = Path(geojson_path)
+    grid_path, meta_path = _grid_paths(grid_path or geojson_path.with_name(geojson_path.stem + '_grid.npy'))
+
+    if grid_path.exists() and meta_path.exists():
+        meta = json.loads(meta_path.read_text(encoding='utf-8'))
+        stale = geojson_path.exists() and geojson_path.stat().st_mtime > grid_path.stat().st_mtime
+        if not stale and meta['resolution'] == resolution and meta['value_property'] == value_property:
+            grid = HeatIslandGrid.load(grid_path)
+            if grid.values.shape == tuple(meta['shape']):
+                return grid
+
+    if not geojson_path.exists():
+        return None
+    return rasterize_heat_islands(geojson_path, grid_path, resolution, value_property)
@@ -0,0 +1,271 @@
+"""
+Exécution en processus d'un pipeline décrit comme un graphe orienté acyclique
+Chaque étape déclare les artefacts qu'elle consomme et produit: les artefacts
+restent en mémoire entre les étapes (pas de relecture des CSV intermédiaires)
+et les étapes indépendantes s'exécutent en parallèle.
+Avec un cache (stage_cache.StageCache), les étapes inchangées sont relues
+depuis le disque ou simplement ignorées si personne n'a besoin de leurs sorties.
+"""
+
+import importlib
+import importlib.util
+import inspect
+import io
+import sys
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+
+class Stage:
+    """
+    Étape du pipeline
+
+    - func: appelée avec les artefacts d'entrée, dans l'ordre de inputs, et
+      params en arguments nommés; peut être donnée sous la forme
+      'module:fonction' pour n'importer le module qu'à l'exécution
+    - outputs: noms des artefacts produits; func retourne la valeur elle-même
+      pour une seule sortie, un tuple pour plusieurs, rien sinon
+    - files: fichiers lus par l'étape, code: modules supplémentaires dont
+      dépend son résultat (clé de cache)
+    - targets: fichiers écrits par l'étape, recalculée s'ils manquent ou
+      ont été réécrits depuis
+    """
+
+    def __init__(self, name, func, inputs=(), outputs=(), description='',
+                 params=None, files=(), code=(), targets=(), cacheable=True):
+        self.name = name
+        self.func = func
+        self.inputs = tuple(inputs)
+        self.outputs = tuple(outputs)
+        self.description = description or name
+        self.params = dict(params or {})
+        self.files = tuple(files)
+        self.code = tuple(code)
+        self.targets = tuple(targets)
+        self.cacheable = cacheable
+
+    def resolve(self):
+        if isinstance(self.func, str):
+            module_name, attribute = self.func.split(':')
+            return getattr(importlib.import_module(module_name), attribute)
+        return self.func
+
+    def code_files(self):
+        """Fichiers source de l'étape, localisés sans importer les modules"""
+        if isinstance(self.func, str):
+            modules = [self.func.split(':')[0]]
+            files = []
+        else:
+            modules = []
+            files = [inspect.getsourcefile(self.func)]
+        for module_name in modules + list(self.code):
+            spec = importlib.util.find_spec(module_name)
+            if spec is None or spec.origin is None:
+                raise ValueError(f"Stage '{self.name}': module '{module_name}' not found")
+            files.append(spec.origin)
+        return files
+
+    def run(self, artifacts):
+        func = self.resolve()
+        result = func(*(artifacts[name] for name in self.inputs), **self.params)
+        if not self.outputs:
+            return {}
+        if len(self.outputs) == 1:
+            return {self.outputs[0]: result}
+        if not isinstance(result, tuple) or len(result) != len(self.outputs):
+            raise ValueError(f"Stage '{self.name}' must return {len(self.outputs)} values")
+        return dict(zip(self.outputs, result))
+
+
+class _StageOutput(io.TextIOBase):
+    """
+    Redirection de sys.stdout par thread: la sortie de chaque étape est
+    conservée à part et affichée d'un bloc à la fin de l'étape
+    """
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.local = threading.local()
+
+    def write(self, text):
+        buffer = getattr(self.local, 'buffer', None)
+        return (self.stream if buffer is None else buffer).write(text)
+
+    def flush(self):
+        self.stream.flush()
+
+
+class Pipeline:
+    """Graphe d'étapes, validé à la construction"""
+
+    def __init__(self, stages, max_workers=4):
+        self.stages = {}
+        for stage in stages:
+            if stage.name in self.stages:
+                raise ValueError(f"Duplicate stage name: {stage.name}")
+            self.stages[stage.name] = stage
+        self.max_workers = max_workers
+
+        # Producteur de chaque artefact
+        self.producers = {}
+        for stage in self.stages.values():
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"Artifact '{output}' produced by both "
+                                     f"'{self.producers[output]}' and '{stage.name}'")
+                self.producers[output] = stage.name
+
+        # Dépendances entre étapes
+        self.dependencies = {}
+        for stage in self.stages.values():
+            missing = [name for name in stage.inputs if name not in self.producers]
+            if missing:
+                raise ValueError(f"Stage '{stage.name}' needs unknown artifacts: {missing}")
+            self.dependencies[stage.name] = {self.producers[name] for name in stage.inputs}
+
+        self.order = self._topological_order()
+
+    def _topological_order(self):
+        remaining = {name: set(deps) for name, deps in self.dependencies.items()}
+        order = []
+        while remaining:
+            ready = [name for name, deps in remaining.items() if not deps]
+            if not ready:
+                raise ValueError(f"Cycle between stages: {sorted(remaining)}")
+            for name in ready:
+                order.append(name)
+                del remaining[name]
+            for deps in remaining.values():
+                deps.difference_update(ready)
+        return order
+
+    def _run_stage(self, stage, artifacts, output):
+        if output is not None:
+            output.local.buffer = io.StringIO()
+        start = time.perf_counter()
+        try:
+            produced = stage.run(artifacts)
+        except Exception as e:
+            # La sortie déjà produite accompagne l'erreur
+            e.stage_output = self._release(output)
+            raise
+        return produced, self._release(output), time.perf_counter() - start
+
+    @staticmethod
+    def _release(output):
+        if output is None:
+            return ''
+        captured = output.local.buffer.getvalue()
+        output.local.buffer = None
+        return captured
+
+    def _report(self, stage, captured, elapsed, error=None):
+        print("\n" + "="*80)
+        print(f"STAGE: {stage.description}")
+        print("="*80)
+        if captured:
+            print(captured.rstrip('\n'))
+        if error is None:
+            print(f"[SUCCESS] {stage.name} ({elapsed:.1f}s)")
+        else:
+            print(f"[ERROR] {stage.name} failed: {error!r}")
+
+    def cache_keys(self, cache):
+        """Clé de chaque étape, calculée dans l'ordre topologique"""
+        keys = {}
+        for name in self.order:
+            stage = self.stages[name]
+            keys[name] = cache.stage_key(
+                name,
+                code_files=stage.code_files(),
+                params=stage.params,
+                input_files=stage.files,
+                upstream_keys=[keys[dep] for dep in self.dependencies[name]],
+            )
+        cache.save_file_index()
+        return keys
+
+    def _plan(self, cache, artifacts):
+        """
+        Étapes à exécuter: celles dont le résultat n'est pas en cache
+        Les sorties en cache dont une étape exécutée a besoin sont relues;
+        une entrée illisible fait exécuter l'étape à la place
+        """
+        if cache is None:
+            return set(self.order), {}
+
+        keys = self.cache_keys(cache)
+
+        def fresh(stage):
+            return (stage.cacheable and cache.contains(keys[stage.name]) and
+                    (not stage.targets or cache.targets_match(keys[stage.name], stage.targets)))
+
+        to_run = {name for name in self.order if not fresh(self.stages[name])}
+        for name in reversed(self.order):
+            if name in to_run:
+                continue
+            if any(name in self.dependencies[consumer] for consumer in to_run):
+                hit, produced = cache.get(keys[name])
+                if hit:
+                    artifacts.update(produced)
+                else:
+                    to_run.add(name)
+        for name in self.order:
+            if name not in to_run:
+                print(f"[CACHED] {self.stages[name].description}")
+        return to_run, keys
+
+    def run(self, artifacts=None, capture_output=True, cache=None):
+        """
+        Exécute les étapes dès que leurs entrées sont disponibles
+        Retourne le dictionnaire des artefacts chargés ou calculés; la
+        première erreur interrompt le pipeline (les étapes déjà lancées se
+        terminent) et est relancée
+        """
+        artifacts = dict(artifacts or {})
+        to_run, keys = self._plan(cache, artifacts)
+        pending = {name: self.dependencies[name] & to_run for name in self.order if name in to_run}
+
+        output = None
+        if capture_output:
+            output = _StageOutput(sys.stdout)
+            sys.stdout = output
+
+        failure = None
+        try:
+            with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+                running = {}
+                while pending or running:
+                    if failure is None:
+                        for name in [n for n in self.order if n in pending and not pending[n]]:
+                            del pending[name]
+                            future = executor.submit(self._run_stage, self.stages[name], artifacts, output)
+                            running[future] = self.stages[name]
+                    if not running:
+                        break
+
+                    done, _ = wait(running, return_when=FIRST_COMPLETED)
+                    for future in done:
+                        stage = running.pop(future)
+                        try:
+                            produced, captured, elapsed = future.result()
+                        except Exception as e:
+                            self._report(stage, getattr(e, 'stage_output', ''), 0.0, error=e)
+                            failure = failure or e
+                            continue
+                        self._report(stage, captured, elapsed)
+                        artifacts.update(produced)
+                        if cache is not None and stage.cacheable:
+                            cache.put(keys[stage.name], produced)
+                            if stage.targets:
+                                cache.record_targets(keys[stage.name], stage.targets)
+                        for deps in pending.values():
+                            deps.discard(stage.name)
+        finally:
+            if output is not None:
+                sys.stdout = output.stream
+
+        if failure is not None:
+            raise failure
+        return artifacts
@@ -0,0 +1,32 @@
+"""
+Fichiers lus et écrits par les étapes du pipeline
+Module sans dépendance: run_full_pipeline peut connaître ces noms (clés de
+cache, cibles des étapes) sans importer les modules d'étapes, ni donc
+pandas, scikit-learn ou scipy, avant de savoir s'il y a quelque chose à
+recalculer
+"""
+
+from pathlib import Path
+
+DATA_DIR = Path("data")
+
+# Fichiers sources lus par 02_intelligent_matching.load_and_prepare_data
+DATA_FILES = {
+    'buildings': DATA_DIR / 'batiments-municipaux.csv',
+    'consumption': DATA_DIR / 'consommation-energetique-plus-2000m2-municipaux-2023.csv',
+    'flood': DATA_DIR / 'vdq-zonesinondablesreglementees.csv',
+    'heat': DATA_DIR / 'ilots-de-chaleur-images-satellite-2023.geojson',
+    'vulnerability': DATA_DIR / 'IndiceCanadienDeVulnérabilitéSociale.csv',
+}
+
+# Tables intermédiaires (sans extension: .arrow et/ou .csv)
+ENRICHED_OUTPUT = 'output_buildings_enriched'
+PRIORITIZED_OUTPUT = 'output_buildings_prioritized'
+TOP_100_OUTPUT = 'output_top_100_priorities.csv'
+
+# Calibration figée du score (bornes, médiane, standardisation, centroïdes)
+CALIBRATION_FILE = 'model_calibration.json'
+
+# Plan pluriannuel des rénovations (retrofit_scheduler)
+SCHEDULE_OUTPUT = 'output_retrofit_schedule.csv'
+SCHEDULE_SUMMARY_OUTPUT = 'output_retrofit_schedule_summary.csv'
@@ -0,0 +1,313 @@
+"""
+Sélection des bâtiments à rénover sous contrainte de budget
+
+Chaque bâtiment candidat a:
+- un coût de rénovation estimé (surface x coût au m², majoré selon le risque d'âge)
+- une valeur: réduction GES estimée, éventuellement pondérée par la
+  vulnérabilité sociale: ges x (1 + social_weight x vulnérabilité)
+
+Le portefeuille maximise la valeur totale sous le budget et, en option, des
+plafonds de dépense par arrondissement. Deux solveurs:
+- exact (séparation et évaluation) pour les petits ensembles de candidats
+- glouton vectorisé par ratio valeur/coût pour les grands ensembles, avec la
+  borne de la relaxation continue pour mesurer l'écart à l'optimum
+
+Usage: python portfolio_optimizer.py --budget MONTANT [--social-weight W]
+       [--min-priority SCORE] [--quota ARRONDISSEMENT=MONTANT ...] [--exact]
+"""
+
+import argparse
+import importlib
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import load_table
+
+prioritization = importlib.import_module('03_ml_prioritization_model')
+
+PORTFOLIO_OUTPUT = 'output_retrofit_portfolio.csv'
+
+# Coût de rénovation: surface (m², 1000 si inconnue comme pour le potentiel
+# GES) x coût au m², multiplié par 0.75 + 0.5 x risque d'âge (0.8 à 1.25)
+RETROFIT_COST_PER_M2 = 400.0
+DEFAULT_AREA = 1000.0
+AGE_COST_BASE = 0.75
+AGE_COST_FACTOR = 0.5
+
+# Au-delà, le solveur exact cède la place au glouton (méthode 'auto')
+EXACT_MAX_CANDIDATES = 60
+EXACT_NODE_LIMIT = 2_000_000
+
+PORTFOLIO_COLUMNS = (
+    'buildingName', 'address', 'boroughName', 'buildingArea', 'builtArea',
+    'priority_score', 'priority_level', 'score_age_risk', 'score_social_vulnerability',
+    'estimated_ges_reduction_potential',
+)
+
+
+def estimate_retrofit_cost(buildings):
+    """Coût de rénovation estimé ($) de chaque bâtiment"""
+    area = buildings['buildingArea'].fillna(buildings['builtArea'].fillna(DEFAULT_AREA))
+    age_risk = buildings['score_age_risk'].fillna(prioritization.AGE_RISK_UNKNOWN)
+    return area * RETROFIT_COST_PER_M2 * (AGE_COST_BASE + AGE_COST_FACTOR * age_risk)
+
+
+def group_cumsum(values, groups):
+    """Sommes cumulées de values au sein de chaque groupe, dans l'ordre des lignes"""
+    order = np.argsort(groups, kind='stable')
+    sorted_values = values[order]
+    totals = np.cumsum(sorted_values)
+    starts = np.ones(len(order), dtype=bool)
+    starts[1:] = groups[order][1:] != groups[order][:-1]
+    # Total cumulé avant le début du groupe (valeurs positives: croissant)
+    offsets = np.maximum.accumulate(np.where(starts, totals - sorted_values, 0))
+    result = np.empty_like(totals)
+    result[order] = totals - offsets
+    return result
+
+
+def portfolio_value(buildings, social_weight=0.0):
+    """Valeur de chaque bâtiment: réduction GES pondérée par la vulnérabilité sociale"""
+    ges = buildings['estimated_ges_reduction_potential'].fillna(0)
+    social = buildings['score_social_vulnerability'].fillna(0)
+    return ges * (1 + social_weight * social)
+
+
+class PortfolioProblem:
+    """
+    Candidats triés par ratio valeur/coût décroissant (à ratio égal, par
+    score de priorité décroissant), groupes d'arrondissement et plafonds
+    """
+
+    def __init__(self, values, costs, priority, boroughs, budget, borough_quotas=None):
+        self.budget = float(budget)
+        codes, categories = pd.factorize(pd.Series(boroughs).astype(object), use_na_sentinel=False)
+        quotas = borough_quotas or {}
+        caps = np.array([quotas.get(b, np.inf) for b in categories], dtype=float)
+
+        values = np.asarray(values, dtype=float)
+        costs = np.asarray(costs, dtype=float)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            ratio = values / costs
+        order = np.lexsort((-np.asarray(priority, dtype=float), -ratio))
+
+        self.order = order
+        self.values = values[order]
+        self.costs = costs[order]
+        self.groups = codes[order]
+        self.caps = caps
+
+    def __len__(self):
+        return len(self.values)
+
+    def upper_bound(self, start=0, budget=None, caps=None):
+        """
+        Valeur de la relaxation continue sur les candidats start..n: remplissage
+        par ratio décroissant, chaque arrondissement limité à son plafond.
+        Les plafonds portant sur des groupes disjoints de même coût, ce
+        remplissage est l'optimum continu: borne supérieure de l'optimum entier
+        """
+        budget = self.budget if budget is None else budget
+        caps = self.caps if caps is None else caps
+        costs = self.costs[start:]
+        groups = self.groups[start:]
+        if len(costs) == 0 or budget <= 0:
+            return 0.0
+
+        # Part de chaque candidat permise par le plafond de son arrondissement
+        spent_before = group_cumsum(costs, groups) - costs
+        allowed = np.clip(caps[groups] - spent_before, 0, costs)
+
+        # Puis par le budget global
+        spent_before = np.cumsum(allowed) - allowed
+        taken = np.clip(budget - spent_before, 0, allowed)
+        return float(np.sum(self.values[start:] * taken / costs))
+
+    def greedy(self):
+        """
+        Glouton par ratio: chaque candidat est retenu s'il tient dans le
+        budget et le plafond de son arrondissement. Le préfixe retenu d'un
+        bloc est calculé par sommes cumulées; seuls les candidats encore
+        assez petits pour tenir sont ensuite parcourus un à un
+        """
+        n = len(self)
+        selected = np.zeros(n, dtype=bool)
+        group_spent = group_cumsum(self.costs, self.groups)
+        total_spent = np.cumsum(self.costs)
+        fits = (total_spent <= self.budget) & (group_spent <= self.caps[self.groups])
+        prefix = n if fits.all() else int(np.argmin(fits))
+        selected[:prefix] = True
+
+        remaining = self.budget - self.costs[:prefix].sum()
+        caps_left = self.caps - np.bincount(self.groups[:prefix], weights=self.costs[:prefix],
+                                            minlength=len(self.caps))
+        tail = prefix + np.flatnonzero(
+            (self.costs[prefix:] <= remaining) &
+            (self.costs[prefix:] <= caps_left[self.groups[prefix:]])
+        )
+        for i in tail:
+            cost, group = self.costs[i], self.groups[i]
+            if cost <= remaining and cost <= caps_left[group]:
+                selected[i] = True
+                remaining -= cost
+                caps_left[group] -= cost
+
+        # Garantie classique du glouton: au moins la valeur du meilleur candidat seul
+        feasible = (self.costs <= self.budget) & (self.costs <= self.caps[self.groups])
+        if feasible.any():
+            best = int(np.argmax(np.where(feasible, self.values, -np.inf)))
+            if self.values[best] > self.values[selected].sum():
+                selected[:] = False
+                selected[best] = True
+        return selected
+
+    def branch_and_bound(self, node_limit=EXACT_NODE_LIMIT):
+        """
+        Optimum exact par séparation et évaluation (inclure / exclure chaque
+        candidat dans l'ordre des ratios), élagué par upper_bound et amorcé
+        par la solution gloutonne. Retourne (sélection, optimal): optimal est
+        faux si node_limit est atteint (meilleure solution trouvée)
+        """
+        n = len(self)
+        best = self.greedy()
+        best_value = self.values[best].sum()
+
+        # Parcours en profondeur (pile explicite); chosen: liste chaînée
+        # (candidat, parent) des candidats inclus
+        stack = [(0, self.budget, 0.0, self.caps, None)]
+        nodes = 0
+        while stack:
+            nodes += 1
+            if nodes > node_limit:
+                return best, False
+            i, budget, value, caps, chosen = stack.pop()
+            if value > best_value:
+                best_value = value
+                best = np.zeros(n, dtype=bool)
+                link = chosen
+                while link is not None:
+                    best[link[0]] = True
+                    link = link[1]
+            if i == n or value + self.upper_bound(i, budget, caps) <= best_value + 1e-9:
+                continue
+
+            # Exclusion empilée d'abord: l'inclusion est explorée en premier
+            stack.append((i + 1, budget, value, caps, chosen))
+            cost, group = self.costs[i], self.groups[i]
+            if cost <= budget and cost <= caps[group]:
+                included_caps = caps.copy()
+                included_caps[group] -= cost
+                stack.append((i + 1, budget - cost, value + self.values[i], included_caps, (i, chosen)))
+        return best, True
+
+    def selection_index(self, selected):
+        """Positions (dans l'ordre d'origine) des candidats retenus"""
+        return self.order[selected]
+
+
+def optimize_portfolio(buildings, budget, social_weight=0.0, borough_quotas=None,
+                       min_priority=0.0, method='auto'):
+    """
+    Choisit les bâtiments à financer
+
+    - budget: montant total ($); borough_quotas: {arrondissement: plafond ($)}
+    - social_weight: 0 = réduction GES seule
+    - min_priority: score de priorité minimal des candidats
+    - method: 'exact', 'greedy' ou 'auto' (exact jusqu'à EXACT_MAX_CANDIDATES)
+
+    Retourne un dictionnaire: bâtiments retenus (triés par ratio valeur/coût),
+    coût, valeur et GES totaux, borne supérieure, méthode, optimalité
+    """
+    if method not in ('auto', 'exact', 'greedy'):
+        raise ValueError(f"Unknown method: {method}")
+
+    costs = estimate_retrofit_cost(buildings)
+    values = portfolio_value(buildings, social_weight)
+    quotas = borough_quotas or {}
+    caps = buildings['boroughName'].map(quotas).fillna(np.inf)
+
+    candidates = ((values > 0) & (costs > 0) & (costs <= budget) & (costs <= caps) &
+                  (buildings['priority_score'].fillna(0) >= min_priority)).to_numpy()
+    pool = buildings[candidates]
+
+    problem = PortfolioProblem(values[candidates], costs[candidates], pool['priority_score'].fillna(0),
+                               pool['boroughName'], budget, quotas)
+    if method == 'auto':
+        method = 'exact' if len(problem) <= EXACT_MAX_CANDIDATES else 'greedy'
+
+    if method == 'exact':
+        selected, optimal = problem.branch_and_bound()
+    else:
+        selected, optimal = problem.greedy(), False
+
+    positions = problem.selection_index(selected)
+    portfolio = pool.iloc[positions].copy()
+    portfolio['retrofit_cost'] = costs[candidates].iloc[positions]
+    portfolio['portfolio_value'] = values[candidates].iloc[positions]
+
+    total_value = float(portfolio['portfolio_value'].sum())
+    upper_bound = problem.upper_bound()
+    return {
+        'portfolio': portfolio,
+        'n_candidates': len(problem),
+        'total_cost': float(portfolio['retrofit_cost'].sum()),
+        'total_value': total_value,
+        'total_ges': float(portfolio['estimated_ges_reduction_potential'].sum()),
+        'upper_bound': upper_bound,
+        'gap': 0.0 if optimal else max(upper_bound - total_value, 0.0) / max(upper_bound, 1e-12),
+        'method': method,
+        'optimal': optimal,
+    }
+
+
+def parse_quotas(values):
+    """Plafonds 'ARRONDISSEMENT=MONTANT' de la ligne de commande"""
+    quotas = {}
+    for value in values or []:
+        borough, _, amount = value.rpartition('=')
+        if not borough:
+            raise ValueError(f"Invalid quota (expected BOROUGH=AMOUNT): {value}")
+        quotas[borough] = float(amount)
+    return quotas
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Budget-constrained retrofit portfolio")
+    parser.add_argument('--budget', type=float, required=True, help="Total budget ($)")
+    parser.add_argument('--social-weight', type=float, default=0.0)
+    parser.add_argument('--min-priority', type=float, default=0.0)
+    parser.add_argument('--quota', action='append', help="Borough spending cap: BOROUGH=AMOUNT")
+    parser.add_argument('--exact', action='store_true', help="Force the exact solver")
+    args = parser.parse_args(argv)
+
+    print("="*80)
+    print("RETROFIT PORTFOLIO OPTIMIZATION")
+    print("="*80)
+
+    buildings = load_table(prioritization.PRIORITIZED_OUTPUT, columns=PORTFOLIO_COLUMNS)
+    result = optimize_portfolio(
+        buildings, args.budget, social_weight=args.social_weight,
+        borough_quotas=parse_quotas(args.quota), min_priority=args.min_priority,
+        method='exact' if args.exact else 'auto'
+    )
+
+    portfolio = result['portfolio']
+    print(f"\n{result['n_candidates']} candidates, solver: {result['method']}"
+          f"{' (optimal)' if result['optimal'] else ''}")
+    print(f"Selected {len(portfolio)} buildings for ${result['total_cost']:,.0f} "
+          f"of ${args.budget:,.0f}")
+    print(f"Total GES reduction: {result['total_ges']:.1f} tonnes CO2/year")
+    print(f"Objective: {result['total_value']:.1f} (upper bound {result['upper_bound']:.1f}, "
+          f"gap {result['gap']:.2%})")
+    print("\nSpending by borough:")
+    print(portfolio.groupby('boroughName', observed=True)['retrofit_cost'].sum()
+          .sort_values(ascending=False).to_string())
+
+    portfolio.to_csv(PORTFOLIO_OUTPUT, index=False, encoding='utf-8-sig')
+    print(f"\n[OK] Portfolio saved to {PORTFOLIO_OUTPUT}")
+    return result
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,208 @@
+"""
+Planification pluriannuelle des rénovations sous capacité des entrepreneurs
+
+Chaque bâtiment priorisé devient un chantier:
+- durée en mois-équipe, selon la surface
+- travaux saisonniers (adaptation climatique: inondation, toits verts,
+  végétation) réalisés entièrement dans la saison de construction
+- une équipe d'entrepreneur réalise un chantier à la fois; chaque
+  arrondissement dispose d'un nombre limité d'équipes
+
+Ordonnancement par événements: les chantiers sont pris par réduction GES
+par mois de travaux décroissante (règle de Smith, qui maximise la réduction
+cumulée), chacun affecté à l'équipe de son arrondissement qui se libère le
+plus tôt (tas min des dates de disponibilité). Les chantiers qui ne se
+terminent pas dans l'horizon du plan restent non planifiés.
+
+Usage: python retrofit_scheduler.py [--years N] [--crews N] [--start-year AAAA]
+"""
+
+import argparse
+import heapq
+import importlib
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import load_table
+from pipeline_files import SCHEDULE_OUTPUT, SCHEDULE_SUMMARY_OUTPUT
+
+prioritization = importlib.import_module('03_ml_prioritization_model')
+
+PLAN_YEARS = 10
+START_YEAR = prioritization.CURRENT_YEAR + 1
+# Équipes d'entrepreneurs par arrondissement (sauf capacité explicite)
+DEFAULT_CREWS = 2
+
+# Durée d'un chantier: surface (m², 1000 si inconnue) / productivité, 1 à 12 mois
+AREA_PER_CREW_MONTH = 1500.0
+DEFAULT_AREA = 1000.0
+MAX_DURATION_MONTHS = 12
+
+# Saison de construction des travaux extérieurs: mai (4) à octobre (9), mois 0 = janvier
+SEASON_START_MONTH = 4
+SEASON_END_MONTH = 10
+SEASONAL_RECOMMENDATIONS = (
+    "Mesures de protection contre les inondations",
+    "Imperméabilisation du sous-sol",
+    "Installation de toits verts ou toits blancs",
+    "Augmentation de la végétation périmétrique",
+)
+
+SCHEDULE_COLUMNS = (
+    'buildingName', 'address', 'boroughName', 'buildingArea', 'builtArea',
+    'priority_score', 'priority_level', 'recommendations',
+    'estimated_ges_reduction_potential',
+)
+
+
+def work_duration(buildings):
+    """Durée des chantiers en mois-équipe"""
+    area = buildings['buildingArea'].fillna(buildings['builtArea'].fillna(DEFAULT_AREA))
+    months = np.ceil(area.to_numpy(dtype=float) / AREA_PER_CREW_MONTH)
+    return np.clip(np.nan_to_num(months, nan=1), 1, MAX_DURATION_MONTHS).astype(np.int64)
+
+
+def is_seasonal(recommendations):
+    """Vrai si les recommandations comprennent des travaux extérieurs saisonniers"""
+    codes, texts = pd.factorize(pd.Series(recommendations).astype(object))
+    seasonal = np.array([any(work in str(text) for work in SEASONAL_RECOMMENDATIONS) for text in texts] +
+                        [False])
+    return seasonal[codes]
+
+
+def seasonal_start(month, duration):
+    """
+    Premier mois >= month où peut débuter un chantier saisonnier: le chantier
+    tient dans la saison, ou débute en début de saison s'il est plus long
+    """
+    season_length = SEASON_END_MONTH - SEASON_START_MONTH
+    year, in_year = divmod(month, 12)
+    start = year * 12 + max(in_year, SEASON_START_MONTH)
+    latest = year * 12 + SEASON_END_MONTH - min(duration, season_length)
+    if start > latest:
+        start = (year + 1) * 12 + SEASON_START_MONTH
+    return start
+
+
+def schedule_retrofits(buildings, years=PLAN_YEARS, crews=DEFAULT_CREWS, borough_crews=None,
+                       start_year=START_YEAR):
+    """
+    Plan des chantiers sur years années
+
+    - crews: équipes par arrondissement; borough_crews: {arrondissement: équipes}
+      (0: aucun chantier dans l'arrondissement)
+
+    Retourne (chantiers, résumé annuel). Les chantiers gardent l'index des
+    bâtiments, avec start_month / finish_month (mois depuis janvier de
+    start_year, NaN si non planifié), année de début et de fin
+    """
+    horizon = years * 12
+    borough_crews = borough_crews or {}
+    ges = buildings['estimated_ges_reduction_potential'].fillna(0).to_numpy(dtype=float)
+    duration = work_duration(buildings)
+    seasonal = is_seasonal(buildings['recommendations']) if 'recommendations' in buildings.columns \
+        else np.zeros(len(buildings), dtype=bool)
+    boroughs, names = pd.factorize(buildings['boroughName'].astype(object), use_na_sentinel=False)
+
+    # Réduction GES par mois de travaux décroissante, puis score de priorité
+    priority = buildings['priority_score'].fillna(0).to_numpy(dtype=float)
+    order = np.lexsort((-priority, -(ges / duration)))
+
+    free_at = [[0] * borough_crews.get(name, crews) for name in names]
+    start_month = np.full(len(buildings), np.nan)
+
+    for i, d, borough, outdoor in zip(order.tolist(), duration[order].tolist(),
+                                      boroughs[order].tolist(), seasonal[order].tolist()):
+        crew_free = free_at[borough]
+        if not crew_free:
+            continue
+        start = crew_free[0]
+        if outdoor:
+            start = seasonal_start(start, d)
+        if start + d > horizon:
+            continue
+        heapq.heapreplace(crew_free, start + d)
+        start_month[i] = start
+
+    schedule = pd.DataFrame({
+        'work_months': duration,
+        'seasonal_work': seasonal,
+        'start_month': start_month,
+        'finish_month': start_month + duration,
+    }, index=buildings.index)
+    schedule['start_year'] = (start_year + schedule['start_month'] // 12).astype('Int64')
+    schedule['completion_year'] = (start_year + (schedule['finish_month'] - 1) // 12).astype('Int64')
+    # Tonnes évitées d'ici la fin du plan (réduction effective après le chantier)
+    schedule['ges_avoided_in_plan'] = ges * np.nan_to_num((horizon - schedule['finish_month']) / 12)
+
+    return schedule, summarize_schedule(schedule, ges, years, start_year)
+
+
+def summarize_schedule(schedule, ges, years, start_year):
+    """Chantiers terminés, réduction annuelle ajoutée et cumulée par année du plan"""
+    done = schedule['completion_year'].notna().to_numpy()
+    completed = pd.DataFrame({
+        'year': schedule['completion_year'].to_numpy()[done].astype(int),
+        'ges': ges[done],
+        'work_months': schedule['work_months'].to_numpy()[done],
+    })
+    summary = completed.groupby('year').agg(
+        buildings_completed=('ges', 'size'),
+        crew_months=('work_months', 'sum'),
+        ges_reduction_added=('ges', 'sum'),
+    ).reindex(range(start_year, start_year + years), fill_value=0)
+    summary.index.name = 'year'
+    summary['cumulative_ges_reduction'] = summary['ges_reduction_added'].cumsum()
+
+    # Tonnes évitées depuis le début du plan jusqu'à la fin de chaque année
+    finish = schedule['finish_month'].to_numpy()[done]
+    summary['ges_avoided_cumulative'] = [
+        float(np.sum(ges[done] * np.clip(year_end - finish, 0, None) / 12))
+        for year_end in 12 * np.arange(1, years + 1)
+    ]
+    return summary.reset_index()
+
+
+def save_schedule(buildings, schedule, summary, schedule_file=SCHEDULE_OUTPUT,
+                  summary_file=SCHEDULE_SUMMARY_OUTPUT):
+    """Exporte le plan (chantiers planifiés, par date de début) et son résumé annuel"""
+    planned = pd.concat([buildings[['buildingName', 'address', 'boroughName', 'priority_score',
+                                    'estimated_ges_reduction_potential']], schedule], axis=1)
+    planned = planned[planned['start_month'].notna()].sort_values(['start_month', 'boroughName'])
+    planned.to_csv(schedule_file, index=False, encoding='utf-8-sig')
+    summary.to_csv(summary_file, index=False, encoding='utf-8-sig')
+    print(f"[OK] Retrofit schedule saved to {schedule_file}")
+    print(f"[OK] Yearly plan summary saved to {summary_file}")
+
+
+def plan_retrofits(buildings_prioritized, years=PLAN_YEARS, crews=DEFAULT_CREWS, borough_crews=None,
+                   start_year=START_YEAR):
+    """Étape du pipeline: planifie les chantiers et exporte le plan"""
+    schedule, summary = schedule_retrofits(buildings_prioritized, years, crews, borough_crews, start_year)
+
+    n_planned = int(schedule['start_month'].notna().sum())
+    print(f"{n_planned} of {len(schedule)} buildings scheduled over {years} years "
+          f"({crews} crews per borough by default)")
+    print(summary.to_string(index=False))
+    save_schedule(buildings_prioritized, schedule, summary)
+    return schedule, summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Multi-year retrofit scheduler")
+    parser.add_argument('--years', type=int, default=PLAN_YEARS)
+    parser.add_argument('--crews', type=int, default=DEFAULT_CREWS, help="Contractor crews per borough")
+    parser.add_argument('--start-year', type=int, default=START_YEAR)
+    args = parser.parse_args(argv)
+
+    print("="*80)
+    print("MULTI-YEAR RETROFIT SCHEDULE")
+    print("="*80)
+
+    buildings = load_table(prioritization.PRIORITIZED_OUTPUT, columns=SCHEDULE_COLUMNS)
+    return plan_retrofits(buildings, args.years, args.crews, start_year=args.start_year)
+
+
+if __name__ == "__main__":
+    main()
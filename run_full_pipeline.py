@@ -1,44 +1,107 @@
 """
 Pipeline complet reproductible
-Exécute toutes les étapes du traitement
+Exécute toutes les étapes du traitement dans un seul processus: les données
+sont chargées une fois et passent d'une étape à l'autre en mémoire.
+Les résultats d'étapes sont mis en cache: une exécution sans changement des
+données, du code ou des paramètres ne recalcule rien.
+
+Usage: python run_full_pipeline.py [--no-cache] [--clear-cache] [--no-csv] [--supervised] [--incremental]
 """
 
-import subprocess
+import importlib
+import importlib.util
 import sys
-from pathlib import Path
+import traceback
 
-def run_script(script_name, description):
-    """Execute un script Python et affiche les résultats"""
-    print("\n" + "="*80)
-    print(f"EXECUTING: {description}")
-    print("="*80)
+import pipeline_files
+from pipeline import Pipeline, Stage
+from stage_cache import StageCache
 
-    try:
-        result = subprocess.run(
-            [sys.executable, script_name],
-            capture_output=True,
-            text=True,
-            encoding='utf-8',
-            errors='ignore'
-        )
-
-        if result.returncode == 0:
-            print(f"[SUCCESS] {script_name}")
-            # Print last 30 lines of output
-            lines = result.stdout.split('\n')
-            print('\n'.join(lines[-30:]))
-        else:
-            print(f"[ERROR] {script_name} failed with code {result.returncode}")
-            print(result.stderr)
-            return False
+# Noms de fichiers pris dans pipeline_files (sans dépendance): les modules
+# d'étapes, qui chargent pandas, scikit-learn et scipy, ne sont importés que
+# par les étapes qui s'exécutent. Une exécution entièrement en cache n'importe
+# donc ni pandas ni pyarrow: la présence de pyarrow (columnar_io.HAS_ARROW)
+# est testée sans l'importer
+HAS_ARROW = importlib.util.find_spec('pyarrow') is not None
 
-    except Exception as e:
-        print(f"[EXCEPTION] Error running {script_name}: {e}")
-        return False
+# Fichiers lus par l'étape de chargement
+DATA_FILES = list(pipeline_files.DATA_FILES.values())
+
+# Tables intermédiaires typées (Arrow IPC si pyarrow est installé) et exports CSV
+TABLE_STEMS = [pipeline_files.ENRICHED_OUTPUT, pipeline_files.PRIORITIZED_OUTPUT]
+TABLE_FILES = [f"{stem}.arrow" for stem in TABLE_STEMS] if HAS_ARROW else []
+CSV_FILES = [f"{stem}.csv" for stem in TABLE_STEMS]
+TOP_100_FILE = pipeline_files.TOP_100_OUTPUT
+# Calibration figée du score (voir 03_ml_prioritization_model.ScoringCalibration)
+CALIBRATION_FILE = pipeline_files.CALIBRATION_FILE
+# Plan pluriannuel des rénovations
+SCHEDULE_FILES = [pipeline_files.SCHEDULE_OUTPUT, pipeline_files.SCHEDULE_SUMMARY_OUTPUT]
+
+# Modules partagés dont dépendent les étapes de matching et de priorisation
+MATCHING_MODULES = ('borough_resolver', 'geojson_stream', 'spatial_index', 'heat_grid', 'building_schema',
+                    'pipeline_files')
+PRIORITIZATION_MODULES = ('borough_resolver', 'stage_cache', 'building_schema', 'pipeline_files')
+
+
+def output_files(export_csv=True):
+    """Fichiers écrits par l'étape d'export"""
+    csv_files = CSV_FILES if export_csv or not HAS_ARROW else []
+    return TABLE_FILES + csv_files + [TOP_100_FILE, CALIBRATION_FILE]
+
+
+def export_outputs(buildings_enriched, buildings_prioritized, calibration, export_csv=True):
+    """Écrit les tables du pipeline (et leurs exports CSV si export_csv) et la calibration"""
+    matching = importlib.import_module('02_intelligent_matching')
+    prioritization = importlib.import_module('03_ml_prioritization_model')
+    matching.save_enriched(buildings_enriched, export_csv=export_csv)
+    prioritization.save_outputs(buildings_prioritized, top_100_file=TOP_100_FILE, export_csv=export_csv)
+    calibration.save(CALIBRATION_FILE)
+    print(f"[OK] Scoring calibration saved to {CALIBRATION_FILE}")
 
-    return True
 
-def main():
+def build_pipeline(prioritization_params=None, export_csv=True):
+    """
+    Graphe des étapes: chargement -> (exploration | matching -> priorisation
+    -> (export | planification))
+
+    prioritization_params: arguments de prioritize_and_calibrate (weights,
+    n_clusters, supervised, clustering); les valeurs par défaut sont celles
+    du module 03. La priorisation lit la calibration de l'exécution
+    précédente, CALIBRATION_FILE, passée explicitement et déclarée en
+    entrée de l'étape (numéros de clusters stables, démarrage du mode
+    incrémental)
+    export_csv: exporter aussi les tables en CSV
+    """
+    return Pipeline([
+        Stage('load', '02_intelligent_matching:load_and_prepare_data',
+              outputs=['raw_data'], files=DATA_FILES, code=MATCHING_MODULES,
+              description="Chargement des données"),
+        Stage('explore', '01_data_exploration:explore_loaded',
+              inputs=['raw_data'], code=('geojson_stream',),
+              description="Exploration des données"),
+        Stage('match', '02_intelligent_matching:enrich_buildings',
+              inputs=['raw_data'], outputs=['buildings_enriched'], code=MATCHING_MODULES,
+              description="Matching intelligent sans géomatique"),
+        Stage('prioritize', '03_ml_prioritization_model:prioritize_and_calibrate',
+              inputs=['buildings_enriched'], outputs=['buildings_prioritized', 'features', 'calibration'],
+              params={'previous_calibration': CALIBRATION_FILE, **(prioritization_params or {})},
+              files=(CALIBRATION_FILE,), code=PRIORITIZATION_MODULES,
+              description="Modèle ML de priorisation"),
+        Stage('export', export_outputs,
+              inputs=['buildings_enriched', 'buildings_prioritized', 'calibration'],
+              params={'export_csv': export_csv},
+              code=('02_intelligent_matching', '03_ml_prioritization_model', 'columnar_io', 'pipeline_files'),
+              targets=output_files(export_csv),
+              description="Export des résultats"),
+        Stage('schedule', 'retrofit_scheduler:plan_retrofits',
+              inputs=['buildings_prioritized'],
+              code=('03_ml_prioritization_model', 'columnar_io', 'pipeline_files'),
+              targets=SCHEDULE_FILES,
+              description="Planification pluriannuelle des rénovations"),
+    ])
+
+
+def main(use_cache=True, clear_cache=False, export_csv=True, supervised=False, incremental=False):
     print("""
     ============================================================================
                      BUILDING RISK PRIORITIZATION PIPELINE
@@ -48,34 +111,36 @@ def main():
     ============================================================================
     """)
 
-    # Pipeline steps
-    steps = [
-        ("01_data_exploration.py", "Exploration des données"),
-        ("02_intelligent_matching.py", "Matching intelligent sans géomatique"),
-        ("03_ml_prioritization_model.py", "Modèle ML de priorisation"),
-    ]
-
-    success = True
-    for script, description in steps:
-        if not run_script(script, description):
-            success = False
-            print(f"\n[ABORT] Pipeline stopped due to error in {script}")
-            break
-
-    if success:
-        print("\n" + "="*80)
-        print("[COMPLETE] Pipeline executed successfully!")
-        print("="*80)
-        print("\nOutputs generated:")
-        print("  - output_buildings_enriched.csv")
-        print("  - output_buildings_prioritized.csv")
-        print("  - output_top_100_priorities.csv")
-        print("\nNext steps:")
-        print("  - Review the prioritized buildings list")
-        print("  - Launch the web dashboard: streamlit run 04_web_dashboard.py")
-        print("  - Read the methodology document: METHODOLOGY.md")
-
-    return success
+    cache = StageCache() if use_cache else None
+    if cache is not None and clear_cache:
+        cache.clear()
+
+    try:
+        prioritization_params = {}
+        if supervised:
+            prioritization_params['supervised'] = True
+        if incremental:
+            prioritization_params['clustering'] = 'incremental'
+        build_pipeline(prioritization_params or None, export_csv=export_csv).run(cache=cache)
+    except Exception as e:
+        print(f"\n[ABORT] Pipeline stopped due to error: {e}")
+        traceback.print_exc()
+        return False
+
+    print("\n" + "="*80)
+    print("[COMPLETE] Pipeline executed successfully!")
+    print("="*80)
+    print("\nOutputs generated:")
+    for output_file in output_files(export_csv) + SCHEDULE_FILES:
+        print(f"  - {output_file}")
+    print("\nNext steps:")
+    print("  - Review the prioritized buildings list")
+    print("  - Launch the web dashboard: streamlit run 04_web_dashboard.py")
+    print("  - Read the methodology document: METHODOLOGY.md")
+
+    return True
 
 if __name__ == "__main__":
-    main()
+    main(use_cache='--no-cache' not in sys.argv, clear_cache='--clear-cache' in sys.argv,
+         export_csv='--no-csv' not in sys.argv, supervised='--supervised' in sys.argv,
+         incremental='--incremental' in sys.argv)
@@ -0,0 +1,74 @@
+"""
+Niveau de détail du nuage de points multi-critères du dashboard
+
+- jusqu'à WEBGL_MAX_POINTS bâtiments: tous les points, rendus en WebGL
+- au-delà: densité de tous les bâtiments calculée côté serveur (histogramme
+  2D de DENSITY_BINS x DENSITY_BINS cases) et échantillon stratifié par
+  niveau de priorité d'environ SAMPLE_POINTS points; les niveaux de
+  KEEP_LEVELS (Critical) sont conservés en entier
+
+L'échantillon est tiré avec une graine fixe: il ne change pas d'une
+interaction à l'autre tant que les filtres sont les mêmes.
+"""
+
+import numpy as np
+import pandas as pd
+
+WEBGL_MAX_POINTS = 50_000
+SAMPLE_POINTS = 20_000
+DENSITY_BINS = 50
+KEEP_LEVELS = ('Critical',)
+
+
+def stratified_sample(levels, budget, keep=KEEP_LEVELS, seed=42):
+    """
+    Positions (croissantes) d'un échantillon stratifié par niveau: toutes les
+    lignes des niveaux keep, puis le reste du budget réparti entre les
+    autres niveaux au prorata de leurs effectifs
+    """
+    codes, strata = pd.factorize(pd.Series(levels), use_na_sentinel=False)
+    rng = np.random.default_rng(seed)
+    kept = np.isin(codes, [i for i, level in enumerate(strata) if level in keep])
+    n_others = len(codes) - int(kept.sum())
+    fraction = min(1.0, max(budget - int(kept.sum()), 0) / max(n_others, 1))
+
+    chosen = [np.flatnonzero(kept)]
+    for code, level in enumerate(strata):
+        if level in keep:
+            continue
+        members = np.flatnonzero(codes == code)
+        size = int(round(len(members) * fraction))
+        chosen.append(rng.choice(members, size=size, replace=False))
+    return np.sort(np.concatenate(chosen))
+
+
+def density_grid(x, y, bins=DENSITY_BINS):
+    """Nombre de bâtiments par case (x, y), centres des cases; NaN ignorés"""
+    x = np.asarray(x, dtype=float)
+    y = np.asarray(y, dtype=float)
+    known = ~(np.isnan(x) | np.isnan(y))
+    counts, x_edges, y_edges = np.histogram2d(x[known], y[known], bins=bins)
+    return counts, (x_edges[:-1] + x_edges[1:]) / 2, (y_edges[:-1] + y_edges[1:]) / 2
+
+
+def scatter_level_of_detail(df, x, y, level_column='priority_level', max_points=WEBGL_MAX_POINTS,
+                            sample_points=SAMPLE_POINTS, bins=DENSITY_BINS, seed=42):
+    """
+    Points à tracer pour le nuage (x, y) de df
+    Retourne {'points': lignes tracées, 'density': (comptes, centres x,
+    centres y) ou None, 'n_total', 'n_shown', 'sampled'}
+    """
+    n_total = len(df)
+    if n_total <= max_points:
+        return {'points': df, 'density': None, 'n_total': n_total, 'n_shown': n_total, 'sampled': False}
+
+    positions = stratified_sample(df[level_column], sample_points, seed=seed)
+    points = df.iloc[positions]
+    return {
+        'points': points,
+        'density': density_grid(df[x].to_numpy(dtype=float, na_value=np.nan),
+                                df[y].to_numpy(dtype=float, na_value=np.nan), bins),
+        'n_total': n_total,
+        'n_shown': len(points),
+        'sampled': True,
+    }
@@ -0,0 +1,388 @@
+"""
+Analyse de sensibilité du classement aux pondérations du score de priorité
+
+Chaque scénario est un vecteur de poids (mêmes features que PRIORITY_WEIGHTS)
+et un bonus âge-climat. Les scores bruts de tous les scénarios d'un bloc sont
+obtenus par un seul produit matriciel:
+    (bâtiments x features, indicateur du bonus) @ (features, bonus x scénarios)
+La normalisation 0-100 étant monotone, les rangs se calculent sur les scores
+bruts, sans tri complet des bâtiments:
+- rang de chaque bâtiment: rang du meilleur bâtiment de sa classe dans un
+  histogramme fin des scores du scénario (RANK_RESOLUTION classes,
+  float32): les ex aequo partagent ce rang, et deux bâtiments de scores
+  différents ne sont confondus que s'ils tombent dans la même classe
+- top N exact: seuls les bâtiments des classes les plus hautes sont
+  rescorés en float64 (arrondis à 1e-12, comme le classement de référence)
+  et départagés par partition
+Les scénarios sont traités par blocs: la mémoire dépend du nombre de
+bâtiments, de la taille des blocs et du nombre de blocs évalués en
+parallèle, pas du nombre de scénarios. Ordre de grandeur: 10 000 scénarios
+sur 100 000 bâtiments en une trentaine de secondes sur un seul cœur.
+
+Résultats:
+- par bâtiment: distribution du rang (moyenne, écart-type, min, max sur tous
+  les scénarios; quantiles sur QUANTILE_SCENARIOS scénarios répartis dans la
+  liste), fréquence d'appartenance au top N
+- par scénario: tau de Kendall (tau-b, sur un échantillon fixe de
+  bâtiments) et recouvrement du top N avec le classement de référence
+  (pondération actuelle)
+
+Les rangs commencent à 1; les ex aequo partagent le meilleur rang. Le rang
+de référence (baseline_rank) est obtenu par la même estimation: un scénario
+identique à la pondération actuelle ne déplace aucun bâtiment.
+
+Usage: python scenario_sweep.py [--scenarios N] [--block-size N] [--top N] [--seed N]
+"""
+
+import argparse
+import importlib
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import numpy as np
+import pandas as pd
+
+from columnar_io import load_table
+
+prioritization = importlib.import_module('03_ml_prioritization_model')
+
+SCENARIO_FEATURES = tuple(prioritization.PRIORITY_WEIGHTS)
+BONUS_COLUMN = 'age_climate_bonus'
+BUILDING_RANKS_OUTPUT = 'output_scenario_building_ranks.csv'
+SCENARIOS_OUTPUT = 'output_scenarios.csv'
+N_SCENARIOS = 1000
+BLOCK_SIZE = 64
+TOP_N = 100
+# Classes de score par scénario pour l'estimation des rangs
+RANK_RESOLUTION = 16384
+TAU_SAMPLE = 1000
+QUANTILE_SCENARIOS = 256
+MAX_WORKERS = min(4, os.cpu_count() or 1)
+RANK_QUANTILES = (0.05, 0.5, 0.95)
+
+
+def random_scenarios(n_scenarios, concentration=50.0, bonus_range=(0.0, 0.3), seed=42):
+    """
+    Scénarios tirés autour de la pondération actuelle: poids selon une loi de
+    Dirichlet centrée sur PRIORITY_WEIGHTS (somme = 1, plus concentration est
+    grand, plus les poids restent proches), bonus uniforme dans bonus_range
+    """
+    rng = np.random.default_rng(seed)
+    base = np.array([prioritization.PRIORITY_WEIGHTS[f] for f in SCENARIO_FEATURES])
+    scenarios = pd.DataFrame(rng.dirichlet(base * concentration, size=n_scenarios),
+                             columns=list(SCENARIO_FEATURES))
+    scenarios[BONUS_COLUMN] = rng.uniform(*bonus_range, size=n_scenarios)
+    return scenarios
+
+
+def baseline_scenario():
+    """Pondération actuelle du modèle, au format des scénarios"""
+    return pd.DataFrame([{**prioritization.PRIORITY_WEIGHTS,
+                          BONUS_COLUMN: prioritization.AGE_CLIMATE_BONUS}])
+
+
+def competition_ranks(scores):
+    """
+    Rangs par ligne (1 = meilleur score) d'une matrice (scénarios x bâtiments)
+    Les ex aequo reçoivent tous le meilleur rang de leur groupe
+    """
+    order = np.argsort(-scores, axis=1)
+    sorted_scores = np.take_along_axis(scores, order, axis=1)
+    positions = np.broadcast_to(np.arange(scores.shape[1]), scores.shape)
+
+    # Début de chaque groupe d'ex aequo, propagé sur le groupe
+    starts = np.ones(scores.shape, dtype=bool)
+    starts[:, 1:] = sorted_scores[:, 1:] != sorted_scores[:, :-1]
+    group_ranks = np.maximum.accumulate(np.where(starts, positions, 0), axis=1) + 1
+
+    ranks = np.empty(scores.shape, dtype=np.int32)
+    np.put_along_axis(ranks, order, group_ranks.astype(np.int32), axis=1)
+    return ranks
+
+
+def inversions(values):
+    """
+    Nombre de paires i < j avec values[i] > values[j], par ligne
+    Tri fusion vectorisé: à chaque niveau, les blocs voisins (déjà triés)
+    sont fusionnés par un tri stable de toutes les lignes à la fois
+    """
+    n_rows, n = values.shape
+    size = 1 << max(n - 1, 0).bit_length()
+    merged = np.full((n_rows, size), np.inf)
+    merged[:, :n] = values
+    counts = np.zeros(n_rows, dtype=np.int64)
+
+    width = 1
+    while width < size:
+        pairs = merged.reshape(n_rows, -1, 2 * width)
+        order = np.argsort(pairs, axis=2, kind='stable')
+        from_right = order >= width
+        # Éléments de gauche strictement supérieurs à chaque élément de droite
+        left_before = np.cumsum(~from_right, axis=2)
+        counts += np.where(from_right, width - left_before, 0).sum(axis=(1, 2))
+        merged = np.take_along_axis(pairs, order, axis=2).reshape(n_rows, size)
+        width *= 2
+    return counts
+
+
+def tied_pairs(equal):
+    """
+    Nombre de paires ex aequo de chaque ligne d'une suite triée, donnée par
+    equal (lignes x n - 1): élément égal à son prédécesseur
+    """
+    n_rows, n = equal.shape[0], equal.shape[1] + 1
+    starts = np.ones((n_rows, n), dtype=bool)
+    starts[:, 1:] = ~equal
+    positions = np.broadcast_to(np.arange(n), starts.shape)
+    first = np.maximum.accumulate(np.where(starts, positions, 0), axis=1)
+    return (positions - first).sum(axis=1)
+
+
+def kendall_tau(x, y):
+    """
+    Tau-b de Kendall entre chaque ligne de x (scénarios x échantillon) et y
+    (échantillon), comme scipy.stats.kendalltau: algorithme de Knight (tri
+    par (x, y) puis comptage des inversions de y)
+    """
+    n = x.shape[1]
+    order = np.lexsort((np.broadcast_to(y, x.shape), x), axis=1)
+    xs = np.take_along_axis(x, order, axis=1)
+    ys = y[order]
+
+    total = n * (n - 1) // 2
+    x_equal = xs[:, 1:] == xs[:, :-1]
+    sorted_y = np.sort(y)[None, :]
+    x_ties = tied_pairs(x_equal)
+    y_ties = tied_pairs(sorted_y[:, 1:] == sorted_y[:, :-1])[0]
+    joint_ties = tied_pairs(x_equal & (ys[:, 1:] == ys[:, :-1]))
+    concordance = total - x_ties - y_ties + joint_ties - 2 * inversions(ys)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        return concordance / np.sqrt((total - x_ties) * (total - y_ties))
+
+
+class ScenarioSweep:
+    """
+    Scores de tous les scénarios sur une matrice de features
+    (BuildingRiskPrioritizer.compute_features), statistiques accumulées bloc
+    par bloc
+    """
+
+    def __init__(self, features_df, top_n=TOP_N, resolution=RANK_RESOLUTION,
+                 tau_sample=TAU_SAMPLE, seed=42):
+        self.index = features_df.index
+        # Features puis indicateur du bonus (voir calculate_raw_priority_score)
+        bonus = ((features_df['age_risk'] > 0.7) & (features_df['climate_risk'] > 0.6)).to_numpy(dtype=float)
+        self.X = np.column_stack([features_df[list(SCENARIO_FEATURES)].to_numpy(dtype=float), bonus])
+        # Mêmes colonnes et colonne de 1 (décalage), transposées, en float32
+        self.X32 = np.ascontiguousarray(np.column_stack([self.X, np.ones(len(self.X))]).T, dtype=np.float32)
+        self.column_min = self.X.min(axis=0) if len(self.X) else np.zeros(self.X.shape[1])
+        self.column_max = self.X.max(axis=0) if len(self.X) else np.zeros(self.X.shape[1])
+        self.n_buildings = len(features_df)
+        self.top_n = min(top_n, self.n_buildings)
+        self.resolution = resolution
+
+        rng = np.random.default_rng(seed)
+        self.tau_sample = np.sort(rng.choice(self.n_buildings, min(tau_sample, self.n_buildings),
+                                             replace=False))
+
+        # Classement de référence par la même estimation que les scénarios
+        self.baseline_scores = self.scores(baseline_scenario())[0]
+        ranks, tops, _ = self._evaluate(baseline_scenario())
+        self.baseline_ranks = ranks[0]
+        self.baseline_top = np.zeros(self.n_buildings, dtype=bool)
+        self.baseline_top[tops[0]] = True
+
+    @staticmethod
+    def weights(scenarios):
+        """Matrice (scénarios x features, bonus)"""
+        return scenarios[list(SCENARIO_FEATURES) + [BONUS_COLUMN]].to_numpy(dtype=float)
+
+    def scores(self, scenarios, rows=None):
+        """
+        Scores bruts exacts (scénarios x bâtiments, bâtiments rows si donnés)
+        Arrondis à 1e-12: l'ordre des additions du produit matriciel ne
+        départage pas des bâtiments ex aequo
+        """
+        X = self.X if rows is None else self.X[rows]
+        return np.round(self.weights(scenarios) @ X.T, 12)
+
+    def score_classes(self, W):
+        """
+        Classe de score (0 à resolution) de chaque bâtiment pour chaque
+        scénario, sur l'intervalle des scores possibles du scénario
+        """
+        low = np.minimum(W * self.column_min, W * self.column_max).sum(axis=1)
+        high = np.maximum(W * self.column_min, W * self.column_max).sum(axis=1)
+        scale = self.resolution / np.maximum(high - low, 1e-12)
+        # Classe = (score - low) * scale, en un seul produit matriciel
+        W_scaled = np.column_stack([W * scale[:, None], -low * scale]).astype(np.float32)
+        classes = (W_scaled @ self.X32).astype(np.int32)
+        return np.clip(classes, 0, self.resolution, out=classes)
+
+    def _top(self, w, classes, higher):
+        """
+        Positions du top N d'un scénario et leurs rangs exacts; w: poids,
+        classes: classes de score des bâtiments, higher: nombre de bâtiments
+        par classe et au-dessus
+        """
+        # Candidats: classes hautes qui contiennent le top N, plus une classe
+        # de marge (arrondi float32)
+        top_class = np.flatnonzero(higher >= self.top_n)[-1]
+        candidates = np.flatnonzero(classes >= max(top_class - 1, 0))
+        exact = np.round(self.X[candidates] @ w, 12)
+        kth = len(exact) - self.top_n
+        in_top = exact >= np.partition(exact, kth)[kth]
+        # Rang: 1 + nombre de candidats de score strictement supérieur
+        top_ranks = 1 + np.searchsorted(np.sort(-exact), -exact[in_top], side='left')
+        return candidates, in_top, top_ranks
+
+    def _evaluate(self, block):
+        """Rangs estimés, positions du top N et tau de Kendall d'un bloc de scénarios"""
+        W = self.weights(block)
+        classes = self.score_classes(W)
+        n_classes = self.resolution + 1
+
+        # Histogrammes de tous les scénarios du bloc en un seul bincount
+        offsets = (np.arange(len(W)) * n_classes)[:, None]
+        flat_classes = (classes + offsets).ravel()
+        counts = np.bincount(flat_classes, minlength=len(W) * n_classes).reshape(len(W), n_classes)
+        higher = np.cumsum(counts[:, ::-1], axis=1)[:, ::-1]
+        # Rang de compétition de chaque classe: 1 + bâtiments des classes supérieures
+        class_ranks = (higher - counts + 1).astype(np.float32)
+        ranks = class_ranks.ravel().take(flat_classes).reshape(classes.shape)
+
+        tops = []
+        for w, row_classes, row_higher, row_ranks in zip(W, classes, higher, ranks):
+            if self.top_n == 0:
+                tops.append(np.empty(0, dtype=np.intp))
+                continue
+            candidates, in_top, top_ranks = self._top(w, row_classes, row_higher)
+            # Les candidats hors du top restent au-delà du top
+            others = candidates[~in_top]
+            row_ranks[others] = np.maximum(row_ranks[others], self.top_n + 1)
+            row_ranks[candidates[in_top]] = top_ranks
+            tops.append(candidates[in_top])
+
+        sample_scores = self.scores(block, self.tau_sample)
+        taus = kendall_tau(sample_scores, self.baseline_scores[self.tau_sample])
+        return ranks, tops, taus
+
+    def _evaluate_blocks(self, scenarios, block_size, max_workers):
+        """Blocs évalués en parallèle, au plus 2 * max_workers en mémoire"""
+        starts = list(range(0, len(scenarios), block_size))
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            window = 2 * max_workers
+            for first in range(0, len(starts), window):
+                futures = [
+                    (start, executor.submit(self._evaluate, scenarios.iloc[start:start + block_size]))
+                    for start in starts[first:first + window]
+                ]
+                for start, future in futures:
+                    yield (start, *future.result())
+
+    def run(self, scenarios, block_size=BLOCK_SIZE, max_workers=MAX_WORKERS,
+            quantile_scenarios=QUANTILE_SCENARIOS):
+        """
+        Évalue tous les scénarios; retourne (rangs par bâtiment, résultats par scénario)
+        """
+        n = self.n_buildings
+        n_scenarios = len(scenarios)
+        # Écarts au rang de référence: sommes sans perte de précision
+        baseline = self.baseline_ranks
+        shift_sum = np.zeros(n)
+        shift_sq_sum = np.zeros(n)
+        rank_min = np.full(n, np.inf, dtype=np.float32)
+        rank_max = np.zeros(n, dtype=np.float32)
+        top_count = np.zeros(n, dtype=np.int64)
+
+        # Rangs conservés pour les quantiles: scénarios répartis dans la liste
+        kept = np.unique(np.linspace(0, n_scenarios - 1, min(quantile_scenarios, n_scenarios)).round()
+                         .astype(int))
+        kept_ranks = np.empty((len(kept), n), dtype=np.float32)
+
+        taus = np.empty(n_scenarios)
+        overlaps = np.empty(n_scenarios)
+
+        for start, ranks, tops, block_taus in self._evaluate_blocks(scenarios, block_size, max_workers):
+            stop = start + len(ranks)
+            taus[start:stop] = block_taus
+            np.minimum(rank_min, ranks.min(axis=0), out=rank_min)
+            np.maximum(rank_max, ranks.max(axis=0), out=rank_max)
+            shifts = ranks - baseline
+            shift_sum += shifts.sum(axis=0)
+            shift_sq_sum += np.einsum('ij,ij->j', shifts, shifts)
+
+            top_count += np.bincount(np.concatenate(tops), minlength=n)
+            overlaps[start:stop] = [self.baseline_top[top].sum() / self.top_n for top in tops]
+
+            in_block = (kept >= start) & (kept < stop)
+            kept_ranks[in_block] = ranks[kept[in_block] - start]
+
+        shift_mean = shift_sum / n_scenarios
+        buildings = pd.DataFrame({
+            'baseline_rank': self.baseline_ranks.astype(np.int32),
+            'rank_mean': self.baseline_ranks + shift_mean,
+            'rank_std': np.sqrt(np.maximum(shift_sq_sum / n_scenarios - shift_mean ** 2, 0)),
+            'rank_min': rank_min.astype(np.int32),
+            'rank_max': rank_max.astype(np.int32),
+            **{f'rank_p{round(q * 100):02d}': values
+               for q, values in zip(RANK_QUANTILES, np.quantile(kept_ranks, RANK_QUANTILES, axis=0))},
+            f'top_{self.top_n}_frequency': top_count / n_scenarios,
+        }, index=self.index)
+
+        results = scenarios.reset_index(drop=True).copy()
+        results['kendall_tau'] = taus
+        results[f'top_{self.top_n}_overlap'] = overlaps
+        return buildings, results
+
+
+def sweep_scenarios(features_df, scenarios, block_size=BLOCK_SIZE, top_n=TOP_N,
+                    resolution=RANK_RESOLUTION, tau_sample=TAU_SAMPLE, seed=42, max_workers=MAX_WORKERS):
+    """Raccourci: ScenarioSweep(features_df, ...).run(scenarios, block_size, max_workers)"""
+    sweep = ScenarioSweep(features_df, top_n, resolution, tau_sample, seed)
+    return sweep.run(scenarios, block_size, max_workers)
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Priority weight scenario sweep")
+    parser.add_argument('--scenarios', type=int, default=N_SCENARIOS)
+    parser.add_argument('--block-size', type=int, default=BLOCK_SIZE)
+    parser.add_argument('--top', type=int, default=TOP_N)
+    parser.add_argument('--seed', type=int, default=42)
+    args = parser.parse_args(argv)
+
+    print("="*80)
+    print("PRIORITY WEIGHT SCENARIO SWEEP")
+    print("="*80)
+
+    buildings = load_table(prioritization.ENRICHED_OUTPUT)
+    features = prioritization.BuildingRiskPrioritizer().compute_features(buildings)
+    scenarios = random_scenarios(args.scenarios, seed=args.seed)
+    print(f"\n{len(buildings)} buildings, {len(scenarios)} scenarios (blocks of {args.block_size})")
+
+    start = time.perf_counter()
+    ranks, results = sweep_scenarios(features, scenarios, args.block_size, args.top, seed=args.seed)
+    print(f"Sweep completed in {time.perf_counter() - start:.1f}s")
+
+    ranks = pd.concat([buildings[['buildingName', 'address', 'boroughName']], ranks], axis=1)
+    ranks = ranks.sort_values('rank_mean')
+    ranks.to_csv(BUILDING_RANKS_OUTPUT, index=False, encoding='utf-8-sig')
+    results.to_csv(SCENARIOS_OUTPUT, index=False, encoding='utf-8-sig')
+
+    top_column = f'top_{min(args.top, len(buildings))}_frequency'
+    print(f"\nKendall tau vs current weights: mean {results['kendall_tau'].mean():.3f}, "
+          f"min {results['kendall_tau'].min():.3f}")
+    print(f"Buildings always in the top {args.top}: {(ranks[top_column] == 1).sum()}")
+    print(f"Buildings sometimes in the top {args.top}: {(ranks[top_column] > 0).sum()}")
+    print("\nMost stable priorities:")
+    print(ranks.head(20).to_string())
+
+    print(f"\n[OK] Building rank distributions saved to {BUILDING_RANKS_OUTPUT}")
+    print(f"[OK] Scenario results saved to {SCENARIOS_OUTPUT}")
+
+    return ranks, results
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,257 @@
+"""
+Index spatial de polygones en NumPy pur (sans GDAL ni geopandas)
+
+- Grilles uniformes emboîtées construites en bloc sur les emprises des
+  polygones (stockage compact de type CSR: cellule -> polygones); chaque
+  polygone n'occupe qu'un nombre borné de cellules
+- Raffinement point-dans-polygone vectorisé (règle pair-impair), évalué
+  par blocs de paires (point, polygone) pour borner la mémoire
+
+Les coordonnées des points et des polygones doivent être dans le même
+système de référence.
+"""
+
+import re
+
+import numpy as np
+
+WKT_RING_PATTERN = re.compile(r'\(([^()]+)\)')
+
+
+def parse_wkt_rings(wkt):
+    """
+    Anneaux d'un POLYGON / MULTIPOLYGON WKT, sous forme de tableaux (k, 2)
+    Les trous sont traités par la règle pair-impair, l'appartenance d'un
+    anneau à un polygone n'a donc pas besoin d'être conservée
+    """
+    if not isinstance(wkt, str):
+        return []
+    rings = []
+    for ring in WKT_RING_PATTERN.findall(wkt):
+        points = [p.split()[:2] for p in ring.split(',') if p.strip()]
+        if len(points) >= 3:
+            rings.append(np.asarray(points, dtype=float))
+    return rings
+
+
+def geojson_rings(geometry):
+    """Anneaux d'une géométrie GeoJSON Polygon / MultiPolygon"""
+    if not geometry:
+        return []
+    if geometry.get('type') == 'Polygon':
+        polygons = [geometry.get('coordinates') or []]
+    elif geometry.get('type') == 'MultiPolygon':
+        polygons = geometry.get('coordinates') or []
+    else:
+        return []
+    return [
+        np.asarray(ring, dtype=float)[:, :2]
+        for polygon in polygons for ring in polygon if len(ring) >= 3
+    ]
+
+
+def _expand_ranges(starts, counts):
+    """Concatène les intervalles [start, start + count) en un seul tableau d'indices"""
+    total = counts.sum()
+    if total == 0:
+        return np.empty(0, dtype=np.int64)
+    offsets = np.cumsum(counts) - counts
+    return np.repeat(starts - offsets, counts) + np.arange(total)
+
+
+# Cellules couvertes au plus par un polygone dans sa grille, et rapport de
+# taille de cellule entre deux niveaux de grille
+MAX_CELLS_PER_POLYGON = 16
+LEVEL_FACTOR = 2
+
+
+class GridLevel:
+    """
+    Grille uniforme d'un niveau: chaque polygone est inscrit dans les
+    cellules de son emprise (stockage CSR: cellule -> polygones)
+    """
+
+    def __init__(self, origin, cell_size, nx, ny, polygon_ids, bounds):
+        self.origin = origin
+        self.cell_size = cell_size
+        self.nx, self.ny = nx, ny
+
+        ix0, iy0 = self.cell_coordinates(bounds[:, 0], bounds[:, 1])
+        ix1, iy1 = self.cell_coordinates(bounds[:, 2], bounds[:, 3])
+        width, height = ix1 - ix0 + 1, iy1 - iy0 + 1
+        counts = width * height
+
+        # Une entrée (cellule, polygone) par cellule couverte
+        owner = np.repeat(np.arange(len(polygon_ids)), counts)
+        local = np.arange(counts.sum()) - np.repeat(np.cumsum(counts) - counts, counts)
+        cells = (
+            (iy0[owner] + local // width[owner]) * self.nx +
+            (ix0[owner] + local % width[owner])
+        )
+
+        order = np.argsort(cells, kind='stable')
+        self.cell_polygons = polygon_ids[owner[order]]
+        self.cell_ptr = np.zeros(self.nx * self.ny + 1, dtype=np.int64)
+        np.cumsum(np.bincount(cells, minlength=self.nx * self.ny), out=self.cell_ptr[1:])
+
+    def cell_coordinates(self, x, y):
+        ix = np.floor((np.asarray(x) - self.origin[0]) / self.cell_size).astype(np.int64)
+        iy = np.floor((np.asarray(y) - self.origin[1]) / self.cell_size).astype(np.int64)
+        return ix, iy
+
+    def candidate_pairs(self, x, y):
+        """Paires (point, polygone) dont la cellule du point contient le polygone"""
+        ix, iy = self.cell_coordinates(x, y)
+        in_grid = (ix >= 0) & (ix < self.nx) & (iy >= 0) & (iy < self.ny)
+        points = np.flatnonzero(in_grid)
+        cells = iy[points] * self.nx + ix[points]
+
+        starts = self.cell_ptr[cells]
+        counts = self.cell_ptr[cells + 1] - starts
+        return np.repeat(points, counts), self.cell_polygons[_expand_ranges(starts, counts)]
+
+
+class PolygonGridIndex:
+    """
+    Index en grilles uniformes emboîtées sur les emprises d'un ensemble de
+    polygones
+
+    polygons: liste de polygones, chacun étant une liste d'anneaux (k, 2)
+
+    La grille la plus fine a des cellules proches de l'emprise médiane des
+    polygones; chaque niveau suivant a des cellules LEVEL_FACTOR fois plus
+    grandes. Un polygone est inscrit dans le niveau le plus fin où son
+    emprise couvre au plus max_cells_per_polygon cellules: le nombre
+    d'entrées reste proportionnel au nombre de polygones, même avec
+    quelques très grands polygones parmi beaucoup de petits.
+    """
+
+    def __init__(self, polygons, cell_size=None, max_cells=4_000_000,
+                 max_cells_per_polygon=MAX_CELLS_PER_POLYGON):
+        # Arêtes de tous les anneaux, regroupées par polygone
+        x0, y0, x1, y1, edge_counts = [], [], [], [], []
+        bounds = np.full((len(polygons), 4), np.nan)
+        for i, rings in enumerate(polygons):
+            n_edges = 0
+            for ring in rings:
+                ring = np.asarray(ring, dtype=float)
+                if not np.array_equal(ring[0], ring[-1]):
+                    ring = np.vstack([ring, ring[:1]])
+                x0.append(ring[:-1, 0])
+                y0.append(ring[:-1, 1])
+                x1.append(ring[1:, 0])
+                y1.append(ring[1:, 1])
+                n_edges += len(ring) - 1
+            edge_counts.append(n_edges)
+            if rings:
+                points = np.vstack(rings)
+                bounds[i] = [*points.min(axis=0), *points.max(axis=0)]
+
+        def concat(parts):
+            return np.concatenate(parts) if parts else np.empty(0)
+
+        self.edge_x0, self.edge_y0 = concat(x0), concat(y0)
+        self.edge_x1, self.edge_y1 = concat(x1), concat(y1)
+        self.edge_counts = np.asarray(edge_counts, dtype=np.int64)
+        self.edge_starts = np.cumsum(self.edge_counts) - self.edge_counts
+        self.bounds = bounds
+        self.n_polygons = len(polygons)
+
+        self._build_grids(cell_size, max_cells, max_cells_per_polygon)
+
+    def _build_grids(self, cell_size, max_cells, max_cells_per_polygon):
+        """Chargement en bloc: chaque polygone est inscrit dans un seul niveau de grille"""
+        self.levels = []
+        valid = ~np.isnan(self.bounds).any(axis=1)
+        if not valid.any():
+            return
+
+        bounds = self.bounds[valid]
+        origin = bounds[:, :2].min(axis=0)
+        extent = bounds[:, 2:].max(axis=0) - origin
+
+        if cell_size is None:
+            # Taille de cellule proche de l'emprise médiane des polygones
+            sizes = bounds[:, 2:] - bounds[:, :2]
+            cell_size = float(np.median(sizes.max(axis=1)))
+        cell_size = max(cell_size, float(np.sqrt(np.prod(np.maximum(extent, 1e-12)) / max_cells)), 1e-12)
+
+        remaining = np.flatnonzero(valid)
+        while len(remaining):
+            nx, ny = np.floor(extent / cell_size).astype(np.int64) + 1
+            b = self.bounds[remaining]
+            covered = (
+                (np.floor((b[:, 2] - origin[0]) / cell_size) - np.floor((b[:, 0] - origin[0]) / cell_size) + 1) *
+                (np.floor((b[:, 3] - origin[1]) / cell_size) - np.floor((b[:, 1] - origin[1]) / cell_size) + 1)
+            )
+            # Dernier niveau (au plus 2 x 2 cellules): tous les polygones restants
+            fits = (covered <= max_cells_per_polygon) | (max(nx, ny) <= 2)
+            if fits.any():
+                self.levels.append(GridLevel(origin, cell_size, nx, ny, remaining[fits], b[fits]))
+            remaining = remaining[~fits]
+            cell_size *= LEVEL_FACTOR
+
+    def candidate_pairs(self, x, y):
+        """Paires (point, polygone) dont l'emprise contient le point"""
+        pairs = [level.candidate_pairs(x, y) for level in self.levels]
+        if not pairs:
+            return np.empty(0, dtype=np.int64), np.empty(0, dtype=np.int64)
+        pair_points = np.concatenate([points for points, _ in pairs])
+        pair_polygons = np.concatenate([polygons for _, polygons in pairs])
+
+        px, py = x[pair_points], y[pair_points]
+        b = self.bounds[pair_polygons]
+        in_bbox = (px >= b[:, 0]) & (px <= b[:, 2]) & (py >= b[:, 1]) & (py <= b[:, 3])
+        return pair_points[in_bbox], pair_polygons[in_bbox]
+
+    def _contains_pairs(self, x, y, pair_points, pair_polygons):
+        """Test point-dans-polygone (pair-impair) vectorisé sur des paires"""
+        counts = self.edge_counts[pair_polygons]
+        edges = _expand_ranges(self.edge_starts[pair_polygons], counts)
+        pair_of_edge = np.repeat(np.arange(len(pair_points)), counts)
+
+        px = x[pair_points][pair_of_edge]
+        py = y[pair_points][pair_of_edge]
+        x0, y0 = self.edge_x0[edges], self.edge_y0[edges]
+        x1, y1 = self.edge_x1[edges], self.edge_y1[edges]
+
+        straddles = (y0 > py) != (y1 > py)
+        with np.errstate(divide='ignore', invalid='ignore'):
+            x_cross = x0 + (py - y0) * (x1 - x0) / (y1 - y0)
+        crossings = straddles & (px < x_cross)
+
+        return np.bincount(pair_of_edge, weights=crossings, minlength=len(pair_points)) % 2 == 1
+
+    def query(self, x, y, max_edges_per_block=4_000_000):
+        """
+        Polygone contenant chaque point (-1 si aucun)
+        Si plusieurs polygones se chevauchent, le plus petit identifiant est retenu
+        """
+        x = np.asarray(x, dtype=float)
+        y = np.asarray(y, dtype=float)
+        result = np.full(len(x), -1, dtype=np.int64)
+        if self.n_polygons == 0 or len(x) == 0:
+            return result
+
+        valid = np.flatnonzero(~(np.isnan(x) | np.isnan(y)))
+        pair_points, pair_polygons = self.candidate_pairs(x[valid], y[valid])
+        pair_points = valid[pair_points]
+
+        # Plus petit identifiant de polygone contenant chaque point
+        best = np.full(len(x), self.n_polygons, dtype=np.int64)
+
+        # Blocs de paires bornés par le nombre d'arêtes à évaluer
+        edge_totals = np.cumsum(self.edge_counts[pair_polygons])
+        boundaries = np.flatnonzero(np.diff(edge_totals // max_edges_per_block)) + 1
+        for block in np.split(np.arange(len(pair_points)), boundaries):
+            if len(block) == 0:
+                continue
+            inside = self._contains_pairs(x, y, pair_points[block], pair_polygons[block])
+            np.minimum.at(best, pair_points[block][inside], pair_polygons[block][inside])
+
+        result[best < self.n_polygons] = best[best < self.n_polygons]
+        return result
+
+    def contains(self, x, y, **kwargs):
+        """Appartenance de chaque point à au moins un polygone"""
+        return self.query(x, y, **kwargs) >= 0
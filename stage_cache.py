@@ -0,0 +1,163 @@
+"""
+Cache disque des résultats d'étapes du pipeline
+La clé d'une étape est l'empreinte de son code, de ses paramètres, de ses
+fichiers d'entrée et des clés des étapes dont elle dépend: une étape dont
+rien n'a changé est relue depuis le disque au lieu d'être recalculée.
+Les entrées les moins récemment utilisées sont évincées au-delà d'une
+taille maximale.
+"""
+
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+from pathlib import Path
+
+CACHE_DIR = Path(".cache") / "pipeline"
+CACHE_MAX_BYTES = 2 * 1024 ** 3
+FILE_INDEX = 'file_index.json'
+
+
+class StageCache:
+    """
+    Résultats d'étapes sérialisés (pickle), un fichier par clé
+    Le dernier accès est porté par la date de modification du fichier
+    """
+
+    def __init__(self, cache_dir=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.cache_dir = Path(cache_dir)
+        self.max_bytes = max_bytes
+        self.cache_dir.mkdir(parents=True, exist_ok=True)
+        self._file_index_path = self.cache_dir / FILE_INDEX
+        self._file_index = self._read_file_index()
+        self._file_index_dirty = False
+
+    # ------------------------------------------------------------------
+    # Empreintes
+    # ------------------------------------------------------------------
+
+    def _read_file_index(self):
+        try:
+            return json.loads(self._file_index_path.read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return {}
+
+    def file_digest(self, path):
+        """
+        Empreinte SHA-256 du contenu d'un fichier ('missing' s'il n'existe pas)
+        Mémorisée par (taille, date de modification): un fichier inchangé
+        n'est pas relu
+        """
+        path = Path(path)
+        try:
+            stat = path.stat()
+        except OSError:
+            return 'missing'
+
+        entry = self._file_index.get(str(path.resolve()))
+        if entry and entry[0] == stat.st_size and entry[1] == stat.st_mtime_ns:
+            return entry[2]
+
+        digest = hashlib.sha256()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                digest.update(block)
+        self._file_index[str(path.resolve())] = [stat.st_size, stat.st_mtime_ns, digest.hexdigest()]
+        self._file_index_dirty = True
+        return digest.hexdigest()
+
+    def save_file_index(self):
+        if self._file_index_dirty:
+            self._atomic_write(self._file_index_path, json.dumps(self._file_index).encode('utf-8'))
+            self._file_index_dirty = False
+
+    def stage_key(self, name, code_files=(), params=None, input_files=(), upstream_keys=()):
+        """Clé d'une étape (les clés amont rendent l'invalidation transitive)"""
+        payload = {
+            'stage': name,
+            'code': sorted((str(p), self.file_digest(p)) for p in code_files),
+            'params': json.dumps(params or {}, sort_keys=True, default=repr),
+            'files': [(str(p), self.file_digest(p)) for p in input_files],
+            'upstream': sorted(upstream_keys),
+        }
+        return hashlib.sha256(json.dumps(payload, sort_keys=True).encode('utf-8')).hexdigest()
+
+    # ------------------------------------------------------------------
+    # Entrées
+    # ------------------------------------------------------------------
+
+    def _entry_path(self, key):
+        return self.cache_dir / f"{key}.pkl"
+
+    def contains(self, key):
+        return self._entry_path(key).exists()
+
+    def get(self, key):
+        """Retourne (trouvé, valeur) et marque l'entrée comme récemment utilisée"""
+        path = self._entry_path(key)
+        try:
+            with open(path, 'rb') as f:
+                value = pickle.load(f)
+        except (OSError, pickle.UnpicklingError, EOFError, AttributeError, ImportError):
+            return False, None
+        os.utime(path)
+        return True, value
+
+    def put(self, key, value):
+        """Enregistre une valeur puis évince les entrées les plus anciennes"""
+        self._atomic_write(self._entry_path(key), pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+        self.evict(keep=key)
+
+    def record_targets(self, key, paths):
+        """Mémorise l'empreinte des fichiers écrits par l'étape de clé key"""
+        digests = {str(p): self.file_digest(p) for p in paths}
+        self._atomic_write(self._targets_path(key), json.dumps(digests).encode('utf-8'))
+        self.save_file_index()
+
+    def targets_match(self, key, paths):
+        """Vrai si les fichiers sont encore ceux écrits par l'étape de clé key"""
+        try:
+            recorded = json.loads(self._targets_path(key).read_text(encoding='utf-8'))
+        except (OSError, ValueError):
+            return False
+        return all(recorded.get(str(p)) == self.file_digest(p) != 'missing' for p in paths)
+
+    def _targets_path(self, key):
+        return self.cache_dir / f"{key}.targets.json"
+
+    def _atomic_write(self, path, data):
+        fd, tmp_path = tempfile.mkstemp(dir=self.cache_dir, suffix='.tmp')
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+            raise
+
+    def evict(self, keep=None):
+        """Supprime les entrées les moins récemment utilisées au-delà de max_bytes"""
+        entries = []
+        for path in self.cache_dir.glob('*.pkl'):
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            if keep is not None and path.stem == keep:
+                continue
+            path.unlink(missing_ok=True)
+            self._targets_path(path.stem).unlink(missing_ok=True)
+            total -= size
+
+    def clear(self):
+        for pattern in ('*.pkl', '*.targets.json'):
+            for path in self.cache_dir.glob(pattern):
+                path.unlink(missing_ok=True)
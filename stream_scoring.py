@@ -0,0 +1,192 @@
+"""
+Priorisation en flux pour les portefeuilles plus grands que la mémoire
+
+Les bâtiments sont lus par blocs de taille fixe:
+1. premier passage: chaque bloc est enrichi (matching, zones inondables,
+   chaleur, divulgation énergétique), écrit dans un répertoire temporaire,
+   et les statistiques de population sont accumulées (médiane et bornes du
+   nombre d'étages, bornes du score brut)
+2. second passage: features et scores normalisés avec ces statistiques,
+   écrits bloc par bloc dans le CSV de sortie; un tas borné conserve les
+   N bâtiments les plus prioritaires
+
+La mémoire maximale dépend de la taille des blocs et de N, pas du nombre
+de bâtiments. Les scores sont identiques à ceux du calcul en mémoire. Le
+regroupement K-Means, qui exige toute la population, n'est pas calculé
+dans ce mode (pas de colonne risk_cluster). Les statistiques de population
+peuvent être enregistrées comme calibration (--calibration) pour scorer
+ensuite de nouveaux bâtiments avec BuildingRiskPrioritizer.score_batch.
+
+Usage: python stream_scoring.py [--input FICHIER] [--chunk-size N] [--top N] [--calibration FICHIER]
+"""
+
+import argparse
+import heapq
+import importlib
+import tempfile
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+
+matching = importlib.import_module('02_intelligent_matching')
+prioritization = importlib.import_module('03_ml_prioritization_model')
+
+STREAM_OUTPUT = 'output_buildings_scored.csv'
+STREAM_TOP_FILE = 'output_top_priorities_scored.csv'
+CHUNK_SIZE = 50_000
+TOP_N = 100
+
+
+class TopNHeap:
+    """
+    Les n lignes de plus haut score parmi tous les blocs (tas min borné)
+    À score égal, la ligne lue en premier est conservée
+    """
+
+    def __init__(self, n):
+        self.n = n
+        self.heap = []
+        self.rows_seen = 0
+
+    def push_frame(self, df, column):
+        scores = df[column].to_numpy(dtype=float)
+        order = self.rows_seen + np.arange(len(df))
+        self.rows_seen += len(df)
+
+        # Présélection vectorisée: au plus n candidats par bloc
+        candidates = np.flatnonzero(~np.isnan(scores))
+        candidates = candidates[np.lexsort((order[candidates], -scores[candidates]))[:self.n]]
+        if len(self.heap) == self.n:
+            candidates = candidates[scores[candidates] > self.heap[0][0]]
+
+        for position, record in zip(candidates, df.iloc[candidates].to_dict('records')):
+            item = (scores[position], -order[position], record)
+            if len(self.heap) < self.n:
+                heapq.heappush(self.heap, item)
+            elif item[:2] > self.heap[0][:2]:
+                heapq.heapreplace(self.heap, item)
+
+    def frame(self, columns):
+        """Lignes conservées, par score décroissant"""
+        items = sorted(self.heap, key=lambda item: item[:2], reverse=True)
+        return pd.DataFrame([record for _, _, record in items], columns=columns)
+
+
+def _raw_scores(model, chunk, floor_stats, weights):
+    features = model.compute_features(chunk, floor_stats=floor_stats)
+    return model.calculate_raw_priority_score(features, weights)
+
+
+def score_stream(buildings_path=None, output_file=STREAM_OUTPUT, top_file=STREAM_TOP_FILE,
+                 chunk_size=CHUNK_SIZE, top_n=TOP_N, weights=None, spill_dir=None,
+                 calibration_file=None):
+    """
+    Priorise les bâtiments de buildings_path en deux passages bornés en mémoire
+    Retourne un résumé (nombre de bâtiments, distribution des niveaux, potentiel GES)
+    calibration_file: si donné, la calibration de la population y est enregistrée
+    """
+    buildings_path = buildings_path or matching.DATA_FILES['buildings']
+    weights = weights or prioritization.PRIORITY_WEIGHTS
+    model = prioritization.BuildingRiskPrioritizer()
+    stats = prioritization.PopulationStatistics()
+
+    print("Loading reference data...")
+    data = matching.load_reference_data()
+
+    with tempfile.TemporaryDirectory(dir=spill_dir) as spill:
+        spilled = []
+
+        # Passage 1: enrichissement et statistiques de population
+        print(f"\nPass 1: enriching {buildings_path} in chunks of {chunk_size}")
+
+        # Le score brut n'utilise le nombre d'étages normalisé que si la
+        # pondération l'inclut: ses bornes exigent alors un passage de plus,
+        # une fois la médiane connue
+        needs_floor_stats = 'floor_count_norm' in weights
+
+        reader = pd.read_csv(buildings_path, chunksize=chunk_size)
+        for i, chunk in enumerate(matching.iter_enriched_chunks(reader, data)):
+            stats.update_buildings(chunk)
+            if not needs_floor_stats:
+                stats.update_scores(_raw_scores(model, chunk, stats.floor_stats, weights))
+            path = Path(spill) / f"{i:06d}.pkl"
+            chunk.to_pickle(path)
+            spilled.append(path)
+            print(f"  chunk {i}: {stats.n_rows} buildings enriched")
+
+        if needs_floor_stats:
+            for path in spilled:
+                stats.update_scores(_raw_scores(model, pd.read_pickle(path), stats.floor_stats, weights))
+
+        floor_stats, score_range = stats.floor_stats, stats.score_range
+        print(f"\nPopulation: {stats.n_rows} buildings, floor median {floor_stats[0]:g}, "
+              f"raw score range [{score_range[0]:.4f}, {score_range[1]:.4f}]")
+
+        # Passage 2: scores normalisés, écriture par blocs et top N
+        print(f"\nPass 2: scoring and writing {output_file}")
+        top = TopNHeap(top_n)
+        columns = None
+        level_counts = pd.Series(0, index=prioritization.PRIORITY_LEVEL_LABELS)
+        total_ges = 0.0
+
+        for i, path in enumerate(spilled):
+            chunk = stats.align_dtypes(pd.read_pickle(path))
+            features = model.compute_features(chunk, floor_stats=floor_stats)
+            priority_score = model.calculate_priority_score(features, weights, score_range=score_range)
+            chunk = prioritization.annotate_priorities(chunk, features, priority_score, model)
+
+            if columns is None:
+                columns = chunk.columns.tolist()
+                chunk.to_csv(output_file, index=False, encoding='utf-8-sig')
+            else:
+                chunk[columns].to_csv(output_file, mode='a', header=False, index=False, encoding='utf-8')
+
+            top.push_frame(chunk, 'priority_score')
+            level_counts = level_counts.add(chunk['priority_level'].value_counts(), fill_value=0)[level_counts.index]
+            total_ges += chunk['estimated_ges_reduction_potential'].sum()
+            path.unlink()
+            print(f"  chunk {i}: {len(chunk)} buildings scored")
+
+    top_frame = top.frame(columns or [])
+    top_frame.to_csv(top_file, index=False, encoding='utf-8-sig')
+
+    calibration = prioritization.ScoringCalibration.from_statistics(stats, weights)
+    if calibration_file:
+        calibration.save(calibration_file)
+        print(f"[OK] Scoring calibration saved to {calibration_file}")
+
+    print(f"\n[OK] Results saved to {output_file}")
+    print(f"[OK] Top {top_n} priorities saved to {top_file}")
+    print(f"\nPriority Level Distribution:")
+    print(level_counts.astype(int))
+    print(f"\nTotal estimated GES reduction potential: {total_ges:.1f} tonnes CO2/year")
+
+    return {
+        'n_buildings': stats.n_rows,
+        'priority_levels': level_counts.astype(int),
+        'total_ges_reduction_potential': total_ges,
+        'top': top_frame,
+        'calibration': calibration,
+    }
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Streaming building prioritization")
+    parser.add_argument('--input', default=None, help="Buildings CSV (default: municipal buildings)")
+    parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+    parser.add_argument('--top', type=int, default=TOP_N)
+    parser.add_argument('--calibration', default=None,
+                        help="Save the population calibration (JSON) for score_batch")
+    args = parser.parse_args(argv)
+
+    print("="*80)
+    print("STREAMING BUILDING RISK PRIORITIZATION")
+    print("="*80)
+
+    return score_stream(args.input, chunk_size=args.chunk_size, top_n=args.top,
+                        calibration_file=args.calibration)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,73 @@
+"""
+Parité du moteur de features vectorisé (BuildingRiskPrioritizer) avec ses
+méthodes ligne par ligne, conservées comme référence, sur une petite table
+construite à la main (années inconnues ou nulles, surfaces manquantes,
+usages énergivores, arrondissements inconnus, absents, accentués ou mal
+espacés)
+"""
+
+import importlib.util
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+_spec = importlib.util.spec_from_file_location('prioritization_model', ROOT / '03_ml_prioritization_model.py')
+model_module = importlib.util.module_from_spec(_spec)
+_spec.loader.exec_module(model_module)
+
+
+def reference_features(model, df):
+    """Features calculées ligne par ligne avec les méthodes unitaires du modèle"""
+    features_df = pd.DataFrame()
+    features_df['age_risk'] = df.apply(lambda row: model.calculate_building_age_risk(row.get('buildingConstrYear')),
+                                       axis=1)
+    features_df['size_impact'] = df.apply(
+        lambda row: model.calculate_size_risk(row.get('buildingArea', row.get('builtArea', 0))), axis=1
+    )
+    features_df['energy_risk'] = df.apply(model.estimate_energy_consumption_risk, axis=1)
+    features_df['climate_risk'] = df.apply(model.calculate_combined_climate_risk, axis=1)
+    features_df['social_vulnerability'] = df.apply(model.calculate_social_vulnerability_proxy, axis=1)
+    return model._add_floor_and_basement_features(features_df, df)
+
+
+@pytest.fixture
+def buildings():
+    return pd.DataFrame({
+        'buildingConstrYear': [1900, 1960, 1985, 2000, 2020, 0, np.nan, 1949],
+        'buildingArea': [12000.0, np.nan, 350.0, 0.0, np.nan, 800.0, 50000.0, np.nan],
+        'builtArea': [10000.0, 2500.0, np.nan, 400.0, np.nan, 900.0, np.nan, 120.0],
+        'usageName': ['Piscine intérieure', 'Bureau', 'ARÉNA', None, 'Caserne de pompiers',
+                      'Entrepôt', 'Bibliothèque', np.nan],
+        'floorAmount': [1, 3, np.nan, 6, 11, 2, 40, np.nan],
+        'basementAmount': [1, 0, np.nan, 2, 0, np.nan, 1, 0],
+        'postal_flood_risk': [0.8, 0.2, 0.7, np.nan, 0.5, 0.9, 0.65, 0.1],
+        'postal_heat_risk': [0.9, 0.3, 0.4, 0.5, np.nan, 0.7, 0.8, 0.2],
+        'boroughName': ['Montréal-Nord', '  outremont ', 'Arrondissement inconnu', None,
+                        'Île-Bizard-Sainte-Geneviève', 'Le Sud-Ouest', np.nan,
+                        'Côte-des-Neiges / N-D-de-Grâce'],
+    })
+
+
+def test_vectorized_features_match_row_by_row_reference(buildings):
+    model = model_module.BuildingRiskPrioritizer()
+    pd.testing.assert_frame_equal(model.compute_features(buildings), reference_features(model, buildings),
+                                  check_exact=True)
+
+
+def test_vectorized_recommendations_match_row_by_row_reference(buildings):
+    model = model_module.BuildingRiskPrioritizer()
+    scored = buildings.join(model.compute_features(buildings))
+    scored['priority_score'] = [95.0, 81.0, 80.0, 61.0, 55.0, 40.0, 20.0, np.nan]
+
+    vectorized = model.create_intervention_recommendations_vectorized(scored, scored['priority_score'])
+    reference = scored.apply(lambda row: model.create_intervention_recommendations(row, row['priority_score']),
+                             axis=1)
+
+    pd.testing.assert_series_equal(vectorized.astype(object), reference, check_names=False, check_dtype=False)
+    assert vectorized.dtype == 'category'
@@ -0,0 +1,33 @@
+"""
+Lecture en flux GeoJSON: mêmes entités que json.load, y compris pour des
+entités bien plus grandes que le tampon de lecture
+"""
+
+import json
+import sys
+from pathlib import Path
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from geojson_stream import GeoJSONStreamReader  # noqa: E402
+
+
+def test_features_larger_than_buffer(tmp_path):
+    ring = [[i * 0.5, (i % 7) * 0.25] for i in range(5000)] + [[0.0, 0.0]]
+    collection = {
+        'type': 'FeatureCollection',
+        'name': 'ilots',
+        'features': [
+            {'type': 'Feature', 'properties': {'id': 1, 'value': 2.5},
+             'geometry': {'type': 'Polygon', 'coordinates': [ring]}},
+            {'type': 'Feature', 'properties': {'id': 2, 'value': 10},
+             'geometry': {'type': 'Point', 'coordinates': [1, 2]}},
+        ],
+    }
+    path = tmp_path / 'collection.geojson'
+    path.write_text(json.dumps(collection), encoding='utf-8')
+
+    reader = GeoJSONStreamReader(path, buffer_size=64)
+    assert list(reader.iter_features()) == collection['features']
+    assert reader.metadata == {'type': 'FeatureCollection', 'name': 'ilots'}
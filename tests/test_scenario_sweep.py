@@ -0,0 +1,76 @@
+"""
+Rangs estimés par scenario_sweep comparés au classement exact
+(competition_ranks) sur une petite table de features, avec des ex aequo
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pandas as pd
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+import scenario_sweep  # noqa: E402
+
+
+@pytest.fixture
+def features():
+    rng = np.random.default_rng(0)
+    n = 400
+    return pd.DataFrame({
+        # Valeurs discrètes: nombreux bâtiments ex aequo
+        'energy_risk': rng.choice([0.3, 0.45, 0.6, 0.75], n),
+        'climate_risk': rng.choice([0.35, 0.5, 0.65], n),
+        'social_vulnerability': rng.choice([0.2, 0.5, 0.6, 0.9], n),
+        'size_impact': rng.uniform(0, 1, n).round(2),
+        'age_risk': rng.choice([0.1, 0.6, 0.8, 1.0], n),
+    })
+
+
+def test_baseline_scenario_does_not_move_any_building(features):
+    ranks, results = scenario_sweep.sweep_scenarios(features, scenario_sweep.baseline_scenario(), top_n=20)
+
+    np.testing.assert_array_equal(ranks['rank_mean'], ranks['baseline_rank'])
+    np.testing.assert_array_equal(ranks['rank_min'], ranks['baseline_rank'])
+    np.testing.assert_array_equal(ranks['rank_max'], ranks['baseline_rank'])
+    assert (ranks['rank_std'] == 0).all()
+    assert results['kendall_tau'].iloc[0] == pytest.approx(1.0)
+    assert results['top_20_overlap'].iloc[0] == 1.0
+
+
+def test_estimated_ranks_match_exact_ranks(features):
+    top_n = 20
+    sweep = scenario_sweep.ScenarioSweep(features, top_n=top_n)
+    scenarios = scenario_sweep.random_scenarios(32, seed=1)
+    ranks, tops, _ = sweep._evaluate(scenarios)
+    exact = scenario_sweep.competition_ranks(sweep.scores(scenarios))
+    classes = sweep.score_classes(sweep.weights(scenarios))
+
+    for estimated, exact_ranks, top, row_classes, scores in zip(ranks, exact, tops, classes,
+                                                                 sweep.scores(scenarios)):
+        # Top N exact
+        np.testing.assert_array_equal(np.sort(top), np.flatnonzero(exact_ranks <= top_n))
+        np.testing.assert_array_equal(estimated[top], exact_ranks[top])
+        # Ailleurs: rang du meilleur bâtiment de la classe, jamais pire que le
+        # rang exact, et au plus la taille de la classe devant lui
+        class_sizes = np.bincount(row_classes)[row_classes]
+        assert (estimated <= exact_ranks).all()
+        assert (exact_ranks - estimated < class_sizes).all()
+        # Les ex aequo partagent le même rang
+        _, groups = np.unique(scores, return_inverse=True)
+        for group in np.unique(groups):
+            assert len(np.unique(estimated[groups == group])) == 1
+
+
+def test_kendall_tau_matches_scipy():
+    stats = pytest.importorskip('scipy.stats')
+    rng = np.random.default_rng(2)
+    y = rng.integers(0, 5, 200).astype(float)
+    x = rng.integers(0, 4, (5, 200)).astype(float)
+    x[0] = rng.uniform(size=200)
+
+    expected = [stats.kendalltau(row, y).statistic for row in x]
+    np.testing.assert_allclose(scenario_sweep.kendall_tau(x, y), expected)
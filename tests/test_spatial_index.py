@@ -0,0 +1,66 @@
+"""
+Index spatial de polygones: résultats identiques à un test exhaustif
+(toutes les paires point, polygone) et nombre d'entrées borné avec des
+polygones de tailles très différentes
+"""
+
+import sys
+from pathlib import Path
+
+import numpy as np
+import pytest
+
+ROOT = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(ROOT))
+
+from spatial_index import MAX_CELLS_PER_POLYGON, PolygonGridIndex  # noqa: E402
+
+
+def star_polygon(rng, cx, cy, radius, n_vertices=10):
+    angles = np.sort(rng.uniform(0, 2 * np.pi, n_vertices))
+    radii = radius * rng.uniform(0.5, 1.0, n_vertices)
+    return [np.column_stack([cx + radii * np.cos(angles), cy + radii * np.sin(angles)])]
+
+
+@pytest.fixture
+def mixed_polygons():
+    """Beaucoup de petits polygones et quelques très grands"""
+    rng = np.random.default_rng(0)
+    small = [star_polygon(rng, *rng.uniform(0, 1000, 2), rng.uniform(0.5, 2)) for _ in range(2000)]
+    large = [star_polygon(rng, *rng.uniform(0, 1000, 2), rng.uniform(200, 400)) for _ in range(20)]
+    return small + large
+
+
+def brute_force_query(index, x, y):
+    """Plus petit polygone contenant chaque point, en testant toutes les paires"""
+    points, polygons = np.meshgrid(np.arange(len(x)), np.arange(index.n_polygons), indexing='ij')
+    points, polygons = points.ravel(), polygons.ravel()
+    inside = index._contains_pairs(x, y, points, polygons)
+    best = np.full(len(x), index.n_polygons)
+    np.minimum.at(best, points[inside], polygons[inside])
+    return np.where(best < index.n_polygons, best, -1)
+
+
+def test_entries_are_bounded_with_mixed_polygon_sizes(mixed_polygons):
+    index = PolygonGridIndex(mixed_polygons)
+    entries = sum(len(level.cell_polygons) for level in index.levels)
+    assert entries <= MAX_CELLS_PER_POLYGON * len(mixed_polygons)
+
+
+def test_query_matches_brute_force(mixed_polygons):
+    rng = np.random.default_rng(1)
+    index = PolygonGridIndex(mixed_polygons)
+    x, y = rng.uniform(-50, 1050, (2, 2000))
+    # Points pris au centre des petits polygones, pour tester aussi les petits
+    centers = np.array([rings[0].mean(axis=0) for rings in mixed_polygons[:200]])
+    x = np.concatenate([x, centers[:, 0], [np.nan]])
+    y = np.concatenate([y, centers[:, 1], [0.0]])
+
+    result = index.query(x, y, max_edges_per_block=10_000)
+    np.testing.assert_array_equal(result, brute_force_query(index, x, y))
+    assert (result[2000:2200] >= 0).all()
+
+
+def test_empty_index():
+    index = PolygonGridIndex([])
+    np.testing.assert_array_equal(index.query([1.0, 2.0], [3.0, 4.0]), [-1, -1])